@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, the stream needs the models and settings
+from post.sse import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
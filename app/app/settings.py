@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +77,207 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'app.wsgi.application'
+ASGI_APPLICATION = 'app.asgi.application'
+
+# Threads running blocking ORM calls for async views, per worker process.
+# Keep it at or below DB_POOL_MAX_SIZE.
+ASYNC_ORM_THREADS = int(os.environ.get('ASYNC_ORM_THREADS', 8))
+
+# Server-Sent Events of post, tag and topic changes, served by app.asgi.
+# Events stay inside the worker that made the change unless a NOTIFY
+# channel is set, then every worker LISTENs and replays them.
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_NOTIFY_CHANNEL = os.environ.get('EVENTS_NOTIFY_CHANNEL')
+
+# Delta sync: rows changed this close before a token are sent again to
+# cover transactions committing out of order, and tombstones of deleted
+# rows are kept this long (older tokens get a full snapshot instead).
+SYNC_OVERLAP_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Most posts a client may fetch by id in one batch request
+POST_BATCH_MAX_IDS = 500
+
+# Tag and topic autocomplete result limits
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Related posts are served from an index of shared tags and topics built
+# by the build_related_index command (scheduled below) and reloaded when
+# the file changes. Web and worker containers must share its directory.
+RELATED_INDEX_PATH = os.environ.get(
+    'RELATED_INDEX_PATH', '/vol/web/index/related_posts.npz'
+)
+RELATED_DEFAULT_LIMIT = 10
+RELATED_MAX_LIMIT = 50
+
+# Trending tag and topic titles, aggregated by the update_trending command
+# (scheduled below): a use counts half as much every half life and titles
+# whose score fell below the minimum are dropped
+TRENDING_HALF_LIFE_HOURS = float(
+    os.environ.get('TRENDING_HALF_LIFE_HOURS', 24)
+)
+TRENDING_MIN_SCORE = 0.01
+# How long a use may take to commit and still be counted
+TRENDING_LATE_COMMIT_SECONDS = 10 * 60
+TRENDING_DEFAULT_LIMIT = 10
+TRENDING_MAX_LIMIT = 50
+
+# Longest range of days one analytics request may cover
+ANALYTICS_MAX_DAYS = 1100
+
+# DRF tokens expire after this many seconds without use; using one renews
+# it, writing at most once per renew interval
+AUTH_TOKEN_LIFETIME = int(os.environ.get('AUTH_TOKEN_LIFETIME', 14 * 86400))
+AUTH_TOKEN_RENEW_INTERVAL = 60 * 60
+
+# Stateless signed tokens (Authorization: Bearer): lifetimes in seconds,
+# and how often each process reloads the list of revoked tokens. Stream
+# tokens only open the event stream, and travel in its URL
+SIGNED_TOKEN_SECRET = os.environ.get('SIGNED_TOKEN_SECRET', SECRET_KEY)
+SIGNED_TOKEN_ACCESS_LIFETIME = 5 * 60
+SIGNED_TOKEN_REFRESH_LIFETIME = 14 * 24 * 60 * 60
+SIGNED_TOKEN_STREAM_LIFETIME = 60
+SIGNED_TOKEN_REVOCATION_REFRESH = 30
+
+# Monthly partitions of posts (PostgreSQL): how many months ahead
+# manage_partitions keeps created, and after how many months it detaches
+# old ones for archival (never when unset)
+POST_PARTITION_MONTHS_AHEAD = 3
+POST_PARTITION_RETENTION_MONTHS = (
+    int(os.environ['POST_PARTITION_RETENTION_MONTHS'])
+    if os.environ.get('POST_PARTITION_RETENTION_MONTHS') else None
+)
+
+# Token bucket throttles of logins and writes, '<scope>.<kind>' to
+# 'requests/period': a bucket holds that many requests and refills at
+# that rate. Kinds are user, ip, account (the email a login names) and
+# endpoint (every caller together). Buckets are rows of the database,
+# taken from with one upsert each, and so are the counts of throttled
+# requests.
+THROTTLE_RATES = {
+    'login.account': '10/min',
+    'login.ip': '30/min',
+    'login.endpoint': '300/min',
+    'signup.ip': '20/hour',
+    'signup.endpoint': '300/min',
+    'post_write.user': '120/min',
+    'post_write.ip': '600/min',
+    'post_write.endpoint': '6000/min',
+}
+
+# Idempotency-Key on post writes: the first response is replayed to
+# retries for the TTL, a duplicate waits up to WAIT seconds for the first
+# request to finish, and a claim held past LOCK seconds is taken over
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# Identical concurrent list requests share one database read. Waiters
+# give up after WAIT seconds and read for themselves. Set
+# SINGLEFLIGHT_CACHE to a cache every worker shares (e.g. shared) to
+# coalesce across processes too.
+SINGLEFLIGHT_ENABLED = True
+SINGLEFLIGHT_WAIT_SECONDS = 5
+SINGLEFLIGHT_CACHE = os.environ.get('SINGLEFLIGHT_CACHE') or None
+
+# The default cache is local to each process. The shared cache holds
+# what every worker process must see, such as read-your-writes pins. It
+# defaults to a database table (manage.py createcachetable), point it at
+# memcached or any other shared backend with SHARED_CACHE_BACKEND and
+# _LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.environ.get(
+            'SHARED_CACHE_LOCATION', 'core_shared_cache'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Background jobs run by `manage.py run_worker`: a running job whose
+# worker stopped renewing its lock for this many seconds is queued again,
+# failures are retried after BACKOFF * 2**(attempt - 1) seconds (at most
+# MAX_DELAY) and finished jobs are kept this many days
+TASK_LOCK_TIMEOUT = 600
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+TASK_RESULT_RETENTION_DAYS = 7
+
+# Recurring jobs: task name, keyword arguments and interval in seconds
+TASK_SCHEDULES = {
+    'purge-jobs': {'task': 'core.purge_jobs', 'every': 60 * 60},
+    'purge-tokens': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'purge_tokens'},
+        'every': 60 * 60,
+    },
+    'purge-idempotency-keys': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'purge_idempotency_keys'},
+        'every': 60 * 60,
+    },
+    'purge-throttle-buckets': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'purge_throttle_buckets'},
+        'every': 60 * 60,
+    },
+    'purge-tombstones': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'purge_tombstones'},
+        'every': 24 * 60 * 60,
+    },
+    'repair-post-counts': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'repair_post_counts'},
+        'every': 24 * 60 * 60,
+    },
+    # Does nothing unless core_post is partitioned (PostgreSQL)
+    'manage-partitions': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'manage_partitions', 'if_partitioned': True},
+        'every': 24 * 60 * 60,
+    },
+    'update-trending': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'update_trending'},
+        'every': 5 * 60,
+    },
+    # Name used by post.related to bring the build forward
+    'build-related-index': {
+        'task': 'core.run_command',
+        'kwargs': {'name': 'build_related_index'},
+        'every': 10 * 60,
+    },
+}
+
+# Slow query log: queries over THRESHOLD_MS (unset it to turn the log
+# off) go to a rotating JSON lines file, summarized by `manage.py
+# slow_queries`. A sample of the reads over EXPLAIN_MS get their plan
+# captured off the request by a plain EXPLAIN, which does not run them,
+# at most once per query every EXPLAIN_INTERVAL seconds.
+_SLOW_QUERY_THRESHOLD = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200')
+SLOW_QUERY_THRESHOLD_MS = (
+    float(_SLOW_QUERY_THRESHOLD) if _SLOW_QUERY_THRESHOLD else None
+)
+SLOW_QUERY_LOG_PATH = os.environ.get(
+    'SLOW_QUERY_LOG_PATH', '/vol/web/log/slow_queries.log'
+)
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+SLOW_QUERY_EXPLAIN_MS = float(os.environ.get('SLOW_QUERY_EXPLAIN_MS', 1000))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1)
+)
+SLOW_QUERY_EXPLAIN_INTERVAL = 300
 
 
 # Database
@@ -81,14 +285,52 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql_pool',
         'HOST': os.environ.get('DB_HOST'),
 	'NAME': os.environ.get('DB_NAME'),
 	'USER': os.environ.get('DB_USER'),
 	'PASSWORD': os.environ.get('DB_PASS'),
+        # Connections go back to the pool at the end of every request
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'POOL': {
+                'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+                'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'IDLE_TIMEOUT': int(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+                'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+                'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+                'PRE_PING': True,
+            },
+        },
     }
 }
 
+# Read replicas share the primary credentials, e.g. DB_REPLICA_HOSTS=db-r1,db-r2
+# Locally any extra alias works, including a second SQLite file.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Seconds a caller's reads stay on the primary after a write, kept in a
+# cache every worker shares
+DATABASE_REPLICA_PIN_CACHE = 'shared'
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.environ.get('DB_REPLICA_PIN_SECONDS', 5)
+)
+DATABASE_REPLICA_CHECK_INTERVAL = 5
+# Token lookups must see tokens issued moments ago on the primary, and
+# the database cache (pins) its latest values
+DATABASE_REPLICA_EXCLUDED_APPS = ['authtoken', 'sessions', 'django_cache']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -108,6 +350,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: the preferred algorithm (PASSWORD_HASHER) hashes new
+# passwords, and a stored hash with another algorithm or cost is
+# rehashed on the next successful login. Tune the costs with
+# `manage.py calibrate_hashers`; argon2 and bcrypt need argon2-cffi and
+# bcrypt installed.
+PASSWORD_HASHER_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASHER_PBKDF2_ITERATIONS', 216000)
+)
+PASSWORD_HASHER_ARGON2_TIME_COST = int(
+    os.environ.get('PASSWORD_HASHER_ARGON2_TIME_COST', 2)
+)
+PASSWORD_HASHER_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_HASHER_ARGON2_MEMORY_COST', 512)
+)
+PASSWORD_HASHER_BCRYPT_ROUNDS = int(
+    os.environ.get('PASSWORD_HASHER_BCRYPT_ROUNDS', 12)
+)
+_PASSWORD_HASHERS = {
+    'pbkdf2_sha256': 'core.hashers.PBKDF2PasswordHasher',
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'bcrypt_sha256': 'core.hashers.BCryptSHA256PasswordHasher',
+}
+_PREFERRED_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2_sha256')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[_PREFERRED_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items()
+    if name != _PREFERRED_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -0,0 +1,61 @@
+"""Benchmarks for the API, run from the app directory
+
+Each module is a standalone script, e.g.::
+
+    python -m benchmarks.bench_asgi --help
+
+They use the configured database, so point DJANGO_SETTINGS_MODULE (and the
+DB_* variables) at a disposable, migrated database before running them.
+"""
+import os
+import statistics
+import time
+
+
+def setup_django():
+    """Configure Django for a script run outside manage.py"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Timer:
+    """Context manager measuring wall clock seconds"""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+
+
+def report(title, rows):
+    """Print a list of dicts as an aligned table"""
+    print(f'\n{title}')
+    if not rows:
+        return
+    columns = list(rows[0])
+    cells = [[_format(row[col]) for col in columns] for row in rows]
+    widths = [
+        max(len(col), *(len(line[i]) for line in cells))
+        for i, col in enumerate(columns)
+    ]
+    print('  '.join(col.ljust(w) for col, w in zip(columns, widths)))
+    for line in cells:
+        print('  '.join(cell.ljust(w) for cell, w in zip(line, widths)))
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return str(value)
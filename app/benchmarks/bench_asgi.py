@@ -0,0 +1,229 @@
+"""Concurrent connection capacity of app.wsgi versus app.asgi
+
+Starts ``manage.py serve`` once per interface, drives the post list
+endpoint (sync ``/api/posts/posts/`` under WSGI, ``/api/posts/async/posts/``
+under ASGI) at increasing concurrency and reports throughput, latency and
+the resident memory of the server process tree. ``--slow-client`` makes
+every client stall between sending its request line and its headers, the
+way slow mobile links do.
+
+A threaded WSGI worker and a uvicorn worker with its ORM thread pool do
+not cost the same memory, so by default each interface gets as many
+workers as fit in ``--memory-mb``, measured from the idle footprint of
+one and two workers. ``--workers`` pins the same count for both instead.
+
+    python -m benchmarks.bench_asgi --memory-mb 600 --concurrency 10,100,400
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+PATHS = {
+    'wsgi': '/api/posts/posts/',
+    'asgi': '/api/posts/async/posts/',
+}
+
+
+def prepare_fixtures(posts):
+    """Create a benchmark user with posts and return its token key"""
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+    from core.models import Post, Tag
+
+    user, _ = get_user_model().objects.get_or_create(
+        email='bench-asgi@example.com'
+    )
+    tag, _ = Tag.objects.get_or_create(user=user, title='bench')
+    for i in range(Post.objects.filter(user=user).count(), posts):
+        post = Post.objects.create(user=user, title=f'Post {i}', content='-')
+        post.tags.add(tag)
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def tree_rss_mb(pid):
+    """Return the resident memory of a process and its children in MB"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except OSError:
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def start_server(interface, port, workers):
+    args = [
+        sys.executable, 'manage.py', 'serve',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--max-requests', '0',
+    ]
+    if interface == 'asgi':
+        args.append('--asgi')
+    server = subprocess.Popen(
+        args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'{interface} server did not start')
+
+
+def workers_for_memory(interface, port, budget_mb):
+    """Return how many workers of an interface fit in budget_mb
+
+    The footprint of the master and of each worker comes from the idle
+    memory of the server with one and with two workers.
+    """
+    idle = []
+    for workers in (1, 2):
+        server = start_server(interface, port, workers)
+        try:
+            time.sleep(1)
+            idle.append(tree_rss_mb(server.pid))
+        finally:
+            stop_server(server)
+    per_worker = max(idle[1] - idle[0], 1.0)
+    master = max(idle[0] - per_worker, 0.0)
+    return max(1, int((budget_mb - master) // per_worker))
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def fetch(port, path, token, slow_client):
+    """Issue one GET and return its latency and status code"""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\n'.encode())
+    if slow_client:
+        await writer.drain()
+        await asyncio.sleep(slow_client)
+    writer.write(
+        f'Host: localhost\r\nAuthorization: Token {token}\r\n'
+        f'Connection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    code = int(status_line.split()[1]) if status_line else 0
+    return time.perf_counter() - started, code
+
+
+async def load(port, path, token, concurrency, requests, slow_client):
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            try:
+                latency, code = await fetch(port, path, token, slow_client)
+            except OSError:
+                errors += 1
+                continue
+            if code != 200:
+                errors += 1
+            latencies.append(latency)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--memory-mb', type=float, default=512)
+    parser.add_argument('--concurrency', default='10,50,200')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=20)
+    parser.add_argument('--slow-client', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interfaces', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    setup_django()
+    token = prepare_fixtures(args.posts)
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    rows = []
+    for interface in args.interfaces.split(','):
+        workers = args.workers or workers_for_memory(
+            interface, args.port, args.memory_mb
+        )
+        server = start_server(interface, args.port, workers)
+        try:
+            idle_mb = tree_rss_mb(server.pid)
+            for concurrency in levels:
+                with Timer() as timer:
+                    latencies, errors = asyncio.run(load(
+                        args.port, PATHS[interface], token, concurrency,
+                        args.requests, args.slow_client,
+                    ))
+                rss_mb = tree_rss_mb(server.pid)
+                rate = len(latencies) / timer.seconds
+                rows.append({
+                    'interface': interface,
+                    'workers': workers,
+                    'concurrency': concurrency,
+                    'req/s': rate,
+                    'p50 ms': percentile(latencies, 50) * 1000,
+                    'p99 ms': percentile(latencies, 99) * 1000,
+                    'errors': errors,
+                    'idle MB': idle_mb,
+                    'rss MB': rss_mb,
+                    'req/s per 100MB': rate / rss_mb * 100,
+                })
+        finally:
+            stop_server(server)
+
+    sizing = (
+        f'{args.workers} workers each' if args.workers
+        else f'workers sized to {args.memory_mb:.0f} MB'
+    )
+    report(
+        f'{sizing}, {args.requests} requests per level, '
+        f'slow client {args.slow_client}s',
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Cost of authenticating one request with a DRF token versus a signed one
+
+Runs each authentication class against a prepared request ``--requests``
+times in-process and reports the latency per call and the database
+queries it made. Signed tokens should cost microseconds and no queries
+once the revocation list is loaded.
+
+    python -m benchmarks.bench_auth --requests 20000
+"""
+import argparse
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import connection, reset_queries
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authtoken.models import Token
+    from user import tokens
+    from user.authentication import ExpiringTokenAuthentication, \
+        SignedTokenAuthentication
+
+    user, _ = get_user_model().objects.get_or_create(
+        email='bench-auth@example.com'
+    )
+    key = Token.objects.get_or_create(user=user)[0].key
+    access = tokens.issue_pair(user.pk)['access']
+    tokens.revocations.reload()
+
+    factory = RequestFactory()
+    cases = (
+        ('Token (DB lookup)', ExpiringTokenAuthentication(), f'Token {key}'),
+        ('Bearer (signed)', SignedTokenAuthentication(), f'Bearer {access}'),
+    )
+    rows = []
+    for name, authenticator, header in cases:
+        request = factory.get('/', HTTP_AUTHORIZATION=header)
+        samples = []
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(args.requests):
+                with Timer() as timer:
+                    authenticator.authenticate(request)
+                samples.append(timer.seconds * 1e6)
+        rows.append({
+            'scheme': name,
+            'calls': args.requests,
+            'p50 us': percentile(samples, 50),
+            'p99 us': percentile(samples, 99),
+            'queries/call': len(queries) / args.requests,
+        })
+    report('Authentication cost per request', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Tag autocomplete latency for a user with tens of thousands of tags
+
+Seeds one user with ``--tags`` random titles (once, reused afterwards) and
+times the autocomplete query for random prefixes of each length. On
+PostgreSQL the plan of a one letter prefix is printed too, it should be an
+index scan on ``core_tag_user_title_prefix`` with no sort.
+
+    python -m benchmarks.bench_autocomplete --tags 50000 --queries 500
+"""
+import argparse
+import random
+import string
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+def seed(user, count):
+    from core.models import Tag
+
+    missing = count - Tag.objects.filter(user=user).count()
+    rng = random.Random(0)
+    batch = []
+    for _ in range(max(missing, 0)):
+        length = rng.randint(4, 16)
+        title = ''.join(rng.choice(string.ascii_lowercase)
+                        for _ in range(length))
+        batch.append(Tag(user=user, title=title.capitalize()))
+        if len(batch) == 5000:
+            Tag.objects.bulk_create(batch)
+            batch = []
+    Tag.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tags', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from core.models import Tag
+    from post.autocomplete import autocomplete
+
+    user, _ = get_user_model().objects.get_or_create(
+        email='bench-autocomplete@example.com'
+    )
+    with Timer() as timer:
+        seed(user, args.tags)
+    print(f'Seeded {args.tags} tags in {timer.seconds:.1f}s')
+
+    tags = Tag.objects.filter(user=user)
+    rng = random.Random(1)
+    rows = []
+    for length in (1, 2, 3):
+        samples = []
+        for _ in range(args.queries):
+            prefix = ''.join(
+                rng.choice(string.ascii_lowercase) for _ in range(length)
+            )
+            with Timer() as timer:
+                list(autocomplete(tags, prefix, args.limit))
+            samples.append(timer.seconds * 1000)
+        rows.append({
+            'prefix length': length,
+            'queries': args.queries,
+            'p50 ms': percentile(samples, 50),
+            'p99 ms': percentile(samples, 99),
+            'max ms': max(samples),
+        })
+    report(f'Autocomplete over {args.tags} tags, limit {args.limit}', rows)
+
+    if connection.vendor == 'postgresql':
+        print('\nPlan for prefix "a":')
+        print(autocomplete(tags, 'a', args.limit).explain(analyze=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Login throughput at different password hashing costs
+
+Logs a user in through ``/api/user/token/`` with the Django test client,
+from ``--threads`` threads at once, for each PBKDF2 iteration count in
+``--iterations``. The first login at a new count rehashes the stored
+password and is left out, the rest measure the steady state.
+
+    python -m benchmarks.bench_login --iterations 216000,100000 --threads 4
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+PASSWORD = 'bench-login-pass'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', default='216000,100000,50000')
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    email = 'bench-login@example.com'
+    user, _ = get_user_model().objects.get_or_create(email=email)
+    user.set_password(PASSWORD)
+    user.save()
+    payload = {'email': email, 'password': PASSWORD}
+
+    def login(_):
+        with Timer() as timer:
+            res = Client().post('/api/user/token/', payload)
+        assert res.status_code == 200, res.status_code
+        return timer.seconds * 1000
+
+    rows = []
+    for iterations in (int(n) for n in args.iterations.split(',')):
+        # Without the login throttles, which would turn away all but the
+        # first few logins of the one account
+        with override_settings(PASSWORD_HASHER_PBKDF2_ITERATIONS=iterations,
+                               THROTTLE_RATES={}):
+            login(None)
+            with ThreadPoolExecutor(args.threads) as pool, Timer() as timer:
+                latencies = list(pool.map(login, range(args.logins)))
+        rows.append({
+            'pbkdf2 iterations': iterations,
+            'threads': args.threads,
+            'logins/s': args.logins / timer.seconds,
+            'p50 ms': percentile(latencies, 50),
+            'p99 ms': percentile(latencies, 99),
+        })
+    report(f'{args.logins} logins per cost', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Partition pruning of monthly post partitions versus one plain table
+
+Needs PostgreSQL. Creates two scratch tables shaped like ``core_post``,
+one plain and one partitioned by month with ``core.partitions``, fills
+both with ``--rows`` posts spread over ``--months`` months and times
+counting a random week of posts in each. The plan of the partitioned
+query should name a single partition. Detaching the oldest month is
+timed against deleting the same rows from the plain table.
+
+    python -m benchmarks.bench_partitions --rows 2000000 --months 24
+"""
+import argparse
+import random
+import re
+from datetime import timedelta
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+PLAIN = 'bench_post_plain'
+PARTITIONED = 'bench_post_part'
+
+COLUMNS = '''
+    id bigserial,
+    user_id integer NOT NULL,
+    title varchar(255) NOT NULL,
+    content varchar(255) NOT NULL,
+    created_at timestamptz NOT NULL,
+    updated_at timestamptz NOT NULL
+'''
+
+
+def create_tables(cursor, rows, months, first_month):
+    from core.partitions import create_partitions
+
+    for table in (PLAIN, PARTITIONED):
+        cursor.execute(f'DROP TABLE IF EXISTS {table} CASCADE')
+    cursor.execute(f'CREATE TABLE {PLAIN} ({COLUMNS}, PRIMARY KEY (id))')
+    cursor.execute(
+        f'CREATE TABLE {PARTITIONED} ({COLUMNS}, PRIMARY KEY (id, created_at))'
+        f' PARTITION BY RANGE (created_at)'
+    )
+    create_partitions(PARTITIONED, ahead=0, start=first_month)
+
+    for table in (PLAIN, PARTITIONED):
+        cursor.execute(f'''
+            INSERT INTO {table}
+                (user_id, title, content, created_at, updated_at)
+            SELECT n % 1000, 'Post ' || n, repeat('x', 120), at, at
+            FROM generate_series(1, %s) AS n,
+                LATERAL (SELECT %s::timestamptz
+                    + random() * (now() - %s::timestamptz) AS at) AS t
+        ''', [rows, first_month, first_month])
+        cursor.execute(f'CREATE INDEX ON {table} (created_at)')
+        cursor.execute(f'CREATE INDEX ON {table} (user_id, updated_at)')
+        cursor.execute(f'ANALYZE {table}')
+
+
+def time_week_counts(cursor, table, weeks, queries):
+    samples = []
+    rng = random.Random(0)
+    for _ in range(queries):
+        start = rng.choice(weeks)
+        with Timer() as timer:
+            cursor.execute(
+                f'SELECT count(*) FROM {table} '
+                f'WHERE created_at >= %s AND created_at < %s',
+                [start, start + timedelta(days=7)],
+            )
+            cursor.fetchone()
+        samples.append(timer.seconds * 1000)
+    return samples
+
+
+def scanned_partitions(cursor, week):
+    cursor.execute(
+        f'EXPLAIN SELECT count(*) FROM {PARTITIONED} '
+        f'WHERE created_at >= %s AND created_at < %s',
+        [week, week + timedelta(days=7)],
+    )
+    plan = '\n'.join(row[0] for row in cursor.fetchall())
+    return sorted(set(re.findall(rf'{PARTITIONED}_\w+', plan))), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--keep', action='store_true',
+                        help='Leave the scratch tables in place')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.utils import timezone
+    from core.partitions import add_months, detach_partitions, \
+        list_partitions
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('Partitioning needs PostgreSQL')
+
+    first_month = add_months(timezone.now().date(), -args.months + 1)
+    with connection.cursor() as cursor:
+        with Timer() as timer:
+            create_tables(cursor, args.rows, args.months, first_month)
+        print(f'Loaded {args.rows} rows twice in {timer.seconds:.1f}s')
+
+        weeks = [
+            timezone.now() - timedelta(days=7 * n)
+            for n in range(1, args.months * 4)
+        ]
+        rows = []
+        for table in (PLAIN, PARTITIONED):
+            samples = time_week_counts(cursor, table, weeks, args.queries)
+            rows.append({
+                'table': table,
+                'queries': args.queries,
+                'p50 ms': percentile(samples, 50),
+                'p99 ms': percentile(samples, 99),
+            })
+        report(f'Counting one week of {args.rows} posts', rows)
+
+        scanned, plan = scanned_partitions(cursor, weeks[len(weeks) // 2])
+        print(f'\nPartitions scanned for one week: {", ".join(scanned)}')
+        print(plan)
+
+        oldest = list_partitions(PARTITIONED)[0]
+        with Timer() as detach:
+            detach_partitions(oldest.upper, PARTITIONED)
+        with Timer() as delete:
+            cursor.execute(
+                f'DELETE FROM {PLAIN} WHERE created_at < %s', [oldest.upper]
+            )
+        report('Archiving the oldest month', [
+            {'operation': f'DETACH {oldest.name}',
+             'ms': detach.seconds * 1000},
+            {'operation': f'DELETE FROM {PLAIN}',
+             'ms': delete.seconds * 1000},
+        ])
+
+        if not args.keep:
+            cursor.execute(
+                f'DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED}, '
+                f'{oldest.name} CASCADE'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Throughput of the database job queue in jobs per second
+
+Queues ``--jobs`` jobs of a task sleeping ``--work-ms`` (0 for a no-op,
+which measures the queue overhead alone) and drains them with a worker
+for each combination of ``--concurrency`` and ``--batch-size``. Also
+times queueing itself. Several threads need PostgreSQL, SQLite locks the
+whole database on every claim.
+
+    python -m benchmarks.bench_queue --jobs 5000 --concurrency 1 4 8
+"""
+import argparse
+
+from benchmarks import Timer, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--work-ms', type=float, default=0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    args = parser.parse_args()
+
+    setup_django()
+    import time
+    from django.test import override_settings
+    from core import tasks
+    from core.models import Job
+    from core.worker import Worker
+
+    @tasks.task('benchmarks.work')
+    def work(ms=0):
+        if ms:
+            time.sleep(ms / 1000)
+
+    Job.objects.filter(task='benchmarks.work').delete()
+    rows = []
+    with override_settings(TASK_SCHEDULES={}):
+        for concurrency in args.concurrency:
+            for batch_size in args.batch_size:
+                with Timer() as queued:
+                    for _ in range(args.jobs):
+                        tasks.enqueue('benchmarks.work', {'ms': args.work_ms})
+                worker = Worker(concurrency, batch_size,
+                                args.poll_interval, until_empty=True)
+                with Timer() as drained:
+                    worker.run()
+                Job.objects.filter(task='benchmarks.work').delete()
+                rows.append({
+                    'threads': concurrency,
+                    'batch': batch_size,
+                    'jobs': worker.passed + worker.failed,
+                    'enqueue jobs/s': args.jobs / queued.seconds,
+                    'run jobs/s': args.jobs / drained.seconds,
+                })
+    report(f'{args.jobs} jobs of {args.work_ms:g}ms', rows)
+
+
+if __name__ == '__main__':
+    main()
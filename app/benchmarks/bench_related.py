@@ -0,0 +1,70 @@
+"""Related posts query latency over a large synthetic index
+
+Builds an in-memory index of ``--posts`` posts, each with a few of
+``--features`` tags and topics drawn from a skewed distribution (a few very
+popular tags, a long tail), and times top-K queries for random posts. No
+database is needed, this measures the
+index alone.
+
+    python -m benchmarks.bench_related --posts 1000000 --queries 1000
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+def synthetic_features(posts, features, per_post, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, features + 1)
+    weights /= weights.sum()
+    counts = rng.integers(1, per_post + 1, size=posts)
+    drawn = rng.choice(features, size=counts.sum(), p=weights)
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    return {
+        pk: drawn[bounds[pk]:bounds[pk + 1]] for pk in range(posts)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--features', type=int, default=20000)
+    parser.add_argument('--per-post', type=int, default=6)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from post.related import RelatedIndex
+
+    features = synthetic_features(args.posts, args.features, args.per_post)
+    with Timer() as timer:
+        index = RelatedIndex.from_features(features, 0)
+    print(f'Built an index of {args.posts} posts in {timer.seconds:.1f}s')
+
+    rng = np.random.default_rng(1)
+    rows = []
+    for metric in ('jaccard', 'cosine'):
+        samples = []
+        for pk in rng.integers(0, args.posts, size=args.queries):
+            with Timer() as timer:
+                index.similar(features[pk], pk, args.limit, metric)
+            samples.append(timer.seconds * 1000)
+        rows.append({
+            'metric': metric,
+            'queries': args.queries,
+            'p50 ms': percentile(samples, 50),
+            'p99 ms': percentile(samples, 99),
+            'max ms': max(samples),
+        })
+    report(
+        f'Related posts over {args.posts} posts and {args.features} '
+        f'features, limit {args.limit}',
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
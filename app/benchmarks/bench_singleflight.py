@@ -0,0 +1,126 @@
+"""Database load of a burst of identical list requests with single-flight
+
+Seeds one user with ``--posts`` posts carrying tags and topics (once,
+reused afterwards), then fires ``--burst`` concurrent requests for the
+user's post list and tag list, with single-flight off and on. Reports
+the queries the burst sent to the database, the requests that ran the
+read and the latency seen by the clients.
+
+    python -m benchmarks.bench_singleflight --posts 500 --burst 32
+"""
+import argparse
+import threading
+
+from benchmarks import Timer, percentile, report, setup_django
+
+
+def seed(user, count):
+    from core.models import Post, Tag, Topic
+
+    tags = [Tag.objects.get_or_create(user=user, title=f'Tag {n}')[0]
+            for n in range(20)]
+    topics = [Topic.objects.get_or_create(user=user, title=f'Topic {n}')[0]
+              for n in range(10)]
+    missing = count - Post.objects.filter(user=user).count()
+    Post.objects.bulk_create(
+        Post(user=user, title=f'Post {n}', content='x' * 120)
+        for n in range(max(missing, 0))
+    )
+    # Not every backend returns the ids of bulk created rows
+    posts = list(Post.objects.filter(user=user, tags=None))
+    Post.tags.through.objects.bulk_create(
+        Post.tags.through(post_id=post.pk, tag_id=tags[n % 20].pk)
+        for n, post in enumerate(posts)
+    )
+    Post.topics.through.objects.bulk_create(
+        Post.topics.through(post_id=post.pk, topic_id=topics[n % 10].pk)
+        for n, post in enumerate(posts)
+    )
+
+
+def burst(view, user, size):
+    """Send size concurrent requests, return latencies and query count"""
+    from django.db import connection, connections
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    factory = APIRequestFactory()
+    barrier = threading.Barrier(size)
+    lock = threading.Lock()
+    queries = [0]
+    samples = []
+
+    def count(execute, sql, params, many, context):
+        with lock:
+            queries[0] += 1
+        return execute(sql, params, many, context)
+
+    def client():
+        request = factory.get('/')
+        force_authenticate(request, user=user)
+        barrier.wait()
+        with connection.execute_wrapper(count), Timer() as timer:
+            response = view(request)
+            response.render()
+        with lock:
+            samples.append(timer.seconds * 1000)
+        connections.close_all()
+
+    threads = [threading.Thread(target=client) for _ in range(size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, queries[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--burst', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from core import singleflight
+    from post.views import PostViewSet, TagViewSet
+
+    user, _ = get_user_model().objects.get_or_create(
+        email='bench-singleflight@example.com'
+    )
+    with Timer() as timer:
+        seed(user, args.posts)
+    print(f'Seeded {args.posts} posts in {timer.seconds:.1f}s')
+
+    views = (
+        ('posts', PostViewSet.as_view({'get': 'list'})),
+        ('tags', TagViewSet.as_view({'get': 'list'})),
+    )
+    rows = []
+    for name, view in views:
+        for enabled in (False, True):
+            singleflight.reset_stats()
+            samples, queries = [], 0
+            with override_settings(SINGLEFLIGHT_ENABLED=enabled):
+                for _ in range(args.rounds):
+                    latencies, sent = burst(view, user, args.burst)
+                    samples.extend(latencies)
+                    queries += sent
+            stats = singleflight.stats()
+            requests = args.burst * args.rounds
+            rows.append({
+                'list': name,
+                'single-flight': 'on' if enabled else 'off',
+                'requests': requests,
+                'reads run': stats.get('leaders', requests) +
+                stats.get('timeouts', 0) + stats.get('failed', 0),
+                'queries': queries,
+                'p50 ms': percentile(samples, 50),
+                'p99 ms': percentile(samples, 99),
+            })
+    report(f'Bursts of {args.burst} identical list requests', rows)
+
+
+if __name__ == '__main__':
+    main()
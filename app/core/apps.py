@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import querylog
+        connection_created.connect(
+            querylog.install, dispatch_uid='core.querylog.install'
+        )
@@ -0,0 +1,43 @@
+"""Denormalized post counters of tags and topics"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+def adjust_post_count(model, pks, delta):
+    """Atomically add delta to the post count of the given rows"""
+    if not pks or not delta:
+        return
+    # Never below zero, the repair command fixes any drift
+    model.objects.filter(pk__in=pks).update(
+        post_count=Greatest(F('post_count') + delta, Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def recount_posts(model, through, field, batch_size=1000):
+    """Recompute post counts from the through table in id ranges
+
+    Each batch is a single UPDATE over at most batch_size rows so the
+    repair never holds locks on the whole table. Returns rows updated.
+    """
+    counts = (
+        through.objects.filter(**{field: OuterRef('pk')})
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return updated
+        updated += model.objects.filter(pk__in=ids).update(
+            post_count=Coalesce(Subquery(counts), Value(0))
+        )
+        last_id = ids[-1]
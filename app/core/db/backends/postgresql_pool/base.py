@@ -0,0 +1,94 @@
+"""PostgreSQL backend that borrows connections from an in-process pool
+
+Configure it with ``'ENGINE': 'core.db.backends.postgresql_pool'`` and an
+optional ``OPTIONS['POOL']`` dict with ``MIN_SIZE``, ``MAX_SIZE``,
+``IDLE_TIMEOUT``, ``MAX_LIFETIME``, ``TIMEOUT`` and ``PRE_PING``. Keep
+``CONN_MAX_AGE`` at 0 so Django hands the connection back at the end of
+each request instead of holding it per thread. The pool opens
+``MIN_SIZE`` connections as soon as it is created.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.backends.postgresql_pool.creation import DatabaseCreation
+from core.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = base.Database
+
+
+def _ping(connection):
+    """Raise when the server no longer answers on the connection"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if not connection.autocommit:
+        connection.rollback()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('POOL', None)
+        return conn_params
+
+    def get_pool(self, conn_params):
+        """Return the pool shared by every connection with these params"""
+        key = (self.alias, repr(sorted(conn_params.items())))
+        options = self.settings_dict['OPTIONS'].get('POOL', {})
+
+        def connect():
+            return Database.connect(**conn_params)
+
+        def factory():
+            pool = ConnectionPool(
+                connect,
+                ping=_ping,
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options.get('MAX_SIZE', 10),
+                idle_timeout=options.get('IDLE_TIMEOUT', 300),
+                max_lifetime=options.get('MAX_LIFETIME', 3600),
+                timeout=options.get('TIMEOUT', 30),
+                pre_ping=options.get('PRE_PING', True),
+            )
+            pool.warm()
+            return pool
+
+        return get_pool(key, factory)
+
+    def get_new_connection(self, conn_params):
+        try:
+            connection = self.get_pool(conn_params).acquire()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+
+        # Same isolation handling as the stock backend, see its comments
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        base.psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        pool = self.get_pool(self.get_connection_params())
+        discard = bool(connection.closed)
+        if not discard:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except Database.Error:
+                    discard = True
+        pool.release(connection, discard=discard)
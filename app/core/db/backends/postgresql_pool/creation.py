@@ -0,0 +1,20 @@
+from django.db.backends.postgresql import creation
+
+from core.db.pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Test database handling that lets go of pooled connections first
+
+    PostgreSQL refuses to drop a database, or copy it for parallel tests,
+    while other sessions are connected to it, and idle pooled connections
+    count as such sessions.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools()
+        super()._clone_test_db(suffix, verbosity, keepdb)
@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up before the checkout timeout"""
+
+
+class _Entry:
+    """Pool bookkeeping for one raw connection"""
+    __slots__ = ('connection', 'created_at', 'idle_since')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.idle_since = self.created_at
+
+
+class ConnectionPool:
+    """Thread safe pool of DB-API connections
+
+    ``connect`` opens a new raw connection, ``ping`` raises when a
+    connection is no longer usable. Idle connections beyond ``min_size``
+    are closed after ``idle_timeout`` seconds and any connection older
+    than ``max_lifetime`` is replaced when it comes back to the pool.
+    """
+
+    def __init__(self, connect, ping=None, min_size=0, max_size=10,
+                 idle_timeout=300, max_lifetime=3600, timeout=30,
+                 pre_ping=True):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min <= max >= 1')
+        self.connect = connect
+        self.ping = ping
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.pre_ping = pre_ping and ping is not None
+
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._counters = {
+            'created': 0,
+            'discarded': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'failed_pings': 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def warm(self):
+        """Open connections until the pool holds ``min_size`` of them"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = _Entry(self.connect())
+            except Exception:
+                self._forget_slot()
+                raise
+            with self._cond:
+                self._counters['created'] += 1
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def acquire(self):
+        """Check out a healthy connection, opening one when allowed"""
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                self._prune_idle()
+                entry = self._idle.pop() if self._idle else None
+                if entry is None and self._size < self.max_size:
+                    self._size += 1
+                    reserved = True
+                elif entry is None:
+                    reserved = False
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No connection available within '
+                            f'{self.timeout} seconds'
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if entry is None and reserved:
+                try:
+                    entry = _Entry(self.connect())
+                except Exception:
+                    self._forget_slot()
+                    raise
+                with self._cond:
+                    self._counters['created'] += 1
+            elif self.pre_ping and not self._is_alive(entry):
+                self._handle_failover(entry)
+                continue
+
+            with self._cond:
+                wait = time.monotonic() - started
+                if waited:
+                    self._counters['waits'] += 1
+                    self._wait_total += wait
+                    self._wait_max = max(self._wait_max, wait)
+                self._counters['checkouts'] += 1
+                self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def release(self, connection, discard=False):
+        """Return a connection, closing it when broken or too old"""
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                return
+            expired = (
+                self.max_lifetime is not None and
+                time.monotonic() - entry.created_at > self.max_lifetime
+            )
+            if not (discard or expired):
+                entry.idle_since = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._close_entry(entry)
+
+    def close(self):
+        """Close idle connections now and in-use ones once released"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self.max_lifetime = 0
+        for entry in idle:
+            self._close_entry(entry)
+
+    def stats(self):
+        """Return a snapshot of pool utilization and checkout waits"""
+        with self._cond:
+            in_use = len(self._in_use)
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'utilization': in_use / self.max_size,
+                'wait_seconds_total': self._wait_total,
+                'wait_seconds_max': self._wait_max,
+                **self._counters,
+            }
+
+    def _is_alive(self, entry):
+        try:
+            self.ping(entry.connection)
+            return True
+        except Exception:
+            return False
+
+    def _handle_failover(self, entry):
+        """Drop a dead connection together with every idle one
+
+        A failed ping usually means the server restarted or failed over,
+        so the remaining idle connections are just as stale.
+        """
+        with self._cond:
+            self._counters['failed_pings'] += 1
+            stale = [entry, *self._idle]
+            self._idle.clear()
+        for dead in stale:
+            self._close_entry(dead)
+
+    def _prune_idle(self):
+        """Close connections idle for too long, keeping ``min_size``"""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size and
+               now - self._idle[0].idle_since > self.idle_timeout):
+            entry = self._idle.popleft()
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._quiet_close(entry.connection)
+
+    def _close_entry(self, entry):
+        self._quiet_close(entry.connection)
+        with self._cond:
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+
+    def _forget_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _quiet_close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """Return the pool registered under key, creating it with factory"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = factory()
+        return pool
+
+
+def pool_stats():
+    """Return the stats of every pool in this process by label"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {key[0]: pool.stats() for key, pool in pools}
+
+
+def close_pools():
+    """Close every pool in this process, e.g. after forking"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,222 @@
+"""In-process broker for change events pushed to streaming clients
+
+Events are plain dicts with ``id``, ``user_id``, ``model``, ``action`` and
+``pk``. Every worker keeps a bounded replay buffer so a reconnecting
+client can resume from its ``Last-Event-ID``. With
+``EVENTS_NOTIFY_CHANNEL`` set, events are published through PostgreSQL
+``NOTIFY`` and every worker ``LISTEN``s, so a change made in one worker
+reaches streams held open by the others.
+
+Ids only roughly follow delivery order: NOTIFY delivers at commit, not
+when an id was taken, and workers take ids from their own clocks. Streams
+therefore remember the ids they sent instead of trusting that ids only
+grow, and replay resumes from where the last id was delivered.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Queue of events for one open stream, consumed on its event loop"""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, event):
+        """Queue an event; must run on the subscription's loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client fell too far behind, make it reload instead
+            self.overflowed = True
+
+
+class RecentIds:
+    """Bounded set of the last ids a stream sent"""
+
+    def __init__(self, size):
+        self._order = deque()
+        self._ids = set()
+        self.size = size
+
+    def add(self, event_id):
+        """Remember an id, returning False when it was already sent"""
+        if event_id in self._ids:
+            return False
+        self._ids.add(event_id)
+        self._order.append(event_id)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
+class EventBroker:
+    """Fan change events out to the subscriptions of their user"""
+
+    def __init__(self, buffer_size=1000, queue_size=1000):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=buffer_size)
+        self._evicted_id = 0
+        self._last_id = 0
+        self._subscriptions = defaultdict(set)
+        self._listener = None
+
+    def next_id(self):
+        """Return a strictly increasing, roughly time ordered event id"""
+        with self._lock:
+            return self._take_id()
+
+    def _take_id(self):
+        now = time.time_ns() // 1000
+        self._last_id = max(self._last_id + 1, now)
+        return self._last_id
+
+    def dispatch(self, event):
+        """Buffer an event and deliver it to the open streams of its user
+
+        An event without an id gets one here, under the same lock that
+        orders the buffer, so local events are delivered in id order.
+        """
+        with self._lock:
+            if event.get('id') is None:
+                event['id'] = self._take_id()
+            if len(self._buffer) == self._buffer.maxlen:
+                self._evicted_id = self._buffer[0]['id']
+            self._buffer.append(event)
+            subscriptions = list(self._subscriptions.get(event['user_id'], ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.push, event)
+
+    def subscribe(self, user_id):
+        """Open a subscription on the running event loop"""
+        subscription = Subscription(
+            user_id, asyncio.get_running_loop(), self.queue_size
+        )
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        self.ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def replay(self, user_id, after_id):
+        """Return the buffered events of a user delivered after after_id
+
+        Events are returned in delivery order, starting right after the
+        event with that id, so an event with a lower id that arrived later
+        is not lost. When the id is not buffered here, events with a
+        higher id are returned. Returns None when events after that id
+        were already evicted, in which case the client has to reload
+        everything.
+        """
+        with self._lock:
+            if after_id < self._evicted_id:
+                return None
+            events = list(self._buffer)
+        for position, event in enumerate(events):
+            if event['id'] == after_id:
+                return [
+                    later for later in events[position + 1:]
+                    if later['user_id'] == user_id
+                ]
+        return [
+            event for event in events
+            if event['user_id'] == user_id and event['id'] > after_id
+        ]
+
+    def ensure_listener(self):
+        """Start the LISTEN thread once when NOTIFY fan-out is enabled"""
+        channel = getattr(settings, 'EVENTS_NOTIFY_CHANNEL', None)
+        if not channel or connection.vendor != 'postgresql':
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = NotifyListener(self, channel)
+                self._listener.start()
+
+
+class NotifyListener(threading.Thread):
+    """Dispatch events received on a PostgreSQL NOTIFY channel"""
+
+    def __init__(self, broker, channel):
+        super().__init__(name=f'events-listen-{channel}', daemon=True)
+        self.broker = broker
+        self.channel = channel
+
+    def connect(self):
+        import psycopg2
+
+        # A dedicated socket, a pooled connection would be held forever
+        conn = psycopg2.connect(**connection.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def run(self):
+        delay = 1
+        while True:
+            conn = None
+            try:
+                conn = self.connect()
+                delay = 1
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.broker.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception('Lost the %s listener', self.channel)
+                if conn is not None:
+                    conn.close()
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+broker = EventBroker(
+    buffer_size=getattr(settings, 'EVENTS_BUFFER_SIZE', 1000),
+)
+
+
+def publish(user_id, model, action, pk):
+    """Send a change event to every stream of the user"""
+    event = {
+        'id': None,
+        'user_id': user_id,
+        'model': model,
+        'action': action,
+        'pk': pk,
+    }
+    channel = getattr(settings, 'EVENTS_NOTIFY_CHANNEL', None)
+    if channel and connection.vendor == 'postgresql':
+        event['id'] = broker.next_id()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)', [channel, json.dumps(event)]
+            )
+    else:
+        broker.dispatch(event)
+    return event
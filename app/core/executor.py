@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def orm_executor():
+    """Return the bounded thread pool that runs blocking ORM calls
+
+    Size it at or below the database pool so threads never queue on a
+    connection checkout.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_ORM_THREADS', 8),
+                thread_name_prefix='orm',
+            )
+        return _executor
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Hand the connection back to the pool between calls
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run a blocking callable on the ORM thread pool and await it
+
+    The caller's context variables, such as the replica routing state,
+    travel with the call.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, func, args, kwargs)
+    return await loop.run_in_executor(orm_executor(), call)
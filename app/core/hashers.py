@@ -0,0 +1,36 @@
+"""Password hashers whose cost comes from settings
+
+Django's hashers fix their cost in class attributes. These read it from
+the ``PASSWORD_HASHER_*`` settings instead, so the costs recommended by
+``calibrate_hashers`` can be deployed through the environment. The
+algorithm names are Django's, existing hashes keep verifying, and since
+``must_update`` compares a stored hash with the configured cost, a
+password is rehashed with the new cost on its next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHER_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASHER_ARGON2_MEMORY_COST
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_HASHER_BCRYPT_ROUNDS
@@ -0,0 +1,177 @@
+"""Replay of writes retried with the same Idempotency-Key header
+
+The first request with a key claims it by inserting an ``IdempotencyKey``
+row, unique per user and key, runs and stores its response. Until the
+row expires, retries get that response back without running again, and
+a duplicate arriving while the first request is still in flight polls
+for its response instead of racing it. Only returned responses below 500
+are kept: an exception or a server error frees the key for a retry.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is in progress.'
+    default_code = 'idempotency_conflict'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used for another request.'
+    default_code = 'idempotency_key_reused'
+
+
+def _file_digest(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, File):
+        return _file_digest(value)
+    return str(value)
+
+
+def request_fingerprint(request):
+    """Hash the method, path and parsed body of a request
+
+    Works on the parsed data so a multipart retry with another boundary
+    still matches, uploaded files count by their content.
+    """
+    data = request.data
+    if hasattr(data, 'getlist'):
+        data = {key: data.getlist(key) for key in data}
+    body = json.dumps(data, sort_keys=True, default=_encode)
+    return hashlib.sha256(
+        f'{request.method} {request.path}\n{body}'.encode()
+    ).hexdigest()
+
+
+def claim(user_id, key, fingerprint):
+    """Claim a key for a request
+
+    Returns the key's row and whether this request claimed it. Expired
+    rows and claims held past ``IDEMPOTENCY_LOCK_SECONDS`` by a request
+    that never finished are taken over.
+    """
+    now = timezone.now()
+    fields = {
+        'fingerprint': fingerprint,
+        'status_code': None,
+        'response': None,
+        'locked_at': now,
+        'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    }
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user_id=user_id, key=key, **fields
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    taken = IdempotencyKey.objects.filter(
+        Q(expires_at__lte=now) |
+        Q(status_code__isnull=True, locked_at__lte=abandoned),
+        user_id=user_id, key=key,
+    ).update(**fields)
+    return IdempotencyKey.objects.get(user_id=user_id, key=key), bool(taken)
+
+
+def wait_for(record, fingerprint, deadline):
+    """Poll an in-flight claim until its response is stored"""
+    delay = POLL_INTERVAL
+    while record.status_code is None and record.fingerprint == fingerprint:
+        if time.monotonic() >= deadline:
+            raise IdempotencyConflict()
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_POLL_INTERVAL)
+        record.refresh_from_db()
+    return record
+
+
+def acquire(user_id, key, fingerprint):
+    """Claim a key, or wait for the row holding the first request's result
+
+    Returns the row and whether this request claimed it.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        try:
+            record, claimed = claim(user_id, key, fingerprint)
+            if claimed:
+                return record, True
+            return wait_for(record, fingerprint, deadline), False
+        except IdempotencyKey.DoesNotExist:
+            # The first request failed and freed the key, claim it
+            continue
+
+
+def idempotent(view_method):
+    """Honor the Idempotency-Key header on a DRF view method"""
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(view, request, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > 255:
+            raise ValidationError(
+                {HEADER: ['Must be between 1 and 255 characters.']}
+            )
+
+        user_id = request.user.pk
+        fingerprint = request_fingerprint(request)
+        record, claimed = acquire(user_id, key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            response = Response(record.response, status=record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        # Leave the row alone if a retry took over an overlong claim
+        held = IdempotencyKey.objects.filter(
+            pk=record.pk, locked_at=record.locked_at
+        )
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except BaseException:
+            held.delete()
+            raise
+        if response.status_code >= 500:
+            held.delete()
+        else:
+            held.update(
+                status_code=response.status_code, response=response.data
+            )
+        return response
+    return wrapper
@@ -0,0 +1,54 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.models import Post
+from core.rollups import post_day, rebuild_rollups
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the daily post activity rollups"""
+    help = 'Recompute the daily rollups of a range of days from the posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start', type=date.fromisoformat, default=None,
+            help='First day (YYYY-MM-DD), the oldest post by default',
+        )
+        parser.add_argument(
+            '--end', type=date.fromisoformat, default=None,
+            help='Last day (YYYY-MM-DD), today by default',
+        )
+        parser.add_argument(
+            '--days-per-batch', type=int, default=7,
+            help='Days rebuilt per transaction',
+        )
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start is None:
+            oldest = Post.objects.aggregate(oldest=Min('created_at'))
+            if oldest['oldest'] is None:
+                self.stdout.write('No posts to roll up')
+                return
+            start = post_day(oldest['oldest'])
+        end = end or timezone.localdate()
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        started = time.monotonic()
+        written = 0
+        step = timedelta(days=options['days_per_batch'])
+        first = start
+        while first <= end:
+            last = min(first + step - timedelta(days=1), end)
+            written += rebuild_rollups(first, last)
+            first = last + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} rollup rows for {start} to {end} in '
+            f'{time.monotonic() - started:.2f}s'
+        ))
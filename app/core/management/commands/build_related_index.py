@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from post.related import RelatedIndex, build_index, refresh_index
+
+
+class Command(BaseCommand):
+    """Django command to build the related posts similarity index"""
+    help = 'Build or refresh the related posts index, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild from scratch instead of folding in recent changes',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep refreshing every this many seconds',
+        )
+        parser.add_argument('--path', default=None)
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.RELATED_INDEX_PATH
+        full = options['full']
+        while True:
+            self.build(path, full)
+            if not options['interval']:
+                break
+            full = False
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def build(self, path, full):
+        started = time.monotonic()
+        index = None if full else self.load(path)
+        retention = settings.SYNC_TOMBSTONE_RETENTION_DAYS * 86400
+        if index is not None and time.time() - index.built_at < retention:
+            index, changed = refresh_index(index)
+            mode = f'Refreshed ({changed} posts changed)'
+        else:
+            index = build_index()
+            mode = 'Built'
+        index.save(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{mode} related posts index of {len(index.post_ids)} posts and '
+            f'{len(index.feature_keys)} tags and topics in '
+            f'{time.monotonic() - started:.2f}s'
+        ))
+
+    def load(self, path):
+        try:
+            return RelatedIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            return None
@@ -0,0 +1,102 @@
+import math
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+
+PASSWORD = 'calibration-password'
+
+
+def pbkdf2(cost):
+    hasher = hashers.PBKDF2PasswordHasher()
+    hasher.iterations = cost
+    return hasher
+
+
+def argon2(cost):
+    hasher = hashers.Argon2PasswordHasher()
+    hasher.time_cost = cost
+    hasher.memory_cost = settings.PASSWORD_HASHER_ARGON2_MEMORY_COST
+    return hasher
+
+
+def bcrypt(cost):
+    hasher = hashers.BCryptSHA256PasswordHasher()
+    hasher.rounds = cost
+    return hasher
+
+
+# Name, cost setting, hasher factory, cost for a target given a timing
+CANDIDATES = (
+    (
+        'pbkdf2_sha256', 'PASSWORD_HASHER_PBKDF2_ITERATIONS', pbkdf2,
+        lambda cost, ratio: max(10000, int(round(cost * ratio, -3))),
+    ),
+    (
+        'argon2', 'PASSWORD_HASHER_ARGON2_TIME_COST', argon2,
+        lambda cost, ratio: max(1, round(cost * ratio)),
+    ),
+    (
+        'bcrypt_sha256', 'PASSWORD_HASHER_BCRYPT_ROUNDS', bcrypt,
+        lambda cost, ratio: min(31, max(4, cost + round(math.log2(ratio)))),
+    ),
+)
+
+
+class Command(BaseCommand):
+    """Django command to recommend password hasher costs for this host"""
+    help = 'Time the available password hashers and recommend their costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms', type=float, default=100,
+            help='Time one login may spend hashing, in milliseconds',
+        )
+        parser.add_argument('--samples', type=int, default=5)
+
+    def timed(self, hasher, samples):
+        """Return the median milliseconds to hash a password"""
+        salt = hasher.salt()
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            hasher.encode(PASSWORD, salt)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def handle(self, *args, **options):
+        target, samples = options['target_ms'], options['samples']
+        recommended = []
+        self.stdout.write(
+            f'{"hasher":<15}{"cost":>10}{"ms":>9}'
+            f'{"recommended":>13}{"ms":>9}{"logins/s/core":>15}'
+        )
+        for name, setting, factory, scale in CANDIDATES:
+            cost = getattr(settings, setting)
+            try:
+                if factory(cost).library:
+                    factory(cost)._load_library()
+            except ValueError:
+                self.stdout.write(f'{name:<15}not installed')
+                continue
+
+            current_ms = self.timed(factory(cost), samples)
+            best = scale(cost, target / current_ms)
+            best_ms = self.timed(factory(best), samples)
+            recommended.append((setting, best))
+            self.stdout.write(
+                f'{name:<15}{cost:>10}{current_ms:>9.1f}'
+                f'{best:>13}{best_ms:>9.1f}{1000 / best_ms:>15.1f}'
+            )
+
+        self.stdout.write(
+            f'\nFor about {target:g}ms per login set in the environment:'
+        )
+        for setting, cost in recommended:
+            self.stdout.write(self.style.SUCCESS(f'{setting}={cost}'))
+        self.stdout.write(
+            'Stored passwords are rehashed at the new cost on next login.'
+        )
@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    """Django command to create and rotate the monthly post partitions"""
+    help = 'Create upcoming post partitions and detach expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--ahead', type=int,
+            default=settings.POST_PARTITION_MONTHS_AHEAD,
+            help='Months past the current one to create partitions for',
+        )
+        parser.add_argument(
+            '--retention-months', type=int,
+            default=settings.POST_PARTITION_RETENTION_MONTHS,
+            help='Detach partitions entirely older than this many months',
+        )
+        parser.add_argument(
+            '--detach-before', type=date.fromisoformat, default=None,
+            help='Detach partitions entirely before this day (YYYY-MM-DD)',
+        )
+        parser.add_argument('--list', action='store_true')
+        parser.add_argument(
+            '--if-partitioned', action='store_true',
+            help='Do nothing when core_post is not partitioned',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not partitions.is_partitioned(using=using):
+            if options['if_partitioned']:
+                self.stdout.write('core_post is not partitioned')
+                return
+            raise CommandError(
+                'core_post is not partitioned, this needs PostgreSQL 11+ '
+                'and migration core 0015'
+            )
+
+        if options['list']:
+            for partition in partitions.list_partitions(using=using):
+                self.stdout.write(
+                    f'{partition.name}: {partition.lower or "MINVALUE"} '
+                    f'to {partition.upper or "MAXVALUE"}'
+                )
+            return
+
+        created = partitions.create_partitions(
+            ahead=options['ahead'], using=using
+        )
+        before = options['detach_before']
+        if before is None and options['retention_months'] is not None:
+            before = partitions.add_months(
+                timezone.now().date(), -options['retention_months']
+            )
+        detached = []
+        if before is not None:
+            detached = partitions.detach_partitions(before, using=using)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} partitions, '
+            f'detached {", ".join(detached) or "none"}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Django command to delete expired idempotency keys"""
+    help = 'Delete stored Idempotency-Key responses past their TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+        purged = 0
+        while True:
+            ids = list(
+                expired.values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            purged += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Purged {purged} idempotency keys')
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.throttling import purge_buckets
+
+
+class Command(BaseCommand):
+    """Django command to delete throttle buckets that are full again"""
+    help = 'Delete the throttle buckets of callers gone quiet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        purged = purge_buckets(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Purged {purged} throttle buckets')
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import RevokedToken
+from user.authentication import token_expiry_cutoff
+
+
+class Command(BaseCommand):
+    """Django command to delete expired auth tokens in small batches"""
+    help = 'Delete expired auth tokens and token revocations in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches to spare the database',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for name, expired in (
+            ('tokens', Token.objects.filter(
+                created__lt=token_expiry_cutoff(now)
+            )),
+            ('revocations', RevokedToken.objects.filter(expires_at__lt=now)),
+        ):
+            started = time.monotonic()
+            purged = self.purge(expired, options['batch_size'],
+                                options['pause'])
+            elapsed = time.monotonic() - started
+            rate = purged / elapsed if elapsed else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'Purged {purged} expired {name} in {elapsed:.2f}s '
+                f'({rate:.0f} rows/s)'
+            ))
+
+    def purge(self, expired, batch_size, pause):
+        """Delete in batches, each its own short statement and lock set"""
+        model = expired.model
+        purged = 0
+        while True:
+            pks = list(
+                expired.values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return purged
+            purged += model.objects.filter(pk__in=pks).delete()[0]
+            if pause:
+                time.sleep(pause)
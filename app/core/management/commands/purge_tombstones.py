@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Django command to delete tombstones past their retention"""
+    help = 'Delete delta sync tombstones older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        )
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)
+        purged = 0
+        while True:
+            ids = list(
+                expired.values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            purged += Tombstone.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} tombstones'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.counters import recount_posts
+from core.models import Post, Tag, Topic
+
+
+class Command(BaseCommand):
+    """Django command to recompute the post counters of tags and topics"""
+    help = 'Recompute Tag.post_count and Topic.post_count from the posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        tags = recount_posts(
+            Tag, Post.tags.through, 'tag', options['batch_size']
+        )
+        topics = recount_posts(
+            Topic, Post.topics.through, 'topic', options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {tags} tags and {topics} topics '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
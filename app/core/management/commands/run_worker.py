@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.worker import Worker
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+    help = 'Run background jobs from the queue until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Jobs run at once, keep it under DB_POOL_MAX_SIZE',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1,
+            help='Jobs each thread claims at once',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds an idle thread waits before looking again',
+        )
+        parser.add_argument(
+            '--until-empty', action='store_true',
+            help='Exit once no job is due instead of waiting for more',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            until_empty=options['until_empty'],
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        started = time.monotonic()
+        worker.run()
+        elapsed = time.monotonic() - started
+        done = worker.passed + worker.failed
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {done} jobs ({worker.failed} failed) in {elapsed:.2f}s '
+            f'({done / elapsed if elapsed else 0:.0f} jobs/s)'
+        ))
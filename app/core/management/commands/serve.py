@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.module_loading import import_string
+from gunicorn.app.base import BaseApplication
+
+from core.db.pool import close_pools
+
+
+def default_workers(interface, cpu_count=None):
+    """Return the worker process count for the host CPU count
+
+    Sync workers block on the database, so WSGI runs two per CPU plus one.
+    ASGI workers multiplex connections on an event loop, one per CPU.
+    """
+    cpus = cpu_count or multiprocessing.cpu_count()
+    if interface == 'asgi':
+        return cpus
+    return cpus * 2 + 1
+
+
+def pre_fork(server, worker):
+    """Drop database sockets before the preloaded master forks
+
+    A forked worker must never share a connection with its siblings.
+    """
+    close_pools()
+    connections.close_all()
+
+
+class ServeApplication(BaseApplication):
+    """Gunicorn application serving an already configured Django project"""
+
+    def __init__(self, loader, options):
+        self.loader = loader
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.loader()
+
+
+class Command(BaseCommand):
+    """Django command to run the project under gunicorn for production"""
+    help = 'Serve app.wsgi (or app.asgi) with preloaded gunicorn workers'
+
+    def add_arguments(self, parser):
+        env = os.environ.get
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='Serve app.asgi with uvicorn workers instead of app.wsgi',
+        )
+        parser.add_argument('--bind', default=env('BIND', '0.0.0.0:8000'))
+        parser.add_argument(
+            '--workers', type=int, default=env('WEB_CONCURRENCY'),
+            help='Worker processes, derived from the CPU count by default',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=int(env('WEB_THREADS', 4)),
+            help='Threads per WSGI worker, keep it under DB_POOL_MAX_SIZE',
+        )
+        parser.add_argument(
+            '--max-requests', type=int,
+            default=int(env('WEB_MAX_REQUESTS', 1000)),
+            help='Recycle a worker after this many requests (0 disables)',
+        )
+        parser.add_argument(
+            '--max-requests-jitter', type=int,
+            default=int(env('WEB_MAX_REQUESTS_JITTER', 100)),
+            help='Random extra requests so workers do not recycle together',
+        )
+        parser.add_argument('--timeout', type=int, default=30)
+        parser.add_argument(
+            '--graceful-timeout', type=int, default=30,
+            help='Seconds in-flight requests get to finish on shutdown',
+        )
+        parser.add_argument(
+            '--print-config', action='store_true',
+            help='Print the resolved gunicorn settings and exit',
+        )
+
+    def build_options(self, options):
+        """Translate command options into gunicorn settings"""
+        interface = 'asgi' if options['asgi'] else 'wsgi'
+        workers = options['workers'] or default_workers(interface)
+        config = {
+            'bind': options['bind'],
+            'workers': int(workers),
+            'preload_app': True,
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            'graceful_timeout': options['graceful_timeout'],
+            'keepalive': 5,
+            'pre_fork': pre_fork,
+            'accesslog': '-',
+        }
+        if interface == 'asgi':
+            config['worker_class'] = 'uvicorn.workers.UvicornWorker'
+        else:
+            config['worker_class'] = 'gthread'
+            config['threads'] = options['threads']
+        return config
+
+    def handle(self, *args, **options):
+        config = self.build_options(options)
+        if options['print_config']:
+            for key, value in sorted(config.items()):
+                if not callable(value):
+                    self.stdout.write(f'{key} = {value}')
+            return
+
+        path = (
+            settings.ASGI_APPLICATION if options['asgi']
+            else settings.WSGI_APPLICATION
+        )
+        ServeApplication(lambda: import_string(path), config).run()
@@ -0,0 +1,88 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.querylog import read_log
+
+
+SORT_KEYS = {
+    'total': lambda stats: stats['total_ms'],
+    'max': lambda stats: stats['max_ms'],
+    'mean': lambda stats: stats['total_ms'] / stats['count'],
+    'count': lambda stats: stats['count'],
+}
+
+
+def summarize(entries):
+    """Group log entries by fingerprint"""
+    summary = {}
+    for entry in entries:
+        stats = summary.setdefault(entry['fingerprint'], {
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'sql': entry['sql'],
+            'call_sites': Counter(),
+            'paths': Counter(),
+            'plan': None,
+        })
+        stats['count'] += 1
+        stats['total_ms'] += entry['duration_ms']
+        stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+        stats['call_sites'][entry.get('call_site') or '-'] += 1
+        stats['paths'][entry.get('path') or '-'] += 1
+        if entry.get('plan'):
+            stats['plan'] = entry['plan']
+    return summary
+
+
+class Command(BaseCommand):
+    """Django command to summarize the slow query log"""
+    help = 'Print the queries that took the most time in the slow query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS),
+                            default='total')
+        parser.add_argument('--hours', type=float,
+                            help='Only count queries of the last hours')
+        parser.add_argument('--log', help='Log file to read')
+        parser.add_argument('--plans', action='store_true',
+                            help='Print the latest captured plan of each')
+
+    def handle(self, *args, **options):
+        entries = read_log(options['log'])
+        if options['hours'] is not None:
+            since = timezone.now() - timedelta(hours=options['hours'])
+            entries = (
+                entry for entry in entries
+                if parse_datetime(entry['time']) >= since
+            )
+        summary = summarize(entries)
+        if not summary:
+            self.stdout.write('No slow queries logged')
+            return
+
+        ranked = sorted(
+            summary.items(),
+            key=lambda item: SORT_KEYS[options['sort']](item[1]),
+            reverse=True,
+        )[:options['limit']]
+        for digest, stats in ranked:
+            mean = stats['total_ms'] / stats['count']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{digest}  {stats["count"]} runs  '
+                f'total {stats["total_ms"]:.0f} ms  '
+                f'mean {mean:.1f} ms  max {stats["max_ms"]:.1f} ms'
+            ))
+            self.stdout.write(f'  {stats["sql"][:500]}')
+            for site, count in stats['call_sites'].most_common(3):
+                self.stdout.write(f'  from {site} ({count})')
+            for path, count in stats['paths'].most_common(3):
+                self.stdout.write(f'  on {path} ({count})')
+            if options['plans'] and stats['plan']:
+                for line in stats['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.throttling import reset_throttled_counts, throttled_counts
+
+
+class Command(BaseCommand):
+    """Django command to show how many requests each throttle refused"""
+    help = 'Print the throttled request counts per rate, optionally reset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Zero the counts after printing them')
+
+    def handle(self, *args, **options):
+        for name, count in throttled_counts().items():
+            rate = settings.THROTTLE_RATES[name]
+            self.stdout.write(f'{name:<24} {rate:>10} {count:>10}')
+        if options['reset']:
+            reset_throttled_counts()
+            self.stdout.write(self.style.SUCCESS('Reset throttle counts'))
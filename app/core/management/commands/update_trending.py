@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.trending import update_trending
+
+
+class Command(BaseCommand):
+    """Django command to update the trending tag and topic scores"""
+    help = 'Fold new tag and topic uses into the trending scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep updating every this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counted = update_trending(
+                timezone.now(), batch_size=options['batch_size']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Counted {counted} tag and topic uses in '
+                f'{time.monotonic() - started:.2f}s'
+            ))
+            if not options['interval']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -1,21 +1,108 @@
+import random
 import time
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
+    help = 'Wait until the database answers queries (and is migrated)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to wait for',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0.1,
+            help='First delay between attempts, doubled on every retry',
+        )
+        parser.add_argument(
+            '--max-interval', type=float, default=5,
+            help='Upper bound for the delay between attempts',
+        )
+        parser.add_argument(
+            '--migrations', action='store_true',
+            help='Also wait until every migration has been applied',
+        )
+
+    def check_connection(self, alias):
+        """Open a connection and run a trivial query on it"""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            # Make the next attempt open a fresh socket
+            connection.close()
+            raise
+
+    def pending_migrations(self, alias):
+        """Return the migrations not applied to the database yet"""
+        connection = connections[alias]
+        try:
+            executor = MigrationExecutor(connection)
+            targets = executor.loader.graph.leaf_nodes()
+            return executor.migration_plan(targets)
+        except OperationalError:
+            connection.close()
+            raise
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for DataBase...')
-        db_conn = None
+        alias = options['database']
+        self.started = time.monotonic()
+        self.deadline = self.started + options['timeout']
+        self.delay = options['interval']
+        self.max_delay = options['max_interval']
+        self.attempts = 0
 
-        while not db_conn:
+        while True:
             try:
-                db_conn = connections['default']
+                self.check_connection(alias)
+                break
             except OperationalError:
-                self.stdout.write('DataBase unavailable, waiting 1 second...')
-                time.sleep(1)
+                self.backoff('DataBase unavailable')
+        connected = time.monotonic()
+        timings = [('connect', connected - self.started)]
+
+        if options['migrations']:
+            while True:
+                try:
+                    pending = self.pending_migrations(alias)
+                except OperationalError:
+                    # The database restarted, e.g. while being migrated
+                    self.backoff('DataBase unavailable')
+                    continue
+                if not pending:
+                    break
+                self.backoff(f'{len(pending)} migrations pending')
+            timings.append(('migrations', time.monotonic() - connected))
+
+        total = time.monotonic() - self.started
+        breakdown = ', '.join(f'{name} {secs:.3f}s' for name, secs in timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'DataBase available after {self.attempts + 1} attempts '
+            f'in {total:.3f}s ({breakdown})'
+        ))
 
-        self.stdout.write(self.style.SUCCESS('DataBase available'))
+    def backoff(self, reason):
+        """Sleep with exponential backoff and jitter, or give up"""
+        self.attempts += 1
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise CommandError(
+                f'{reason}, giving up after {self.attempts} attempts'
+            )
+        # Equal jitter keeps restarts from probing the database in lockstep
+        delay = min(self.delay, self.max_delay)
+        delay = min(delay / 2 + random.uniform(0, delay / 2), remaining)
+        self.stdout.write(f'{reason}, waiting {delay:.2f} seconds...')
+        time.sleep(delay)
+        self.delay *= 2
@@ -0,0 +1,109 @@
+import asyncio
+
+from django.conf import settings
+
+from core import querylog, routers
+from core.executor import run_sync
+from user import tokens
+from user.authentication import SignedTokenAuthentication
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def request_identity(request):
+    """Return what identifies the caller of a request, without the database
+
+    A signed access token names its user, so every token of a user shares
+    the user's pin. A DRF token is the only one of its user (logging in
+    replaces it), so the header stands in for the user, as does the
+    session cookie for the admin.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        keyword, _, token = authorization.partition(' ')
+        if keyword.lower() == SignedTokenAuthentication.keyword.lower():
+            try:
+                claims = tokens.verify(token.strip(), tokens.ACCESS)
+            except tokens.InvalidToken:
+                return None
+            return f'user:{claims.user_id}'
+        return f'auth:{authorization}'
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return f'session:{session_key}'
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """Serve safe requests from replicas unless the caller wrote recently"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Lets Django call this middleware without a thread hop
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def may_use_replicas(self, request):
+        return (
+            request.method in SAFE_METHODS and
+            bool(routers.replica_aliases())
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        identity = request_identity(request)
+        may_use_replicas = self.may_use_replicas(request)
+        pinned = bool(
+            may_use_replicas and identity and routers.is_pinned(identity)
+        )
+
+        with routers.replica_reads(may_use_replicas and not pinned,
+                                   pinned) as state:
+            response = self.get_response(request)
+
+        if state.wrote and identity and routers.replica_aliases():
+            routers.pin_to_primary(identity)
+        return response
+
+    async def __acall__(self, request):
+        identity = request_identity(request)
+        may_use_replicas = self.may_use_replicas(request)
+        pinned = False
+        if may_use_replicas and identity:
+            pinned = await run_sync(routers.is_pinned, identity)
+
+        with routers.replica_reads(may_use_replicas and not pinned,
+                                   pinned) as state:
+            response = await self.get_response(request)
+
+        if state.wrote and identity and routers.replica_aliases():
+            await run_sync(routers.pin_to_primary, identity)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Attribute slow queries to the path of the request running them"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with querylog.request_path(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with querylog.request_path(f'{request.method} {request.path}'):
+            return await self.get_response(request)
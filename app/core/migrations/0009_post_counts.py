@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+from core.counters import recount_posts
+
+
+def backfill_post_counts(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    recount_posts(apps.get_model('core', 'Tag'), Post.tags.through, 'tag')
+    recount_posts(
+        apps.get_model('core', 'Topic'), Post.topics.through, 'topic'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sync_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-post_count'], name='core_tag_user_id_04f577_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['user', '-post_count'], name='core_topic_user_id_c841b0_idx'),
+        ),
+        migrations.RunPython(
+            backfill_post_counts, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+TABLES = ('core_tag', 'core_topic')
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = []
+    if vendor == 'postgresql':
+        statements.append('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in TABLES:
+        if vendor == 'postgresql':
+            # Prefix LIKE on lower(title) needs the pattern operator class
+            statements += [
+                f'CREATE INDEX {table}_user_title_prefix ON {table} '
+                f'(user_id, lower(title) varchar_pattern_ops)',
+                f'CREATE INDEX {table}_title_trgm ON {table} '
+                f'USING gin (lower(title) gin_trgm_ops)',
+            ]
+        else:
+            statements.append(
+                f'CREATE INDEX {table}_user_title_prefix ON {table} '
+                f'(user_id, lower(title))'
+            )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    for table in TABLES:
+        for suffix in ('user_title_prefix', 'title_trgm'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{suffix}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_post_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.counters import recount_posts
+
+
+def merge_duplicate_titles(apps, schema_editor):
+    """Fold tags and topics sharing a user and title into the oldest one
+
+    Merged-away rows get tombstones and the posts whose links moved are
+    marked changed, so delta sync clients drop the old ids.
+    """
+    Post = apps.get_model('core', 'Post')
+    Tombstone = apps.get_model('core', 'Tombstone')
+    now = timezone.now()
+    for model_name, field in (('Tag', 'tags'), ('Topic', 'topics')):
+        model = apps.get_model('core', model_name)
+        through = Post._meta.get_field(field).remote_field.through
+        column = f'{model_name.lower()}_id'
+        groups = (
+            model.objects.values('user_id', 'title')
+            .annotate(total=Count('id'), keep=Min('id'))
+            .filter(total__gt=1)
+        )
+        for group in groups:
+            keep = group['keep']
+            duplicates = list(
+                model.objects.filter(
+                    user_id=group['user_id'], title=group['title']
+                ).exclude(id=keep).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{column: keep})
+                .values_list('post_id', flat=True)
+            )
+            links = through.objects.filter(**{f'{column}__in': duplicates})
+            Post.objects.filter(
+                id__in=links.values('post_id')
+            ).update(updated_at=now)
+            for link in links:
+                if link.post_id in linked:
+                    link.delete()
+                else:
+                    setattr(link, column, keep)
+                    link.save()
+                    linked.add(link.post_id)
+            model.objects.filter(id__in=duplicates).delete()
+            Tombstone.objects.bulk_create([
+                Tombstone(
+                    user_id=group['user_id'],
+                    model=model_name.lower(),
+                    object_id=duplicate,
+                )
+                for duplicate in duplicates
+            ])
+        recount_posts(model, through, model_name.lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_titles, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Separate from the merge so its deferred constraint checks have
+    # fired before the tables are altered
+    dependencies = [
+        ('core', '0011_merge_duplicate_titles'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'title'), name='unique_tag_title_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='topic',
+            constraint=models.UniqueConstraint(fields=('user', 'title'), name='unique_topic_title_per_user'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 3.1.14 on 2026-10-19 09:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Cast
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_created_at(apps, schema_editor):
+    # Creation times were never stored. The day of the last change is the
+    # best guess, at midnight UTC: updated_at only dates from 0008, which
+    # stamped every older post with the time it ran
+    Post = apps.get_model('core', 'Post')
+    Post.objects.update(
+        created_at=Cast('date', models.DateTimeField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPostCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyTagCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyTopicCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at'], name='core_post_created_2da706_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailytopiccount',
+            name='topic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.topic'),
+        ),
+        migrations.AddField(
+            model_name='dailytopiccount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailytagcount',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag'),
+        ),
+        migrations.AddField(
+            model_name='dailytagcount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailypostcount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytopiccount',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'topic'), name='unique_daily_topic_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytagcount',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'tag'), name='unique_daily_tag_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypostcount',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_daily_post_count'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.migrations.exceptions import IrreversibleError
+
+from core.partitions import is_partitioned, partition_table
+
+
+def partition_posts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or is_partitioned(
+            'core_post', connection.alias):
+        return
+    # Partitioned tables arrived in PostgreSQL 11
+    if connection.pg_version < 110000:
+        return
+    partition_table('core_post', 'created_at', using=connection.alias)
+
+
+def unpartition_posts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql' and is_partitioned(
+            'core_post', connection.alias):
+        # The foreign keys to core_post are triggers now, and its primary
+        # key spans created_at
+        raise IrreversibleError(
+            'core_post is partitioned, it cannot be turned back into a '
+            'plain table'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_posts, unpartition_posts),
+    ]
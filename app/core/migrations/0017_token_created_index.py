@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+INDEX = 'authtoken_token_created_idx'
+
+
+def create_index(apps, schema_editor):
+    # authtoken has no index on created, the expired token purge needs one
+    concurrently = (
+        'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql'
+        else ''
+    )
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX} '
+        f'ON authtoken_token (created)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0016_revoked_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
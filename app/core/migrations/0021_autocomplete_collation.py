@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+TABLES = ('core_tag', 'core_topic')
+
+
+def rebuild_indexes(apps, schema_editor):
+    """Match the prefix index to the query ordering, scope trigrams per user
+
+    A varchar_pattern_ops index serves LIKE but not ORDER BY under a non-C
+    collation, and a trigram index without user_id matches every user's
+    titles before the user filter applies.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    for table in TABLES:
+        for statement in (
+            f'DROP INDEX IF EXISTS {table}_user_title_prefix',
+            f'CREATE INDEX {table}_user_title_prefix ON {table} '
+            f'(user_id, (lower(title) COLLATE "C"))',
+            f'DROP INDEX IF EXISTS {table}_title_trgm',
+            f'CREATE INDEX {table}_title_trgm ON {table} '
+            f'USING gin (user_id, lower(title) gin_trgm_ops)',
+        ):
+            schema_editor.execute(statement)
+
+
+def restore_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        for statement in (
+            f'DROP INDEX IF EXISTS {table}_user_title_prefix',
+            f'CREATE INDEX {table}_user_title_prefix ON {table} '
+            f'(user_id, lower(title) varchar_pattern_ops)',
+            f'DROP INDEX IF EXISTS {table}_title_trgm',
+            f'CREATE INDEX {table}_title_trgm ON {table} '
+            f'USING gin (lower(title) gin_trgm_ops)',
+        ):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_post_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_indexes, restore_indexes),
+    ]
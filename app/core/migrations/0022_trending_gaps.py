@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_autocomplete_collation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingstate',
+            name='tag_gaps',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='trendingstate',
+            name='topic_gaps',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_trending_gaps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('full_at', models.FloatField()),
+                ('allowed', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_throttle_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottledCount',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,10 +1,12 @@
 import uuid
 import os
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 def post_image_file_path(instance, filename):
@@ -56,6 +58,19 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', '-post_count']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'title'], name='unique_tag_title_per_user'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -68,6 +83,19 @@ class Topic(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', '-post_count']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'title'], name='unique_topic_title_per_user'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -85,6 +113,266 @@ class Post(models.Model):
     topics = models.ManyToManyField('Topic')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=post_image_file_path)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Moves on with every save and change of tags or topics, see save()
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        """Save and move the version on
+
+        The UPDATE moves the stored version on, whatever this instance
+        read, so concurrent saves each get a version of their own; the new
+        one is read back while the UPDATE still holds the row.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        read = self.version
+        self.version = models.F('version') + 1
+        try:
+            with transaction.atomic(using=kwargs.get('using'),
+                                    savepoint=False):
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields=['version'])
+        except BaseException:
+            self.version = read
+            raise
+
+
+class Tombstone(models.Model):
+    """Record of a deleted post, tag or topic for delta sync clients"""
+    # No constraint: tombstones outlive the rows, and the user row while
+    # its own posts are being deleted by a cascade
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'deleted_at'])]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class TrendingScore(models.Model):
+    """Exponentially decayed usage of a tag or topic title by all users
+
+    Scores are kept relative to the landmark time of ``TrendingState``, so
+    new usage only ever adds to a row and ordering by score stays valid
+    without decaying every row on each run.
+    """
+    TAG = 'tag'
+    TOPIC = 'topic'
+    KIND_CHOICES = ((TAG, 'Tag'), (TOPIC, 'Topic'))
+
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    title = models.CharField(max_length=255)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', '-score'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'title'],
+                name='unique_trending_title_per_kind'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.title}'
+
+
+class TrendingState(models.Model):
+    """Progress of the trending aggregation job (a single row)"""
+    landmark = models.DateTimeField()
+    last_tag_use = models.BigIntegerField(default=0)
+    last_topic_use = models.BigIntegerField(default=0)
+    # Skipped ids below the cursors that may still commit, with the time
+    # they were first skipped
+    tag_gaps = models.JSONField(default=dict)
+    topic_gaps = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DailyPostCount(models.Model):
+    """Posts a user created on a day, kept current by the post signals"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day'], name='unique_daily_post_count'
+            ),
+        ]
+
+
+class DailyTagCount(models.Model):
+    """Posts a user created on a day with a tag"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    day = models.DateField()
+    tag = models.ForeignKey('Tag', on_delete=models.CASCADE)
+    posts = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'tag'], name='unique_daily_tag_count'
+            ),
+        ]
+
+
+class DailyTopicCount(models.Model):
+    """Posts a user created on a day with a topic"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    day = models.DateField()
+    topic = models.ForeignKey('Topic', on_delete=models.CASCADE)
+    posts = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'topic'],
+                name='unique_daily_topic_count'
+            ),
+        ]
+
+
+class RevokedToken(models.Model):
+    """Id of a signed token revoked before its expiry"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class IdempotencyKey(models.Model):
+    """First response to a write sent with an Idempotency-Key header
+
+    The status code stays null while the first request is in flight.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'], name='unique_idempotency_key'
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """A call of a registered background task, see ``core.tasks``"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default=QUEUED
+    )
+    # Higher runs first among the jobs due
+    priority = models.SmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan the queued jobs
+            models.Index(
+                fields=['-priority', 'run_at'],
+                name='core_job_queued',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class JobSchedule(models.Model):
+    """Next run of a recurring task from ``TASK_SCHEDULES``"""
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.name
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a throttle, see ``core.throttling``
+
+    full_at is the Unix time the bucket is full again, allowed whether
+    the latest request taken out of it was let through.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    full_at = models.FloatField()
+    allowed = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.key
+
+
+class ThrottledCount(models.Model):
+    """Requests a throttle rate refused, see ``core.throttling``"""
+    name = models.CharField(max_length=100, primary_key=True)
+    count = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,361 @@
+"""Monthly range partitions of the post table on PostgreSQL
+
+Migration 0015 turns ``core_post`` into a table partitioned by
+``created_at``, so queries on a range of creation times only scan the
+months they cover and old months can be detached into plain tables for
+archival. Partitions are named ``<table>_pYYYY_MM``, a row outside every
+range lands in ``<table>_default`` until its month is created. The
+``manage_partitions`` command creates the months ahead and detaches the
+expired ones.
+
+PostgreSQL only allows foreign keys on the whole partition key, so the
+ones into the table (e.g. ``core_post_tags.post_id``) are replaced with
+deferred constraint triggers doing the same check.
+"""
+from collections import namedtuple
+from datetime import date
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+
+TABLE = 'core_post'
+
+# Trigger function behind the foreign keys into a partitioned table. Its
+# arguments are the referencing table, its column and the referenced
+# table, the key is always id. A row must not reference a missing id once
+# the transaction ends: checked after writes to the referencing column,
+# and after deletes and key changes on the referenced side, where a row
+# moved between partitions is found again. The referenced row is locked
+# like a foreign key does so a concurrent delete waits.
+REFERENCE_CHECK = 'check_partitioned_reference'
+
+REFERENCE_CHECK_FUNCTION = f'''
+CREATE OR REPLACE FUNCTION {REFERENCE_CHECK}() RETURNS trigger AS $$
+DECLARE
+    value bigint;
+    found integer;
+BEGIN
+    IF TG_RELID = TG_ARGV[0]::regclass THEN
+        EXECUTE format('SELECT ($1).%I', TG_ARGV[1]) INTO value USING NEW;
+        IF value IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE format(
+            'SELECT 1 FROM %s WHERE id = $1 FOR KEY SHARE', TG_ARGV[2]
+        ) USING value;
+    ELSE
+        value := OLD.id;
+        EXECUTE format('SELECT 1 FROM %s WHERE id = $1', TG_ARGV[2])
+            USING value;
+    END IF;
+    GET DIAGNOSTICS found = ROW_COUNT;
+    IF found > 0 THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'SELECT 1 FROM %s WHERE %I = $1 LIMIT 1', TG_ARGV[0], TG_ARGV[1]
+    ) USING value;
+    GET DIAGNOSTICS found = ROW_COUNT;
+    IF found > 0 THEN
+        RAISE foreign_key_violation USING
+            MESSAGE = format(
+                '%s.%s references missing %s id %s',
+                TG_ARGV[0], TG_ARGV[1], TG_ARGV[2], value
+            ),
+            CONSTRAINT = TG_NAME;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+'''
+
+Partition = namedtuple('Partition', 'name lower upper')
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    """Return the first day of the month months after the month of day"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def _bound(expression):
+    expression = expression.strip()
+    if expression in ('MINVALUE', 'MAXVALUE'):
+        return None
+    # e.g. '2024-03-01 00:00:00+00', ranges always start at midnight UTC
+    return date.fromisoformat(expression.strip("'")[:10])
+
+
+def is_partitioned(table=TABLE, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = to_regclass(%s)', [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table=TABLE, using='default'):
+    """Return the range partitions of a table, oldest first
+
+    Bounds are dates, None for MINVALUE and MAXVALUE. The default
+    partition is left out.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) '
+            'FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass', [table]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        if bound == 'DEFAULT':
+            continue
+        lower, upper = bound[len('FOR VALUES FROM ('):-1].split(') TO (')
+        partitions.append(Partition(name, _bound(lower), _bound(upper)))
+    return sorted(partitions, key=lambda p: p.lower or date.min)
+
+
+def partition_key(table=TABLE, using='default'):
+    """Return the column a table is range partitioned on"""
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT pg_get_partkeydef(%s::regclass)', [table])
+        # e.g. 'RANGE (created_at)'
+        return cursor.fetchone()[0][len('RANGE ('):-1]
+
+
+def list_references(table=TABLE, using='default'):
+    """Return the (table, column) pairs referencing a partitioned table"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT tgargs FROM pg_trigger '
+            'WHERE tgrelid = %s::regclass AND tgfoid = %s::regproc',
+            [table, REFERENCE_CHECK],
+        )
+        rows = cursor.fetchall()
+    return sorted(
+        tuple(bytes(args).decode().split('\0')[:2]) for args, in rows
+    )
+
+
+def add_reference(name, referencing, column, table=TABLE, using='default'):
+    """Check referencing.column against the ids of a partitioned table
+
+    Stands in for the foreign key PostgreSQL does not allow, deferred to
+    the end of the transaction like the ones Django creates.
+    """
+    quote = connections[using].ops.quote_name
+    args = f"'{referencing}', '{column}', '{table}'"
+    with connections[using].cursor() as cursor:
+        cursor.execute(REFERENCE_CHECK_FUNCTION)
+        for events, target in (
+                (f'INSERT OR UPDATE OF {quote(column)}', referencing),
+                ('DELETE OR UPDATE OF id', table)):
+            cursor.execute(
+                f'CREATE CONSTRAINT TRIGGER {quote(name)} AFTER {events} '
+                f'ON {target} DEFERRABLE INITIALLY DEFERRED FOR EACH ROW '
+                f'EXECUTE FUNCTION {REFERENCE_CHECK}({args})'
+            )
+
+
+def create_partitions(table=TABLE, ahead=3, start=None, using='default'):
+    """Create the monthly partitions up to ahead months past this one
+
+    Continues after the newest partition, or from the month of start for
+    a table without any. Also creates the default partition, and moves
+    the rows it holds for a month into that month's partition when it is
+    created. Returns the names of the partitions created.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    partitions = list_partitions(table, using)
+    uppers = [p.upper for p in partitions if p.upper is not None]
+    this_month = month_of(timezone.now().date())
+    month = max(uppers) if uppers else month_of(start or this_month)
+    end = add_months(this_month, ahead + 1)
+    key = quote(partition_key(table, using))
+    default = quote(f'{table}_default')
+    in_month = f'{key} >= %s AND {key} < %s'
+
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {default} '
+            f'PARTITION OF {quote(table)} DEFAULT'
+        )
+        while month < end:
+            following = add_months(month, 1)
+            name = partition_name(table, month)
+            bounds = f"FOR VALUES FROM ('{month}') TO ('{following}')"
+            with transaction.atomic(using=using):
+                cursor.execute(
+                    f'SELECT 1 FROM {default} WHERE {in_month} LIMIT 1',
+                    [month, following],
+                )
+                if cursor.fetchone() is None:
+                    cursor.execute(
+                        f'CREATE TABLE {quote(name)} '
+                        f'PARTITION OF {quote(table)} {bounds}'
+                    )
+                else:
+                    # A partition can't be created over rows of its range
+                    # in the default one, they move in before it attaches
+                    cursor.execute(
+                        f'CREATE TABLE {quote(name)} (LIKE {quote(table)} '
+                        f'INCLUDING DEFAULTS INCLUDING STORAGE)'
+                    )
+                    cursor.execute(
+                        f'WITH moved AS (DELETE FROM {default} '
+                        f'WHERE {in_month} RETURNING *) '
+                        f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                        [month, following],
+                    )
+                    cursor.execute(
+                        f'ALTER TABLE {quote(table)} '
+                        f'ATTACH PARTITION {quote(name)} {bounds}'
+                    )
+            created.append(name)
+            month = following
+    return created
+
+
+def detach_partitions(before, table=TABLE, using='default'):
+    """Detach the partitions holding only rows created before a day
+
+    The detached tables keep their rows and can be dumped and dropped at
+    leisure. Rows referencing them, like the tag links of their posts,
+    are deleted; the daily repair_post_counts fixes the counters. The
+    detach locks the table, waiting for running queries on it. Returns
+    the names of the partitions detached.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    expired = [
+        p for p in list_partitions(table, using)
+        if p.upper is not None and p.upper <= before
+    ]
+    references = list_references(table, using)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for partition in expired:
+            for referencing, column in references:
+                cursor.execute(
+                    f'DELETE FROM {referencing} WHERE {quote(column)} '
+                    f'IN (SELECT id FROM {quote(partition.name)})'
+                )
+            cursor.execute(
+                f'ALTER TABLE {quote(table)} DETACH PARTITION '
+                f'{quote(partition.name)}'
+            )
+    return [partition.name for partition in expired]
+
+
+def partition_table(table=TABLE, key='created_at', ahead=3, using='default'):
+    """Turn a plain table into one range partitioned by month of key
+
+    The existing table becomes the partition of every row before next
+    month, so nothing is copied; it can be detached as a whole once all
+    of it is past retention. Foreign keys pointing at the table become
+    reference triggers, see ``add_reference``.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    legacy = f'{table}_legacy'
+    cutover = add_months(timezone.now().date(), 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.conrelid::regclass::text, c.conname, a.attname '
+            'FROM pg_constraint c JOIN pg_attribute a '
+            'ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1] '
+            "WHERE c.confrelid = %s::regclass AND c.contype = 'f'", [table]
+        )
+        references = cursor.fetchall()
+        for referencing, name, _ in references:
+            cursor.execute(
+                f'ALTER TABLE {referencing} DROP CONSTRAINT {quote(name)}'
+            )
+
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE tablename = %s AND indexname <> %s',
+            [table, f'{table}_pkey'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {legacy}')
+        cursor.execute(
+            f'ALTER INDEX {quote(f"{table}_pkey")} '
+            f'RENAME TO {quote(f"{legacy}_pkey")}'
+        )
+        for name, _ in indexes:
+            cursor.execute(
+                f'ALTER INDEX {quote(name)} RENAME TO {quote(f"{name}_l")}'
+            )
+
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} '
+            f'(LIKE {legacy} INCLUDING DEFAULTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE ({quote(key)})'
+        )
+        if sequence:
+            cursor.execute(
+                f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id'
+            )
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT '
+            f'{quote(f"{table}_pkey")} PRIMARY KEY (id, {quote(key)})'
+        )
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE {quote(table)} '
+                f'ADD CONSTRAINT {quote(name)} {definition}'
+            )
+
+        # The partition's primary key has to match the new one, and a
+        # validated CHECK lets ATTACH skip scanning the whole table
+        cursor.execute(
+            f'CREATE UNIQUE INDEX {legacy}_id_key ON {legacy} '
+            f'(id, {quote(key)})'
+        )
+        cursor.execute(
+            f'ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_pkey, '
+            f'ADD CONSTRAINT {legacy}_pkey PRIMARY KEY USING INDEX '
+            f'{legacy}_id_key'
+        )
+        cursor.execute(
+            f'ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_bound '
+            f"CHECK ({quote(key)} IS NOT NULL AND {quote(key)} < '{cutover}')"
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ATTACH PARTITION {legacy} '
+            f"FOR VALUES FROM (MINVALUE) TO ('{cutover}')"
+        )
+        cursor.execute(
+            f'ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_bound'
+        )
+    for referencing, name, column in references:
+        add_reference(name, referencing, column, table, using)
+    create_partitions(table, ahead, using=using)
@@ -0,0 +1,268 @@
+"""Log of slow database queries
+
+``record_slow_queries`` wraps every query run on a connection (hooked up
+on ``connection_created`` by the core app). Queries taking longer than
+``SLOW_QUERY_THRESHOLD_MS`` are written as JSON lines to a rotating file
+at ``SLOW_QUERY_LOG_PATH`` with their fingerprint, the SQL normalized so
+that every run of the same ORM query shares it, the line of project code
+that ran them and the path of the request being served.
+
+Reads slower than ``SLOW_QUERY_EXPLAIN_MS`` get their plan captured with
+a plain ``EXPLAIN``, which plans the statement without running it, for
+a sample of them and at most once per fingerprint every
+``SLOW_QUERY_EXPLAIN_INTERVAL`` seconds. A background thread explains
+them on a connection of its own and then writes their entry, so the
+request that ran the query does not wait. ``manage.py slow_queries``
+summarizes the log.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+
+_request_path = ContextVar('slow_query_request_path', default=None)
+_local = threading.local()
+
+_explained = {}
+_explained_lock = threading.Lock()
+
+_logger = None
+_logger_lock = threading.Lock()
+
+# Slow queries waiting for their plan, dropped to a plain entry when full
+_to_explain = queue.Queue(maxsize=100)
+_explainer = None
+_explainer_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_VALUES = re.compile(r'\bVALUES (\((?:[^()]|\([^()]*\))*\))(?:, \1)+',
+                     re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def normalize(sql):
+    """Return the SQL with literals and variable length lists collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES.sub(r'VALUES \1', sql)
+
+
+def fingerprint(sql):
+    """Return a short hash shared by every run of the same query"""
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+@contextmanager
+def request_path(path):
+    """Attribute the slow queries run inside the block to a request path"""
+    token = _request_path.set(path)
+    try:
+        yield
+    finally:
+        _request_path.reset(token)
+
+
+def call_site():
+    """Return 'file:line in function' of the innermost project frame"""
+    project = os.path.join(str(settings.BASE_DIR), '')
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (filename.startswith(project) and
+                filename != _THIS_FILE and
+                'site-packages' not in filename):
+            relative = os.path.relpath(filename, project)
+            return f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            path = settings.SLOW_QUERY_LOG_PATH
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            except OSError:
+                # The handler reports the failed writes on stderr
+                pass
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                delay=True,
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger(__name__)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+def reset_log():
+    """Close the log file once pending plans are in, the next slow query
+    opens it again"""
+    global _logger
+    _to_explain.join()
+    with _logger_lock:
+        if _logger is not None:
+            for handler in list(_logger.handlers):
+                _logger.removeHandler(handler)
+                handler.close()
+            _logger = None
+    with _explained_lock:
+        _explained.clear()
+
+
+def should_explain(sql, digest, duration_ms):
+    """Whether to capture the plan of a slow query"""
+    if duration_ms < settings.SLOW_QUERY_EXPLAIN_MS:
+        return False
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return False
+    if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        return False
+    now = time.monotonic()
+    with _explained_lock:
+        last = _explained.get(digest)
+        if (last is not None and
+                now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL):
+            return False
+        _explained[digest] = now
+    return True
+
+
+def explain(connection, sql, params):
+    """Return the plan of a query as text, or None when it failed"""
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    finally:
+        _local.explaining = False
+    return '\n'.join(
+        ' '.join(str(column) for column in row) for row in rows
+    )
+
+
+def _explain_pending():
+    while True:
+        entry, sql, params = _to_explain.get()
+        try:
+            connection = connections[entry['database']]
+            entry['plan'] = explain(connection, sql, params)
+            # Plans are rare, an idle connection would outlive its use
+            connection.close()
+            _get_logger().info(json.dumps(entry))
+        except Exception:
+            logging.getLogger(__name__).exception('Explaining failed')
+        finally:
+            _to_explain.task_done()
+
+
+def _explain_later(entry, sql, params):
+    """Log the entry once its plan is captured, or right away if busy"""
+    global _explainer
+    with _explainer_lock:
+        if _explainer is None:
+            _explainer = threading.Thread(
+                target=_explain_pending, name='slow-query-explain',
+                daemon=True,
+            )
+            _explainer.start()
+    try:
+        _to_explain.put_nowait((entry, sql, params))
+    except queue.Full:
+        _get_logger().info(json.dumps(entry))
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    """Execution wrapper logging the queries slower than the threshold"""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or getattr(_local, 'explaining', False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    succeeded = False
+    try:
+        result = execute(sql, params, many, context)
+        succeeded = True
+        return result
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= threshold:
+            _record(sql, params, many, context, duration_ms, succeeded)
+
+
+def _record(sql, params, many, context, duration_ms, succeeded):
+    connection = context['connection']
+    digest = fingerprint(sql)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'fingerprint': digest,
+        'duration_ms': round(duration_ms, 3),
+        'database': connection.alias,
+        'sql': normalize(sql),
+        'many': many,
+        'failed': not succeeded,
+        'call_site': call_site(),
+        'path': _request_path.get(),
+    }
+    if succeeded and not many and should_explain(sql, digest, duration_ms):
+        _explain_later(entry, sql, params)
+    else:
+        _get_logger().info(json.dumps(entry))
+
+
+def install(connection, **kwargs):
+    """Add the slow query wrapper to a connection, once"""
+    if record_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_queries)
+
+
+def read_log(path=None):
+    """Yield the entries of the log, oldest rotated file first"""
+    path = path or settings.SLOW_QUERY_LOG_PATH
+    files = [
+        f'{path}.{n}'
+        for n in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)
+    ] + [path]
+    for name in files:
+        try:
+            with open(name) as log:
+                for line in log:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash or a rotation
+                        continue
+        except FileNotFoundError:
+            continue
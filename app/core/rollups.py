@@ -0,0 +1,126 @@
+"""Daily rollups of post activity read by the analytics endpoint
+
+A post counts on the day it was created (in ``TIME_ZONE``), towards its
+user, and towards each of its tags and topics. The post signals keep the
+rollups in step with every create, delete and relation change through
+single-statement upserts; ``rebuild_rollups`` recomputes a range of days
+from the posts for the initial backfill or a repair.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import DailyPostCount, DailyTagCount, DailyTopicCount, \
+    Post, Tag
+
+
+RELATION_ROLLUPS = {
+    'tag': DailyTagCount,
+    'topic': DailyTopicCount,
+}
+
+KEY_COLUMNS = {
+    DailyPostCount: ('user_id', 'day'),
+    DailyTagCount: ('user_id', 'day', 'tag_id'),
+    DailyTopicCount: ('user_id', 'day', 'topic_id'),
+}
+
+
+def post_day(created_at):
+    """Return the day a post created at the given time counts for"""
+    return timezone.localdate(created_at)
+
+
+def bump(model, counts):
+    """Add to the post counts of rollup rows, creating the missing ones
+
+    counts maps key tuples (user id, day[, tag or topic id]) to deltas.
+    """
+    counts = {key: delta for key, delta in counts.items() if delta}
+    if not counts:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    keys = ', '.join(quote(column) for column in KEY_COLUMNS[model])
+    values = ', '.join(['%s'] * (len(KEY_COLUMNS[model]) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({keys}, posts) VALUES ({values}) '
+            f'ON CONFLICT ({keys}) DO UPDATE '
+            f'SET posts = {table}.posts + EXCLUDED.posts',
+            [(*key, delta) for key, delta in counts.items()],
+        )
+
+
+def count_post(post, delta):
+    """Count a created (1) or deleted (-1) post on its day"""
+    bump(DailyPostCount, {(post.user_id, post_day(post.created_at)): delta})
+
+
+def count_relations(model, links, delta):
+    """Count posts gaining (1) or losing (-1) tags or topics
+
+    links are (post id, tag or topic id) pairs and model is Tag or Topic.
+    """
+    if not links:
+        return
+    posts = dict(
+        (pk, (user_id, post_day(created_at)))
+        for pk, user_id, created_at in Post.objects.filter(
+            pk__in={post_id for post_id, _ in links}
+        ).values_list('pk', 'user_id', 'created_at')
+    )
+    counts = Counter()
+    for post_id, pk in links:
+        if post_id in posts:
+            counts[(*posts[post_id], pk)] += delta
+    rollup = DailyTagCount if model is Tag else DailyTopicCount
+    bump(rollup, counts)
+
+
+def rebuild_rollups(start, end):
+    """Recompute the rollups of the days start to end from the posts
+
+    Runs in one transaction, so rebuild long histories a slice at a time.
+    Returns the number of rollup rows written.
+    """
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start, time.min), tz)
+    upper = timezone.make_aware(
+        datetime.combine(end + timedelta(days=1), time.min), tz
+    )
+    written = 0
+    with transaction.atomic():
+        DailyPostCount.objects.filter(day__range=(start, end)).delete()
+        posts = (
+            Post.objects.filter(created_at__gte=lower, created_at__lt=upper)
+            .annotate(day=TruncDate('created_at'))
+            .values_list('user_id', 'day')
+            .annotate(posts=Count('id'))
+        )
+        written += len(DailyPostCount.objects.bulk_create(
+            DailyPostCount(user_id=user_id, day=day, posts=count)
+            for user_id, day, count in posts
+        ))
+
+        for field, rollup in RELATION_ROLLUPS.items():
+            rollup.objects.filter(day__range=(start, end)).delete()
+            through = Post._meta.get_field(f'{field}s').remote_field.through
+            links = (
+                through.objects.filter(
+                    post__created_at__gte=lower, post__created_at__lt=upper
+                )
+                .annotate(day=TruncDate('post__created_at'))
+                .values_list('post__user_id', 'day', f'{field}_id')
+                .annotate(posts=Count('id'))
+            )
+            written += len(rollup.objects.bulk_create(
+                rollup(user_id=user_id, day=day, posts=count,
+                       **{f'{field}_id': pk})
+                for user_id, day, pk, count in links
+            ))
+    return written
@@ -0,0 +1,162 @@
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+
+PIN_CACHE_PREFIX = 'replica-pin'
+
+_routing = ContextVar('replica_routing', default=None)
+_health = {}
+_health_lock = threading.Lock()
+
+
+class RoutingState:
+    """Per request routing decision shared with the database router
+
+    The replica is picked on the first read and kept for the rest of the
+    block, so one request never mixes replicas lagging by different
+    amounts. pinned is whether the caller wrote recently.
+    """
+
+    def __init__(self, use_replicas=False, pinned=False):
+        self.use_replicas = use_replicas
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+@contextmanager
+def replica_reads(use_replicas=True, pinned=False):
+    """Allow reads inside the block to be served by a replica"""
+    state = RoutingState(use_replicas, pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+def replica_aliases():
+    """Return the configured replica database aliases"""
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def _ping(alias):
+    """Run a trivial query against a database alias"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except DatabaseError:
+        # Drop the broken connection so the next check reconnects
+        connection.close()
+        return False
+
+
+def is_healthy(alias):
+    """Return whether a replica answered its most recent health check"""
+    interval = getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (True, None))
+    if checked_at is not None and now - checked_at < interval:
+        return healthy
+
+    healthy = _ping(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def mark_unhealthy(alias):
+    """Take a replica out of rotation until its next health check"""
+    with _health_lock:
+        _health[alias] = (False, time.monotonic())
+
+
+def reset_health():
+    """Forget every cached health check result"""
+    with _health_lock:
+        _health.clear()
+
+
+def choose_replica():
+    """Pick a healthy replica at random, or None when none is available"""
+    healthy = [alias for alias in replica_aliases() if is_healthy(alias)]
+    if not healthy:
+        return None
+    return random.choice(healthy)
+
+
+def _pin_key(identity):
+    digest = hashlib.sha256(identity.encode()).hexdigest()
+    return f'{PIN_CACHE_PREFIX}:{digest}'
+
+
+def pin_cache():
+    """Return the cache holding pins, shared by every worker process"""
+    return caches[getattr(settings, 'DATABASE_REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_to_primary(identity, seconds=None):
+    """Send reads for the identity to the primary for a while"""
+    if seconds is None:
+        seconds = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+    pin_cache().set(_pin_key(identity), True, seconds)
+
+
+def is_pinned(identity):
+    """Return whether the identity wrote recently"""
+    return bool(pin_cache().get(_pin_key(identity)))
+
+
+def reads_pinned():
+    """Return whether the caller being served must read its own writes"""
+    state = _routing.get()
+    return state is not None and state.pinned
+
+
+class PrimaryReplicaRouter:
+    """Route reads to the replicas and everything else to the primary
+
+    Reads only go to a replica inside a ``replica_reads`` block, which the
+    ``ReplicaRoutingMiddleware`` opens for safe requests. Once a write has
+    been routed in that block the remaining reads stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replicas or state.wrote:
+            return DEFAULT_DB_ALIAS
+        excluded = getattr(settings, 'DATABASE_REPLICA_EXCLUDED_APPS', ())
+        if model._meta.app_label in excluded:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = choose_replica() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
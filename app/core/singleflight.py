@@ -0,0 +1,183 @@
+"""Coalescing of identical concurrent reads (single-flight)
+
+When many requests for the same expensive read arrive together, e.g. a
+popular user's post list right after a change, only the first (the
+leader) runs it and the others wait for and share its result. Within a
+process waiters block on the leader's thread. With ``SINGLEFLIGHT_CACHE``
+set to a cache shared by every worker, one leader runs per key across
+processes: it holds a lock in the cache and stores its result there for
+the waiters of other processes.
+
+Only requests that overlap the leader share its result, nothing is
+cached past the end of the computation. Callers pinned to the primary
+after a write never share one: the leader may have started reading
+before their write committed. A waiter that times out or whose
+leader failed runs the read itself. Counts of each outcome are kept per
+process, see ``stats``.
+"""
+import collections
+import functools
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from core import routers
+
+
+KEY_PREFIX = 'singleflight'
+
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.1
+
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+_MISSING = object()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Return this process' counts of leaders, shared results and misses
+
+    ``shared`` and ``shared_remote`` are reads saved, ``timeouts`` and
+    ``failed`` are waiters that had to run the read themselves.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class _Call:
+    """A read in flight and, once done, its result"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+        self.waiters = 0
+
+
+class Group:
+    """Runs at most one call per key at a time, sharing its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return func's result and whether it was shared with the caller"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(settings.SINGLEFLIGHT_WAIT_SECONDS):
+                _count('timeouts')
+                return func(), False
+            if call.value is _MISSING:
+                _count('failed')
+                return func(), False
+            _count('shared')
+            return call.value, True
+
+        try:
+            call.value = _do_shared(key, func)
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+
+def _do_shared(key, func):
+    """Run func as the leader of every process sharing the cache"""
+    alias = settings.SINGLEFLIGHT_CACHE
+    if not alias:
+        _count('leaders')
+        return func()
+
+    cache = caches[alias]
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    lock_key = f'{KEY_PREFIX}:lock:{digest}'
+    wait = settings.SINGLEFLIGHT_WAIT_SECONDS
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, wait):
+        _count('leaders')
+        try:
+            value = func()
+            cache.set(f'{KEY_PREFIX}:result:{token}', value, wait)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Only the result of the computation in flight now may be shared
+    leader = cache.get(lock_key)
+    if leader is None:
+        _count('leaders')
+        return func()
+    result_key = f'{KEY_PREFIX}:result:{leader}'
+    deadline = time.monotonic() + wait
+    delay = POLL_INTERVAL
+    released = False
+    while not released and time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_POLL_INTERVAL)
+        # The leader stores its result before letting go of the lock
+        released = cache.get(lock_key) != leader
+        found = cache.get(result_key)
+        if found is not None:
+            _count('shared_remote')
+            return found
+
+    _count('failed' if released else 'timeouts')
+    return func()
+
+
+group = Group()
+
+
+def coalesce(view_method):
+    """Share a DRF read among identical concurrent requests
+
+    Requests are identical when they call the same view for the same user
+    with the same path and query string. Waiters get a response with the
+    leader's data and status, rendered for their own request. Requests
+    that must read their caller's own writes run on their own.
+    """
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        if not settings.SINGLEFLIGHT_ENABLED or routers.reads_pinned():
+            return view_method(view, request, *args, **kwargs)
+
+        key = (
+            f'{type(view).__module__}.{type(view).__qualname__}:'
+            f'{request.user.pk}:{request.get_full_path()}'
+        )
+        own = []
+
+        def read():
+            response = view_method(view, request, *args, **kwargs)
+            own.append(response)
+            return response.status_code, response.data
+
+        (status_code, data), _ = group.do(key, read)
+        if own:
+            return own[0]
+        return Response(data, status=status_code)
+    return wrapper
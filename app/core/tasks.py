@@ -0,0 +1,210 @@
+"""Background tasks queued in the database
+
+A task is a function registered with ``@task``. ``enqueue`` stores a
+``Job`` row calling it with JSON keyword arguments, to run as soon as
+possible or from ``run_at`` on. Workers (``manage.py run_worker``) claim
+the due jobs highest priority first with ``SELECT ... FOR UPDATE SKIP
+LOCKED``, so any number of them share the queue without waiting on each
+other's rows, and run them outside the claiming transaction. A failed
+job is retried with exponential backoff until it used ``max_attempts``;
+a job whose worker died is queued again once its lock is older than
+``TASK_LOCK_TIMEOUT``.
+
+Recurring tasks are listed in ``TASK_SCHEDULES``: whichever worker finds
+one due enqueues it and moves its next run forward.
+
+Tasks live in a ``tasks`` module of an installed app, which workers
+import on start.
+"""
+import random
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job, JobSchedule
+
+
+TaskSpec = namedtuple('TaskSpec', 'func priority max_attempts')
+
+_registry = {}
+
+
+def task(name, priority=0, max_attempts=5):
+    """Register a function as the task of the given name"""
+    def register(func):
+        _registry[name] = TaskSpec(func, priority, max_attempts)
+        func.task_name = name
+        return func
+    return register
+
+
+def discover_tasks():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, kwargs=None, priority=None, run_at=None,
+            max_attempts=None):
+    """Queue a call of a registered task, returns the job"""
+    spec = _registry[name]
+    return Job.objects.create(
+        task=name,
+        kwargs=kwargs or {},
+        priority=spec.priority if priority is None else priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or spec.max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt of a job that failed attempts times"""
+    delay = settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1)
+    delay = min(delay, settings.TASK_RETRY_MAX_DELAY)
+    # Jitter so jobs failing together do not all retry together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_jobs(worker, limit=1, now=None):
+    """Lock up to limit due jobs for a worker and return them"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        # Backends without row locks fall back on the status check here
+        Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker)
+        .order_by('-priority', 'run_at')
+    )
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome, returns whether it passed"""
+    spec = _registry.get(job.task)
+    try:
+        if spec is None:
+            raise LookupError(f'No task named {job.task!r}')
+        spec.func(**job.kwargs)
+    except Exception:
+        now = timezone.now()
+        fields = {
+            'locked_by': '',
+            'locked_at': None,
+            'last_error': traceback.format_exc()[-10000:],
+        }
+        if job.attempts < job.max_attempts:
+            fields.update(
+                status=Job.QUEUED,
+                run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+            )
+        else:
+            fields.update(status=Job.FAILED, finished_at=now)
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            **fields
+        )
+        return False
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=Job.DONE,
+        locked_by='',
+        locked_at=None,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def heartbeat(workers, now=None):
+    """Renew the locks of the jobs the given workers are running"""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_by__in=workers
+    ).update(locked_at=now or timezone.now())
+
+
+def requeue_stale(now=None):
+    """Queue again the jobs of workers that stopped renewing their locks
+
+    Returns the number of jobs queued again and of jobs that had used
+    their last attempt and failed.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+    )
+    lost = {'locked_by': '', 'locked_at': None, 'last_error': 'Worker lost'}
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, **lost
+    )
+    queued = stale.update(status=Job.QUEUED, run_at=now, **lost)
+    return queued, failed
+
+
+def enqueue_due_schedules(now=None):
+    """Queue the recurring tasks that are due, returns how many"""
+    now = now or timezone.now()
+    schedules = settings.TASK_SCHEDULES
+    known = set(JobSchedule.objects.values_list('name', flat=True))
+    JobSchedule.objects.bulk_create(
+        [JobSchedule(name=name, next_run_at=now)
+         for name in schedules if name not in known],
+        ignore_conflicts=True,
+    )
+    enqueued = 0
+    with transaction.atomic():
+        due = JobSchedule.objects.select_for_update(skip_locked=True).filter(
+            name__in=list(schedules), next_run_at__lte=now
+        )
+        for schedule in due:
+            entry = schedules[schedule.name]
+            enqueue(
+                entry['task'], entry.get('kwargs'), entry.get('priority')
+            )
+            every = timedelta(seconds=entry['every'])
+            schedule.next_run_at += every
+            if schedule.next_run_at <= now:
+                # Runs missed while no worker was up are not made up for
+                schedule.next_run_at = now + every
+            schedule.save(update_fields=['next_run_at'])
+            enqueued += 1
+    return enqueued
+
+
+@task('core.run_command', priority=-1, max_attempts=3)
+def run_command(name, **options):
+    """Run a management command, e.g. one of the cleanup commands"""
+    call_command(name, stdout=StringIO(), **options)
+
+
+@task('core.purge_jobs', priority=-1)
+def purge_jobs(batch_size=1000):
+    """Delete finished jobs past TASK_RESULT_RETENTION_DAYS in batches"""
+    cutoff = timezone.now() - timedelta(
+        days=settings.TASK_RESULT_RETENTION_DAYS
+    )
+    finished = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED), finished_at__lt=cutoff
+    )
+    purged = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += Job.objects.filter(id__in=ids).delete()[0]
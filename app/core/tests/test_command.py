@@ -1,22 +1,89 @@
+from io import StringIO
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
 
+COMMAND = 'core.management.commands.wait_for_db.Command'
+
+
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
+        with patch(f'{COMMAND}.check_connection') as check:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check.call_count, 1)
+
+    def test_wait_for_db_runs_query(self):
+        """Test the database is probed with a real query"""
+        out = StringIO()
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            call_command('wait_for_db', stdout=out)
+            cursor = gi.return_value.cursor.return_value.__enter__()
+            cursor.execute.assert_called_once_with('SELECT 1')
+        self.assertIn('connect', out.getvalue())
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, timesleep):
         """Test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch(f'{COMMAND}.check_connection') as check:
+            check.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check.call_count, 6)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backs_off(self, timesleep):
+        """Test the delay between attempts grows up to the maximum"""
+        with patch(f'{COMMAND}.check_connection') as check:
+            check.side_effect = [OperationalError] * 6 + [None]
+            call_command(
+                'wait_for_db', interval=1, max_interval=4, stdout=StringIO()
+            )
+
+        delays = [c.args[0] for c in timesleep.call_args_list]
+        self.assertLessEqual(delays[0], 1)
+        self.assertGreaterEqual(delays[-1], 2)
+        self.assertTrue(all(delay <= 4 for delay in delays))
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, timesleep):
+        """Test the command gives up once the timeout has passed"""
+        with patch(f'{COMMAND}.check_connection') as check:
+            check.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_migrations(self, timesleep):
+        """Test waiting until no migration is pending"""
+        with patch(f'{COMMAND}.check_connection'), \
+                patch(f'{COMMAND}.pending_migrations') as pending:
+            pending.side_effect = [['0001'], ['0002'], []]
+            out = StringIO()
+            call_command('wait_for_db', migrations=True, stdout=out)
+
+        self.assertEqual(pending.call_count, 3)
+        self.assertIn('migrations', out.getvalue())
+
+    @patch('time.sleep', return_value=True)
+    def test_database_restarts_while_checking_migrations(self, timesleep):
+        """Test losing the database while waiting for migrations retries"""
+        with patch(f'{COMMAND}.check_connection'), \
+                patch(f'{COMMAND}.pending_migrations') as pending:
+            pending.side_effect = [['0001'], OperationalError, []]
+            out = StringIO()
+            call_command('wait_for_db', migrations=True, stdout=out)
+
+        self.assertEqual(pending.call_count, 3)
+        self.assertIn('DataBase unavailable', out.getvalue())
+
+    def test_migrated_database_has_no_pending_migrations(self):
+        """Test the test database reports every migration applied"""
+        with patch(f'{COMMAND}.check_connection'):
+            out = StringIO()
+            call_command('wait_for_db', migrations=True, stdout=out)
+
+        self.assertIn('DataBase available', out.getvalue())
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Post, Tag, Topic
+
+
+class PostCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.tag = Tag.objects.create(user=self.user, title='Tech')
+        self.topic = Topic.objects.create(user=self.user, title='News')
+
+    def sample_post(self):
+        return Post.objects.create(user=self.user, title='t', content='c')
+
+    def count(self, obj):
+        obj.refresh_from_db()
+        return obj.post_count
+
+    def test_add_and_remove(self):
+        """Test counters follow posts being tagged and untagged"""
+        first, second = self.sample_post(), self.sample_post()
+        first.tags.add(self.tag)
+        second.tags.add(self.tag)
+        first.topics.add(self.topic)
+        self.assertEqual(self.count(self.tag), 2)
+        self.assertEqual(self.count(self.topic), 1)
+
+        first.tags.remove(self.tag)
+        self.assertEqual(self.count(self.tag), 1)
+
+    def test_duplicate_add_and_stray_remove(self):
+        """Test re-adding or removing an absent link changes nothing"""
+        post = self.sample_post()
+        post.tags.add(self.tag)
+        post.tags.add(self.tag)
+        other = Tag.objects.create(user=self.user, title='Other')
+        post.tags.remove(other)
+
+        self.assertEqual(self.count(self.tag), 1)
+        self.assertEqual(self.count(other), 0)
+
+    def test_set_and_clear(self):
+        """Test set() and clear() from both sides of the relation"""
+        post = self.sample_post()
+        other = Tag.objects.create(user=self.user, title='Other')
+        post.tags.set([self.tag, other])
+        post.tags.set([other])
+        self.assertEqual(self.count(self.tag), 0)
+        self.assertEqual(self.count(other), 1)
+
+        post.tags.clear()
+        self.assertEqual(self.count(other), 0)
+
+        self.tag.post_set.add(post, self.sample_post())
+        self.assertEqual(self.count(self.tag), 2)
+        self.tag.post_set.clear()
+        self.assertEqual(self.count(self.tag), 0)
+
+    def test_post_delete(self):
+        """Test deleting a post decrements its tags and topics"""
+        post = self.sample_post()
+        post.tags.add(self.tag)
+        post.topics.add(self.topic)
+
+        post.delete()
+
+        self.assertEqual(self.count(self.tag), 0)
+        self.assertEqual(self.count(self.topic), 0)
+
+    def test_repair_command(self):
+        """Test the repair command recomputes drifted counters"""
+        post = self.sample_post()
+        post.tags.add(self.tag)
+        Tag.objects.update(post_count=42)
+        Topic.objects.update(post_count=7)
+
+        call_command('repair_post_counts', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.count(self.tag), 1)
+        self.assertEqual(self.count(self.topic), 0)
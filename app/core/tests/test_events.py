@@ -0,0 +1,105 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from core.events import EventBroker, RecentIds
+
+
+def make_event(broker, user_id=1, pk=1, action='created'):
+    return {
+        'id': broker.next_id(),
+        'user_id': user_id,
+        'model': 'post',
+        'action': action,
+        'pk': pk,
+    }
+
+
+class EventBrokerTests(SimpleTestCase):
+
+    def test_ids_strictly_increase(self):
+        """Test event ids never repeat or go backwards"""
+        broker = EventBroker()
+        ids = [broker.next_id() for _ in range(100)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_replay_limited_to_user(self):
+        """Test replay returns newer events of the user only"""
+        broker = EventBroker()
+        first = make_event(broker)
+        broker.dispatch(first)
+        broker.dispatch(make_event(broker, user_id=2))
+        second = make_event(broker, pk=2)
+        broker.dispatch(second)
+
+        self.assertEqual(broker.replay(1, first['id']), [second])
+
+    def test_replay_follows_delivery_order(self):
+        """Test an older id delivered late is still replayed"""
+        broker = EventBroker()
+        early, late = make_event(broker), make_event(broker, pk=2)
+        broker.dispatch(late)
+        broker.dispatch(early)
+
+        self.assertEqual(broker.replay(1, late['id']), [early])
+
+    def test_dispatch_assigns_ids_in_delivery_order(self):
+        """Test local events get their ids as they are buffered"""
+        broker = EventBroker()
+        for pk in range(3):
+            broker.dispatch(dict(make_event(broker, pk=pk), id=None))
+
+        ids = [event['id'] for event in broker.replay(1, 0)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_recent_ids_are_bounded(self):
+        """Test sent ids are remembered up to the size only"""
+        sent = RecentIds(2)
+
+        self.assertTrue(sent.add(1))
+        self.assertFalse(sent.add(1))
+        sent.add(2)
+        sent.add(3)
+        self.assertTrue(sent.add(1))
+
+    def test_replay_after_eviction(self):
+        """Test replay asks for a reload once events were evicted"""
+        broker = EventBroker(buffer_size=2)
+        first = make_event(broker)
+        for event in [first] + [make_event(broker) for _ in range(3)]:
+            broker.dispatch(event)
+
+        self.assertIsNone(broker.replay(1, first['id']))
+
+    def test_subscribers_receive_events(self):
+        """Test dispatched events reach the subscriptions of their user"""
+        broker = EventBroker()
+
+        async def scenario():
+            mine = broker.subscribe(1)
+            other = broker.subscribe(2)
+            broker.dispatch(make_event(broker))
+            event = await asyncio.wait_for(mine.queue.get(), 1)
+            broker.unsubscribe(mine)
+            broker.unsubscribe(other)
+            return event, other.queue.qsize()
+
+        event, other_size = asyncio.run(scenario())
+
+        self.assertEqual(event['pk'], 1)
+        self.assertEqual(other_size, 0)
+
+    def test_slow_subscriber_overflows(self):
+        """Test a subscriber that falls behind is flagged for a reload"""
+        broker = EventBroker(queue_size=1)
+
+        async def scenario():
+            subscription = broker.subscribe(1)
+            broker.dispatch(make_event(broker))
+            broker.dispatch(make_event(broker))
+            await asyncio.sleep(0)
+            return subscription
+
+        self.assertTrue(asyncio.run(scenario()).overflowed)
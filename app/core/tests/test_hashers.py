@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(PASSWORD_HASHER_PBKDF2_ITERATIONS=1000)
+class HasherTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+
+    def iterations(self):
+        self.user.refresh_from_db()
+        return int(self.user.password.split('$')[1])
+
+    def login(self, password='pass5555'):
+        return APIClient().post(TOKEN_URL, {
+            'email': 'test@example.com', 'password': password,
+        })
+
+    def test_configured_cost_used(self):
+        """Test new passwords are hashed with the configured cost"""
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.iterations(), 1000)
+
+    def test_login_rehashes_with_new_cost(self):
+        """Test a successful login upgrades the stored hash"""
+        with override_settings(PASSWORD_HASHER_PBKDF2_ITERATIONS=2000):
+            self.login()
+
+            self.assertEqual(self.iterations(), 2000)
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_failed_login_keeps_hash(self):
+        """Test a wrong password never rewrites the stored hash"""
+        with override_settings(PASSWORD_HASHER_PBKDF2_ITERATIONS=2000):
+            self.login(password='wrong')
+
+        self.assertEqual(self.iterations(), 1000)
+
+    def test_calibrate_recommends_costs(self):
+        """Test the calibration command prints a setting to deploy"""
+        out = StringIO()
+
+        call_command(
+            'calibrate_hashers', '--target-ms', '5', '--samples', '1',
+            stdout=out,
+        )
+
+        self.assertIn('PASSWORD_HASHER_PBKDF2_ITERATIONS=', out.getvalue())
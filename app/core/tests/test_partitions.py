@@ -0,0 +1,168 @@
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from core import partitions
+from core.models import Post, Tag
+
+
+class PartitionHelperTests(TestCase):
+
+    def test_add_months(self):
+        """Test month arithmetic across year boundaries"""
+        self.assertEqual(
+            partitions.add_months(date(2024, 11, 15), 2), date(2025, 1, 1)
+        )
+        self.assertEqual(
+            partitions.add_months(date(2024, 1, 31), -1), date(2023, 12, 1)
+        )
+
+    def test_partition_name(self):
+        """Test partitions are named after their month"""
+        self.assertEqual(
+            partitions.partition_name('core_post', date(2024, 3, 1)),
+            'core_post_p2024_03',
+        )
+
+    @skipUnless(connection.vendor != 'postgresql', 'not partitioned')
+    def test_command_needs_partitioned_table(self):
+        """Test the command refuses to run on an unpartitioned table"""
+        with self.assertRaises(CommandError):
+            call_command('manage_partitions')
+
+    @skipUnless(connection.vendor != 'postgresql', 'not partitioned')
+    def test_scheduled_run_skips_unpartitioned(self):
+        """Test the daily scheduled run does nothing on a plain table"""
+        options = dict(settings.TASK_SCHEDULES['manage-partitions']['kwargs'])
+        out = StringIO()
+
+        call_command(options.pop('name'), stdout=out, **options)
+
+        self.assertIn('not partitioned', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class PostgresPartitionTests(TestCase):
+
+    def test_posts_partitioned_by_month(self):
+        """Test the migration partitioned posts with months ahead"""
+        names = [p.name for p in partitions.list_partitions()]
+
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(names[0], 'core_post_legacy')
+        self.assertGreaterEqual(len(names), 4)
+
+    def test_date_range_prunes_partitions(self):
+        """Test a range on created_at scans only the matching partition"""
+        newest = partitions.list_partitions()[-1]
+        plan = Post.objects.filter(
+            created_at__gte=newest.lower, created_at__lt=newest.upper
+        ).explain()
+
+        self.assertIn(newest.name, plan)
+        self.assertNotIn('core_post_legacy', plan)
+
+    def test_references_kept(self):
+        """Test the tag and topic links still need an existing post"""
+        self.assertEqual(
+            partitions.list_references(),
+            [('core_post_tags', 'post_id'), ('core_post_topics', 'post_id')],
+        )
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'pass5555'
+        )
+        post = Post.objects.create(user=user, title='T', content='C')
+        tag = Tag.objects.create(user=user, title='Tag')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Post.tags.through.objects.create(post_id=post.id + 1, tag=tag)
+            connection.check_constraints()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            post.tags.add(tag)
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM core_post WHERE id = %s',
+                               [post.id])
+            connection.check_constraints()
+
+        post.tags.add(tag)
+        post.delete()
+        connection.check_constraints()
+        self.assertFalse(Post.tags.through.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class ManagePartitionsTests(TestCase):
+    """Test creating and detaching partitions of a scratch table"""
+    table = 'test_partitioned_post'
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {self.table} (id serial, '
+                f'created_at timestamptz NOT NULL, '
+                f'PRIMARY KEY (id, created_at)) '
+                f'PARTITION BY RANGE (created_at)'
+            )
+            cursor.execute(
+                f'CREATE TABLE {self.table}_link (id serial PRIMARY KEY, '
+                f'post_id integer NOT NULL)'
+            )
+        partitions.create_partitions(
+            self.table, ahead=0, start=date(2020, 1, 1)
+        )
+        partitions.add_reference(
+            'test_link_post', f'{self.table}_link', 'post_id', self.table
+        )
+
+    def insert(self, *days):
+        with connection.cursor() as cursor:
+            for day in days:
+                cursor.execute(
+                    f'INSERT INTO {self.table} (created_at) VALUES (%s) '
+                    f'RETURNING id',
+                    [datetime(*day, tzinfo=timezone.utc)],
+                )
+                cursor.execute(
+                    f'INSERT INTO {self.table}_link (post_id) VALUES (%s)',
+                    [cursor.fetchone()[0]],
+                )
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {table}')
+            return cursor.fetchone()[0]
+
+    def test_default_rows_moved(self):
+        """Test rows past the newest month move into their partition"""
+        far = partitions.add_months(date.today(), 12)
+        self.insert((far.year, far.month, 15), (far.year, far.month, 20))
+        self.assertEqual(self.count(f'{self.table}_default'), 2)
+
+        created = partitions.create_partitions(self.table, ahead=12)
+
+        name = partitions.partition_name(self.table, far)
+        self.assertIn(name, created)
+        self.assertEqual(self.count(f'{self.table}_default'), 0)
+        self.assertEqual(self.count(name), 2)
+        connection.check_constraints()
+
+    def test_detach_with_default_partition(self):
+        """Test expired months detach, taking their links with them"""
+        self.insert((2020, 1, 10), (2020, 2, 10))
+
+        detached = partitions.detach_partitions(
+            date(2020, 2, 1), table=self.table
+        )
+
+        self.assertEqual(detached, [f'{self.table}_p2020_01'])
+        self.assertEqual(self.count(f'{self.table}_p2020_01'), 1)
+        self.assertEqual(self.count(self.table), 1)
+        self.assertEqual(self.count(f'{self.table}_link'), 1)
+        connection.check_constraints()
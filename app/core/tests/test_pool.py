@@ -0,0 +1,194 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import pool as db_pool
+from core.db.backends.postgresql_pool import base as pool_backend
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+POOL_STATS_URL = reverse('core:db-pools')
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection"""
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+def ping(connection):
+    if not connection.alive:
+        raise ConnectionError('server closed the connection')
+
+
+class ConnectionPoolTests(TestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def test_connections_are_reused(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(self.connect, ping=ping, max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_warm_opens_min_size(self):
+        """Test warming the pool opens the minimum connections"""
+        pool = ConnectionPool(self.connect, min_size=3, max_size=5)
+        pool.warm()
+
+        self.assertEqual(pool.stats()['idle'], 3)
+
+    def test_checkout_times_out_when_exhausted(self):
+        """Test waiting for a connection gives up after the timeout"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a blocked checkout resumes when a connection comes back"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=5)
+        held = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, args=[held])
+        timer.start()
+
+        connection = pool.acquire()
+        timer.join()
+
+        self.assertIs(connection, held)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds_max'], 0)
+
+    def test_dead_connections_dropped_after_failover(self):
+        """Test a failed pre-ping discards every stale idle connection"""
+        pool = ConnectionPool(self.connect, ping=ping, max_size=3)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+            connection.alive = False
+
+        fresh = pool.acquire()
+
+        self.assertNotIn(fresh, connections)
+        self.assertTrue(all(c.closed for c in connections))
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_discarded_connection_is_closed(self):
+        """Test broken connections are not returned to the pool"""
+        pool = ConnectionPool(self.connect)
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    @patch('core.db.pool.time.monotonic')
+    def test_idle_connections_pruned(self, monotonic):
+        """Test idle connections above the minimum are closed"""
+        monotonic.return_value = 0
+        pool = ConnectionPool(self.connect, min_size=1, idle_timeout=10)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+
+        monotonic.return_value = 60
+        pool.acquire()
+
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_invalid_sizes_rejected(self):
+        """Test the pool refuses a minimum above the maximum"""
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.connect, min_size=5, max_size=2)
+
+
+class PoolBackendTests(TestCase):
+    """Test the pooled PostgreSQL backend without a server"""
+
+    def setUp(self):
+        self.addCleanup(db_pool.close_pools)
+        self.wrapper = pool_backend.DatabaseWrapper({
+            'NAME': 'app', 'USER': '', 'PASSWORD': '', 'HOST': '',
+            'PORT': '', 'CONN_MAX_AGE': 0, 'TIME_ZONE': None,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'OPTIONS': {'POOL': {'MIN_SIZE': 2, 'MAX_SIZE': 4}},
+            'TEST': {},
+        }, alias='pooled')
+
+    @patch.object(pool_backend.Database, 'connect',
+                  side_effect=lambda **params: FakeConnection())
+    def test_pool_warmed_on_creation(self, connect):
+        """Test a new pool opens its minimum connections right away"""
+        pool = self.wrapper.get_pool({'database': 'app'})
+
+        self.assertEqual(connect.call_count, 2)
+        self.assertEqual(pool.stats()['idle'], 2)
+
+    @patch('django.db.backends.postgresql.creation.'
+           'DatabaseCreation._destroy_test_db')
+    def test_pools_closed_before_dropping_test_db(self, destroy):
+        """Test idle pooled sessions do not keep the test database open"""
+        idle = FakeConnection()
+        pool = db_pool.get_pool(('pooled', ''), lambda: ConnectionPool(
+            lambda: idle, min_size=1,
+        ))
+        pool.warm()
+
+        self.wrapper.creation._destroy_test_db('test_app', 0)
+
+        self.assertTrue(idle.closed)
+        destroy.assert_called_once_with('test_app', 0)
+
+
+class PoolStatsApiTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.addCleanup(db_pool.close_pools)
+
+    def test_admin_required(self):
+        """Test pool stats are only visible to staff"""
+        user = get_user_model().objects.create_user('t@example.com', 'x')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_pool_stats_listed(self):
+        """Test the stats of every pool are reported"""
+        admin = get_user_model().objects.create_superuser('a@example.com', 'x')
+        self.client.force_authenticate(admin)
+        db_pool.get_pool(
+            ('replica1', ''),
+            lambda: ConnectionPool(FakeConnection, max_size=4)
+        )
+
+        res = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['replica1']['max_size'], 4)
@@ -0,0 +1,218 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import querylog
+from core.models import Post
+
+
+class NormalizeTests(TestCase):
+    """Test the fingerprints of queries"""
+
+    def test_literals_are_collapsed(self):
+        """Test numbers and strings do not change the fingerprint"""
+        self.assertEqual(
+            querylog.normalize(
+                "SELECT * FROM t WHERE a = 'x''y' AND b = 10  LIMIT 21"
+            ),
+            'SELECT * FROM t WHERE a = ? AND b = ? LIMIT ?',
+        )
+
+    def test_lists_are_collapsed(self):
+        """Test IN lists and multi row inserts of any length match"""
+        self.assertEqual(
+            querylog.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            querylog.fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+        self.assertEqual(
+            querylog.fingerprint(
+                'INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'
+            ),
+            querylog.fingerprint('INSERT INTO t (a, b) VALUES (%s, %s)'),
+        )
+
+    def test_different_queries_differ(self):
+        self.assertNotEqual(
+            querylog.fingerprint('SELECT a FROM t'),
+            querylog.fingerprint('SELECT b FROM t'),
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    """Test recording slow queries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'pass5555'
+        )
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'log', 'slow.log')
+        self.settings = override_settings(
+            SLOW_QUERY_THRESHOLD_MS=0,
+            SLOW_QUERY_LOG_PATH=self.path,
+            SLOW_QUERY_EXPLAIN_MS=0,
+            SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1,
+        )
+        self.settings.enable()
+        querylog.reset_log()
+
+    def tearDown(self):
+        self.settings.disable()
+        querylog.reset_log()
+        self.dir.cleanup()
+
+    def entries(self):
+        querylog.reset_log()
+        return list(querylog.read_log(self.path))
+
+    def test_wrapper_installed(self):
+        """Test connections run queries through the slow query wrapper"""
+        connection.ensure_connection()
+        self.assertIn(
+            querylog.record_slow_queries, connection.execute_wrappers
+        )
+
+    def test_request_queries_logged(self):
+        """Test queries carry their request path and call site"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.get(reverse('post:post-list'))
+
+        entries = [
+            entry for entry in self.entries()
+            if 'core_post' in entry['sql']
+        ]
+        self.assertTrue(entries)
+        self.assertEqual(entries[0]['path'], 'GET /api/posts/posts/')
+        self.assertTrue(entries[0]['call_site'])
+        self.assertNotIn('querylog', entries[0]['call_site'])
+
+    def test_reads_are_explained_once(self):
+        """Test slow reads get a plan, once per interval"""
+        list(Post.objects.filter(user=self.user))
+        list(Post.objects.filter(user=self.user))
+
+        plans = [
+            entry.get('plan') for entry in self.entries()
+            if entry['sql'].startswith('SELECT') and
+            'core_post' in entry['sql']
+        ]
+        self.assertEqual(len(plans), 2)
+        self.assertEqual(len([plan for plan in plans if plan]), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_explain_does_not_run_the_query(self):
+        """Test explaining a read with side effects leaves them alone"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('core_post_id_seq')")
+            value = cursor.fetchone()[0]
+
+        plans = [
+            entry.get('plan') for entry in self.entries()
+            if 'nextval' in entry['sql']
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT last_value FROM core_post_id_seq')
+            self.assertEqual(cursor.fetchone()[0], value)
+        self.assertTrue(plans[0])
+        self.assertNotIn('actual', plans[0])
+
+    def test_writes_are_not_explained(self):
+        """Test a write is never run again to explain it"""
+        Post.objects.create(user=self.user, title='T', content='C')
+
+        inserts = [
+            entry for entry in self.entries()
+            if entry['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertTrue(inserts)
+        self.assertNotIn('plan', inserts[0])
+
+    def test_fast_queries_not_logged(self):
+        """Test queries under the threshold or with the log off are skipped"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=60000):
+            list(Post.objects.all())
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=None):
+            list(Post.objects.all())
+
+        self.assertEqual(self.entries(), [])
+
+
+class SlowQueriesCommandTests(TestCase):
+    """Test summarizing the slow query log"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'slow.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, path, *entries):
+        with open(path, 'w') as log:
+            for entry in entries:
+                log.write(json.dumps(entry) + '\n')
+
+    def entry(self, digest, duration_ms, time='2030-01-01T00:00:00+00:00',
+              **extra):
+        return dict({
+            'time': time,
+            'fingerprint': digest,
+            'duration_ms': duration_ms,
+            'sql': f'SELECT {digest}',
+            'call_site': 'post/views.py:10 in list',
+            'path': 'GET /api/posts/posts/',
+        }, **extra)
+
+    def summary(self, *args):
+        out = StringIO()
+        call_command('slow_queries', '--log', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_top_offenders_first(self):
+        """Test queries are ranked by total time across rotated files"""
+        self.write(f'{self.path}.1', self.entry('often', 300))
+        self.write(
+            self.path,
+            self.entry('often', 300),
+            self.entry('once', 500, plan='SCAN core_post'),
+        )
+
+        out = self.summary('--plans')
+
+        self.assertLess(out.index('often'), out.index('once'))
+        self.assertIn('often  2 runs  total 600 ms', out)
+        self.assertIn('post/views.py:10 in list (2)', out)
+        self.assertIn('SCAN core_post', out)
+
+        by_max = self.summary('--sort', 'max', '--limit', '1')
+        self.assertIn('once', by_max)
+        self.assertNotIn('often', by_max)
+
+    def test_hours_filter(self):
+        """Test old entries can be left out"""
+        self.write(
+            self.path,
+            self.entry('old', 900, time='2000-01-01T00:00:00+00:00'),
+            self.entry('new', 300),
+        )
+
+        out = self.summary('--hours', '1')
+
+        self.assertNotIn('old', out)
+        self.assertIn('new', out)
+
+    def test_empty_log(self):
+        self.assertIn('No slow queries', self.summary())
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import DailyPostCount, DailyTagCount, DailyTopicCount, \
+    Post, Tag, Topic
+
+
+DAY = date(2024, 3, 1)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.tag = Tag.objects.create(user=self.user, title='Tech')
+        self.topic = Topic.objects.create(user=self.user, title='News')
+
+    def sample_post(self, day=DAY):
+        created = datetime(day.year, day.month, day.day, 12,
+                           tzinfo=dt_timezone.utc)
+        return Post.objects.create(
+            user=self.user, title='t', content='c', created_at=created
+        )
+
+    def rollups(self):
+        return (
+            dict(DailyPostCount.objects.values_list('day', 'posts')),
+            dict(DailyTagCount.objects.values_list('tag', 'posts')),
+            dict(DailyTopicCount.objects.values_list('topic', 'posts')),
+        )
+
+    def test_maintained_by_signals(self):
+        """Test rollups follow posts being created, tagged and deleted"""
+        first, second = self.sample_post(), self.sample_post()
+        first.tags.add(self.tag)
+        self.tag.post_set.add(second)
+        first.topics.add(self.topic)
+        self.assertEqual(self.rollups(), (
+            {DAY: 2}, {self.tag.id: 2}, {self.topic.id: 1}
+        ))
+
+        first.tags.remove(self.tag)
+        first.delete()
+        self.assertEqual(self.rollups(), (
+            {DAY: 1}, {self.tag.id: 1}, {self.topic.id: 0}
+        ))
+
+    def test_backfill_repairs_range(self):
+        """Test the backfill command recomputes rollups from the posts"""
+        post = self.sample_post()
+        post.tags.add(self.tag)
+        self.sample_post(date(2024, 3, 5))
+        DailyPostCount.objects.update(posts=40)
+        DailyTagCount.objects.all().delete()
+
+        call_command(
+            'backfill_rollups', '--days-per-batch', '2', stdout=StringIO()
+        )
+
+        self.assertEqual(self.rollups(), (
+            {DAY: 1, date(2024, 3, 5): 1}, {self.tag.id: 1}, {}
+        ))
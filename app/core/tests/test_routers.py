@@ -0,0 +1,196 @@
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware, request_identity
+from core.models import Tag
+from user import tokens
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class RouterTests(TestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        routers.reset_health()
+        caches['shared'].clear()
+
+    def tearDown(self):
+        routers.reset_health()
+
+    def test_reads_use_primary_outside_requests(self):
+        """Test reads default to the primary without a routing block"""
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    @patch('core.routers._ping', return_value=True)
+    def test_reads_use_replica_when_enabled(self, ping):
+        """Test safe reads are sent to a replica"""
+        with routers.replica_reads():
+            alias = self.router.db_for_read(Tag)
+
+        self.assertIn(alias, ['replica1', 'replica2'])
+
+    @patch('core.routers._ping', return_value=True)
+    def test_one_replica_per_request(self, ping):
+        """Test every read of a request goes to the same replica"""
+        with patch('core.routers.random.choice', side_effect=min) as choice:
+            with routers.replica_reads():
+                aliases = {self.router.db_for_read(Tag) for _ in range(10)}
+
+        self.assertEqual(aliases, {'replica1'})
+        self.assertEqual(choice.call_count, 1)
+
+    @patch('core.routers._ping', return_value=True)
+    def test_reads_after_write_use_primary(self, ping):
+        """Test reads following a write in the same request stay primary"""
+        with routers.replica_reads():
+            self.router.db_for_write(Tag)
+            alias = self.router.db_for_read(Tag)
+
+        self.assertEqual(alias, 'default')
+
+    def test_unhealthy_replicas_skipped(self):
+        """Test a failing replica is taken out of rotation"""
+        def ping(alias):
+            return alias == 'replica2'
+
+        with patch('core.routers._ping', side_effect=ping):
+            with routers.replica_reads():
+                aliases = {self.router.db_for_read(Tag) for _ in range(10)}
+
+        self.assertEqual(aliases, {'replica2'})
+
+    @patch('core.routers._ping', return_value=False)
+    def test_falls_back_to_primary(self, ping):
+        """Test reads go to the primary when every replica is down"""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    @patch('core.routers._ping', return_value=True)
+    def test_health_checks_are_cached(self, ping):
+        """Test replicas are not pinged on every read"""
+        with routers.replica_reads():
+            for _ in range(5):
+                self.router.db_for_read(Tag)
+
+        self.assertEqual(ping.call_count, 2)
+
+    def test_migrations_skip_replicas(self):
+        """Test migrations never run against a replica"""
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    CACHES=dict(settings.CACHES, shared={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'replica-pins',
+    }),
+)
+class ReplicaRoutingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = routers.PrimaryReplicaRouter()
+        routers.reset_health()
+        caches['shared'].clear()
+
+    def _dispatch(self, request, write=False):
+        """Run the middleware and return the alias used for a read"""
+        used = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Tag)
+            used.append(self.router.db_for_read(Tag))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return used[0]
+
+    @patch('core.routers._ping', return_value=True)
+    def test_safe_request_reads_replica(self, ping):
+        """Test GET requests are served from a replica"""
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token abc')
+
+        self.assertEqual(self._dispatch(request), 'replica1')
+
+    @patch('core.routers._ping', return_value=True)
+    def test_unsafe_request_reads_primary(self, ping):
+        """Test POST requests read from the primary"""
+        request = self.factory.post('/', HTTP_AUTHORIZATION='Token abc')
+
+        self.assertEqual(self._dispatch(request), 'default')
+
+    @patch('core.routers._ping', return_value=True)
+    def test_write_pins_caller_to_primary(self, ping):
+        """Test a caller reads its own writes after writing"""
+        post = self.factory.post('/', HTTP_AUTHORIZATION='Token abc')
+        self._dispatch(post, write=True)
+
+        mine = self.factory.get('/', HTTP_AUTHORIZATION='Token abc')
+        other = self.factory.get('/', HTTP_AUTHORIZATION='Token xyz')
+        self.assertEqual(self._dispatch(mine), 'default')
+        self.assertEqual(self._dispatch(other), 'replica1')
+
+    @patch('core.routers._ping', return_value=True)
+    def test_pinned_request_flagged(self, ping):
+        """Test views can tell a request must read its caller's writes"""
+        pinned = []
+
+        def view(request):
+            pinned.append(routers.reads_pinned())
+            return HttpResponse()
+
+        routers.pin_to_primary('auth:Token abc')
+        for key in ('abc', 'xyz'):
+            ReplicaRoutingMiddleware(view)(
+                self.factory.get('/', HTTP_AUTHORIZATION=f'Token {key}')
+            )
+
+        self.assertEqual(pinned, [True, False])
+        self.assertFalse(routers.reads_pinned())
+
+    def test_pin_expires(self):
+        """Test the pin only lasts for the configured window"""
+        now = time.time()
+        with patch('time.time', return_value=now):
+            routers.pin_to_primary('auth:Token abc', seconds=5)
+        with patch('time.time', return_value=now + 4):
+            self.assertTrue(routers.is_pinned('auth:Token abc'))
+        with patch('time.time', return_value=now + 6):
+            self.assertFalse(routers.is_pinned('auth:Token abc'))
+
+    @patch('core.routers._ping', return_value=True)
+    def test_signed_tokens_share_the_user_pin(self, ping):
+        """Test a write pins every signed token of the same user"""
+        first = tokens.issue_pair(1)['access']
+        second = tokens.issue_pair(1)['access']
+        other = tokens.issue_pair(2)['access']
+        post = self.factory.post('/', HTTP_AUTHORIZATION=f'Bearer {first}')
+        self._dispatch(post, write=True)
+
+        mine = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {second}')
+        theirs = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {other}')
+        self.assertEqual(request_identity(mine), 'user:1')
+        self.assertEqual(self._dispatch(mine), 'default')
+        self.assertEqual(self._dispatch(theirs), 'replica1')
+
+    def test_forged_bearer_token_has_no_identity(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Bearer forged')
+
+        self.assertIsNone(request_identity(request))
+
+    def test_no_pin_without_replicas(self):
+        """Test writes are not pinned when reads never leave the primary"""
+        post = self.factory.post('/', HTTP_AUTHORIZATION='Token abc')
+        with self.settings(DATABASE_REPLICAS=[]):
+            self._dispatch(post, write=True)
+
+        self.assertFalse(routers.is_pinned('auth:Token abc'))
@@ -0,0 +1,65 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.management.commands import serve
+
+
+class ServeCommandTests(SimpleTestCase):
+
+    def build(self, *args):
+        command = serve.Command()
+        parser = command.create_parser('manage.py', 'serve')
+        options = vars(parser.parse_args(args))
+        return command.build_options(options)
+
+    @patch('multiprocessing.cpu_count', return_value=4)
+    def test_wsgi_workers_from_cpu_count(self, cpu_count):
+        """Test WSGI runs threaded workers sized from the CPU count"""
+        config = self.build()
+
+        self.assertEqual(config['workers'], 9)
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertTrue(config['preload_app'])
+
+    @patch('multiprocessing.cpu_count', return_value=4)
+    def test_asgi_workers_from_cpu_count(self, cpu_count):
+        """Test ASGI runs one uvicorn worker per CPU"""
+        config = self.build('--asgi')
+
+        self.assertEqual(config['workers'], 4)
+        self.assertEqual(
+            config['worker_class'], 'uvicorn.workers.UvicornWorker'
+        )
+        self.assertNotIn('threads', config)
+
+    def test_workers_recycled(self):
+        """Test workers are recycled with jitter and shut down gracefully"""
+        config = self.build(
+            '--workers', '2', '--max-requests', '500',
+            '--graceful-timeout', '10',
+        )
+
+        self.assertEqual(config['workers'], 2)
+        self.assertEqual(config['max_requests'], 500)
+        self.assertGreater(config['max_requests_jitter'], 0)
+        self.assertEqual(config['graceful_timeout'], 10)
+
+    @patch('core.management.commands.serve.connections')
+    @patch('core.management.commands.serve.close_pools')
+    def test_pre_fork_closes_connections(self, close_pools, connections):
+        """Test the master drops its database sockets before forking"""
+        serve.pre_fork(None, None)
+
+        close_pools.assert_called_once_with()
+        connections.close_all.assert_called_once_with()
+
+    def test_print_config(self):
+        """Test the resolved settings can be printed without serving"""
+        out = StringIO()
+        call_command('serve', print_config=True, workers=3, stdout=out)
+
+        self.assertIn('workers = 3', out.getvalue())
+        self.assertIn('preload_app = True', out.getvalue())
@@ -0,0 +1,229 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from core import routers, singleflight
+
+
+LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'singleflight-tests',
+    },
+}
+
+
+class SlowRead:
+    """A read that blocks until released, counting its calls"""
+
+    def __init__(self, value='result'):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.value
+
+
+def run_concurrently(group, key, func, count):
+    """Call group.do from count threads, the first one leading"""
+    results = [None] * count
+
+    def call(i):
+        results[i] = group.do(key, func)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    threads[0].start()
+    func.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Release the leader once every other thread waits on it
+    while group._calls[key].waiters < count - 1:
+        time.sleep(0.001)
+    func.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+@override_settings(SINGLEFLIGHT_CACHE=None, SINGLEFLIGHT_WAIT_SECONDS=5)
+class GroupTests(SimpleTestCase):
+    """Test concurrent calls with one key run once"""
+
+    def setUp(self):
+        singleflight.reset_stats()
+        self.group = singleflight.Group()
+
+    def test_concurrent_calls_share_result(self):
+        """Test waiters get the leader's result without calling again"""
+        read = SlowRead()
+
+        results = run_concurrently(self.group, 'k', read, 5)
+
+        self.assertEqual(read.calls, 1)
+        self.assertEqual(results, [('result', False)] + [('result', True)] * 4)
+        self.assertEqual(singleflight.stats(), {'leaders': 1, 'shared': 4})
+
+    def test_different_keys_do_not_wait(self):
+        """Test calls for other keys run while one is in flight"""
+        read = SlowRead()
+        thread = threading.Thread(target=self.group.do, args=('a', read))
+        thread.start()
+        read.started.wait(5)
+
+        value, shared = self.group.do('b', lambda: 'other')
+        read.release.set()
+        thread.join(5)
+
+        self.assertEqual((value, shared), ('other', False))
+
+    def test_sequential_calls_not_shared(self):
+        """Test a call after the leader finished runs again"""
+        self.group.do('k', lambda: 1)
+
+        self.assertEqual(self.group.do('k', lambda: 2), (2, False))
+
+    def test_failed_leader_lets_waiters_run(self):
+        """Test waiters of a leader that raised run the call themselves"""
+        call = singleflight._Call()
+        call.done.set()
+        self.group._calls['k'] = call
+
+        value, shared = self.group.do('k', lambda: 'own')
+
+        self.assertEqual((value, shared), ('own', False))
+        self.assertEqual(singleflight.stats(), {'failed': 1})
+
+    @override_settings(SINGLEFLIGHT_WAIT_SECONDS=0)
+    def test_waiter_times_out(self):
+        """Test a waiter stops waiting on a slow leader"""
+        self.group._calls['k'] = singleflight._Call()
+
+        self.assertEqual(self.group.do('k', lambda: 'own'), ('own', False))
+        self.assertEqual(singleflight.stats(), {'timeouts': 1})
+
+
+@override_settings(CACHES=LOCMEM, SINGLEFLIGHT_CACHE='shared')
+class SharedGroupTests(SimpleTestCase):
+    """Test calls are coalesced across processes through the cache"""
+
+    def setUp(self):
+        singleflight.reset_stats()
+        caches['shared'].clear()
+        self.group = singleflight.Group()
+        self.lock_key = singleflight.KEY_PREFIX + ':lock:' + \
+            singleflight.hashlib.sha256(b'k').hexdigest()
+
+    def test_leader_releases_lock(self):
+        """Test the leader of all processes frees the lock when done"""
+        self.assertEqual(self.group.do('k', lambda: 1), (1, False))
+        self.assertIsNone(caches['shared'].get(self.lock_key))
+
+    def test_waits_for_other_process(self):
+        """Test a process gets the result another process' leader stores"""
+        cache = caches['shared']
+        cache.add(self.lock_key, 'other', 5)
+
+        def other_process_finishes(delay):
+            cache.set(f'{singleflight.KEY_PREFIX}:result:other', 'theirs')
+            cache.delete(self.lock_key)
+
+        with patch('core.singleflight.time.sleep',
+                   side_effect=other_process_finishes):
+            value, _ = self.group.do('k', lambda: 'own')
+
+        self.assertEqual(value, 'theirs')
+        self.assertEqual(singleflight.stats(), {'shared_remote': 1})
+
+    def test_other_process_failed(self):
+        """Test the lock going away without a result runs the read"""
+        cache = caches['shared']
+        cache.add(self.lock_key, 'other', 5)
+
+        with patch('core.singleflight.time.sleep',
+                   side_effect=lambda delay: cache.delete(self.lock_key)):
+            value, _ = self.group.do('k', lambda: 'own')
+
+        self.assertEqual(value, 'own')
+        self.assertEqual(singleflight.stats(), {'failed': 1})
+
+
+class CoalesceTests(SimpleTestCase):
+    """Test the view decorator keys requests by view, user and path"""
+
+    class View:
+        calls = 0
+
+        @singleflight.coalesce
+        def list(self, request):
+            self.calls += 1
+            return Response({'path': request.get_full_path()})
+
+    def request(self, path):
+        request = APIRequestFactory().get(path)
+        request.user = AnonymousUser()
+        return request
+
+    def test_leader_returns_own_response(self):
+        """Test an uncontended request gets the view's own response"""
+        view = self.View()
+
+        response = view.list(self.request('/posts/?a=1'))
+
+        self.assertEqual(response.data, {'path': '/posts/?a=1'})
+        self.assertEqual(view.calls, 1)
+
+    def test_waiter_gets_leader_data(self):
+        """Test a request overlapping an identical one shares its data"""
+        call = singleflight._Call()
+        call.value = (200, {'path': 'leader'})
+        call.done.set()
+        key = (
+            f'{self.View.__module__}.{self.View.__qualname__}:None:/posts/'
+        )
+        view = self.View()
+
+        with patch.dict(singleflight.group._calls, {key: call}):
+            response = view.list(self.request('/posts/'))
+            other = view.list(self.request('/posts/?page=2'))
+
+        self.assertEqual(response.data, {'path': 'leader'})
+        self.assertEqual(other.data, {'path': '/posts/?page=2'})
+        self.assertEqual(view.calls, 1)
+
+    def test_pinned_caller_reads_alone(self):
+        """Test a caller that wrote recently never gets a shared result"""
+        call = singleflight._Call()
+        call.value = (200, {'path': 'leader'})
+        call.done.set()
+        key = (
+            f'{self.View.__module__}.{self.View.__qualname__}:None:/posts/'
+        )
+        view = self.View()
+
+        with patch.dict(singleflight.group._calls, {key: call}), \
+                routers.replica_reads(False, pinned=True):
+            response = view.list(self.request('/posts/'))
+
+        self.assertEqual(response.data, {'path': '/posts/'})
+        self.assertEqual(view.calls, 1)
+
+    @override_settings(SINGLEFLIGHT_ENABLED=False)
+    def test_disabled(self):
+        """Test nothing is shared when single-flight is off"""
+        view = self.View()
+
+        view.list(self.request('/posts/'))
+
+        self.assertEqual(view.calls, 1)
@@ -0,0 +1,229 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Job, JobSchedule
+from core.worker import Worker
+
+
+calls = []
+
+
+@tasks.task('tests.record')
+def record(value=None):
+    calls.append(value)
+
+
+@tasks.task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('broken')
+
+
+@override_settings(TASK_SCHEDULES={}, TASK_RETRY_BACKOFF=10)
+class TaskQueueTests(TestCase):
+    """Test queueing, claiming and running background jobs"""
+
+    def setUp(self):
+        calls.clear()
+
+    def run_all(self):
+        while True:
+            jobs = tasks.claim_jobs('w1', limit=10)
+            if not jobs:
+                return
+            for job in jobs:
+                tasks.run_job(job)
+
+    def test_job_runs_with_kwargs(self):
+        """Test a queued job calls its task and is marked done"""
+        job = tasks.enqueue('tests.record', {'value': 7})
+
+        self.run_all()
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [7])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claim_order(self):
+        """Test higher priority first, then oldest, and never future jobs"""
+        now = timezone.now()
+        low = tasks.enqueue('tests.record', run_at=now - timedelta(hours=1))
+        high = tasks.enqueue('tests.record', priority=5, run_at=now)
+        tasks.enqueue('tests.record', priority=9,
+                      run_at=now + timedelta(hours=1))
+
+        jobs = tasks.claim_jobs('w1', limit=10, now=now)
+
+        self.assertEqual([job.pk for job in jobs], [high.pk, low.pk])
+        self.assertEqual({job.locked_by for job in jobs}, {'w1'})
+
+    def test_claimed_job_not_claimed_again(self):
+        """Test a running job is not handed to another worker"""
+        tasks.enqueue('tests.record')
+        tasks.claim_jobs('w1')
+
+        self.assertEqual(tasks.claim_jobs('w2'), [])
+
+    @patch('core.tasks.random.uniform', return_value=1)
+    def test_failure_retried_with_backoff(self, uniform):
+        """Test a failed job is queued again later, then fails for good"""
+        job = tasks.enqueue('tests.fail')
+        started = timezone.now()
+
+        self.run_all()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('RuntimeError: broken', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+
+        tasks.run_job(tasks.claim_jobs('w1', now=job.run_at)[0])
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay_doubles_up_to_maximum(self):
+        """Test the backoff grows exponentially and is capped"""
+        with patch('core.tasks.random.uniform', return_value=1), \
+                self.settings(TASK_RETRY_MAX_DELAY=60):
+            delays = [tasks.retry_delay(n) for n in (1, 2, 3, 4)]
+
+        self.assertEqual(delays, [10, 20, 40, 60])
+
+    def test_unknown_task_fails(self):
+        """Test a job of a task no longer registered fails"""
+        job = Job.objects.create(task='tests.gone', max_attempts=1)
+
+        self.run_all()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('tests.gone', job.last_error)
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_stale_jobs_requeued(self):
+        """Test jobs of a dead worker run again unless out of attempts"""
+        retry = tasks.enqueue('tests.record')
+        spent = tasks.enqueue('tests.record', max_attempts=1)
+        tasks.claim_jobs('w1', limit=2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(tasks.requeue_stale(), (1, 1))
+        retry.refresh_from_db()
+        spent.refresh_from_db()
+        self.assertEqual(retry.status, Job.QUEUED)
+        self.assertEqual(spent.status, Job.FAILED)
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_heartbeat_keeps_jobs(self):
+        """Test a live worker's renewed locks are left alone"""
+        tasks.enqueue('tests.record')
+        tasks.claim_jobs('w1', now=timezone.now() - timedelta(seconds=61))
+
+        tasks.heartbeat(['w1'])
+
+        self.assertEqual(tasks.requeue_stale(), (0, 0))
+
+    @override_settings(TASK_SCHEDULES={
+        'record': {'task': 'tests.record', 'kwargs': {'value': 1},
+                   'every': 60},
+    })
+    def test_schedules_enqueue_once_per_interval(self):
+        """Test a recurring task is queued when due and moved forward"""
+        now = timezone.now()
+
+        self.assertEqual(tasks.enqueue_due_schedules(now), 1)
+        self.assertEqual(tasks.enqueue_due_schedules(now), 0)
+        later = now + timedelta(seconds=3600)
+        self.assertEqual(tasks.enqueue_due_schedules(later), 1)
+
+        schedule = JobSchedule.objects.get(name='record')
+        self.assertEqual(schedule.next_run_at, later + timedelta(seconds=60))
+        self.assertEqual(Job.objects.filter(task='tests.record').count(), 2)
+
+    @override_settings(TASK_RESULT_RETENTION_DAYS=7)
+    def test_purge_jobs(self):
+        """Test finished jobs past retention are deleted"""
+        old = tasks.enqueue('tests.record')
+        tasks.enqueue('tests.record')
+        self.run_all()
+        Job.objects.filter(pk=old.pk).update(
+            finished_at=timezone.now() - timedelta(days=8)
+        )
+
+        self.assertEqual(tasks.purge_jobs(), 1)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_run_command_task(self):
+        """Test the command task runs a management command"""
+        with patch('core.tasks.call_command') as command:
+            tasks.run_command('purge_tokens', batch_size=10)
+
+        command.assert_called_once()
+        self.assertEqual(command.call_args[0], ('purge_tokens',))
+
+
+@override_settings(TASK_SCHEDULES={})
+class WorkerTests(TransactionTestCase):
+    """Test the worker loop and command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_work_until_empty(self):
+        """Test a worker thread runs every due job and then returns"""
+        for n in range(5):
+            tasks.enqueue('tests.record', {'value': n})
+        tasks.enqueue('tests.fail', max_attempts=1)
+        worker = Worker(batch_size=2, until_empty=True)
+
+        worker.work('w1')
+
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual((worker.passed, worker.failed), (5, 1))
+
+    def test_command_options(self):
+        """Test the command builds its worker from the options"""
+        out = StringIO()
+        with patch('core.management.commands.run_worker.Worker') as worker:
+            worker.return_value.passed = 3
+            worker.return_value.failed = 1
+            call_command('run_worker', '--concurrency', '8',
+                         '--until-empty', stdout=out)
+
+        worker.assert_called_once_with(
+            concurrency=8, batch_size=1, poll_interval=1.0, until_empty=True
+        )
+        self.assertIn('Ran 4 jobs (1 failed)', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+@override_settings(TASK_SCHEDULES={})
+class ConcurrentWorkerTests(TransactionTestCase):
+    """Test several worker threads share the queue without overlap"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_worker_runs_each_job_once(self):
+        """Test every job runs exactly once"""
+        for n in range(50):
+            tasks.enqueue('tests.record', {'value': n})
+        out = StringIO()
+
+        call_command('run_worker', '--concurrency', '4', '--until-empty',
+                     '--batch-size', '3', stdout=out)
+
+        self.assertEqual(sorted(calls), list(range(50)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 50)
+        self.assertIn('Ran 50 jobs (0 failed)', out.getvalue())
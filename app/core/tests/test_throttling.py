@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import throttling
+from core.models import ThrottleBucket
+
+
+class TokenBucketTests(TestCase):
+    """Test the token bucket kept in the database"""
+
+    def test_bucket_allows_burst_then_waits(self):
+        """Test a full bucket admits its size and then asks to wait"""
+        results = [throttling.consume('k', '3/min', now=100)
+                   for _ in range(4)]
+
+        self.assertEqual([allowed for allowed, _ in results],
+                         [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 20)
+
+    def test_bucket_refills_over_time(self):
+        """Test an empty bucket admits again once a request dripped in"""
+        for _ in range(3):
+            throttling.consume('k', '3/min', now=100)
+
+        self.assertFalse(throttling.consume('k', '3/min', now=119)[0])
+        self.assertTrue(throttling.consume('k', '3/min', now=120)[0])
+        self.assertFalse(throttling.consume('k', '3/min', now=120)[0])
+
+    def test_buckets_are_separate(self):
+        """Test keys do not share their requests"""
+        throttling.consume('a', '1/min', now=100)
+
+        self.assertFalse(throttling.consume('a', '1/min', now=100)[0])
+        self.assertTrue(throttling.consume('b', '1/min', now=100)[0])
+
+    def test_parse_rate(self):
+        """Test rates are read as requests per period in seconds"""
+        self.assertEqual(throttling.parse_rate('30/min'), (30, 60))
+        self.assertEqual(throttling.parse_rate('5/hour'), (5, 3600))
+
+    @override_settings(THROTTLE_RATES={'login.ip': '1/min'})
+    def test_throttled_counts(self):
+        """Test throttled requests are counted and the command resets"""
+        throttling.record_throttled('login.ip')
+        throttling.record_throttled('login.ip')
+        out = StringIO()
+
+        call_command('throttle_stats', '--reset', stdout=out)
+
+        self.assertIn('login.ip', out.getvalue())
+        self.assertIn(' 2', out.getvalue())
+        self.assertEqual(throttling.throttled_counts(), {'login.ip': 0})
+
+    def test_bucket_is_one_row(self):
+        """Test a bucket is a single row taken from with one query"""
+        throttling.consume('k', '3/min', now=100)
+
+        with self.assertNumQueries(1):
+            throttling.consume('k', '3/min', now=100)
+
+        bucket = ThrottleBucket.objects.get()
+        self.assertEqual(bucket.key, 'k')
+        self.assertAlmostEqual(bucket.full_at, 140)
+
+    def test_purge_full_buckets(self):
+        """Test buckets full again are purged, busy ones are kept"""
+        throttling.consume('idle', '1/min', now=100)
+        throttling.consume('busy', '1/min', now=150)
+        out = StringIO()
+
+        self.assertEqual(throttling.purge_buckets(now=170), 1)
+        call_command('purge_throttle_buckets', stdout=out)
+
+        self.assertIn('Purged 1 throttle buckets', out.getvalue())
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class ConcurrentBucketTests(TransactionTestCase):
+    """Test concurrent requests never overdraw a bucket"""
+
+    def test_concurrent_requests_counted_once(self):
+        """Test a bucket admits its size across many threads"""
+        def consume(_):
+            try:
+                return throttling.consume('k', '10/hour', now=100)[0]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(8) as pool:
+            allowed = list(pool.map(consume, range(40)))
+
+        self.assertEqual(allowed.count(True), 10)
+
+    @override_settings(THROTTLE_RATES={'login.ip': '1/min'})
+    def test_concurrent_throttled_counted(self):
+        """Test every throttled request is counted across threads"""
+        def record(_):
+            try:
+                throttling.record_throttled('login.ip')
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(record, range(40)))
+
+        self.assertEqual(throttling.throttled_counts(), {'login.ip': 40})
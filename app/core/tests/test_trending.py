@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import trending
+from core.models import Post, Tag, Topic, TrendingScore, TrendingState
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1)
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@example.com',
+            'pass5555'
+        )
+
+    def tag_post(self, user, *titles, hours=0):
+        post = Post.objects.create(
+            user=user, title='t', content='c',
+            created_at=self.now + timedelta(hours=hours),
+        )
+        for title in titles:
+            tag, _ = Tag.objects.get_or_create(user=user, title=title)
+            post.tags.add(tag)
+        return post
+
+    def top(self, kind=TrendingScore.TAG, hours=0):
+        now = self.now + timedelta(hours=hours)
+        return {
+            title: round(score, 6)
+            for title, score in trending.top_trending(kind, 10, now)
+        }
+
+    def test_titles_counted_across_users(self):
+        """Test uses are summed per title case-insensitively"""
+        self.tag_post(self.user, 'Python', 'Django')
+        self.tag_post(self.other, 'python')
+        topic = Topic.objects.create(user=self.user, title='Web')
+        self.tag_post(self.user).topics.add(topic)
+
+        counted = trending.update_trending(self.now)
+
+        self.assertEqual(counted, 4)
+        self.assertEqual(self.top(), {'python': 2, 'django': 1})
+        self.assertEqual(self.top(TrendingScore.TOPIC), {'web': 1})
+
+    def test_incremental_updates(self):
+        """Test each run only counts uses made since the previous one"""
+        self.tag_post(self.user, 'Python')
+        trending.update_trending(self.now)
+        self.tag_post(self.user, 'Python')
+
+        counted = trending.update_trending(self.now, batch_size=1)
+
+        self.assertEqual(counted, 1)
+        self.assertEqual(trending.update_trending(self.now), 0)
+        self.assertEqual(self.top(), {'python': 2})
+
+    def test_scores_decay(self):
+        """Test older uses weigh less than recent ones"""
+        self.tag_post(self.user, 'Old')
+        trending.update_trending(self.now)
+        self.tag_post(self.user, 'New', hours=1)
+        trending.update_trending(self.now + timedelta(hours=1))
+
+        self.assertEqual(self.top(hours=1), {'new': 1, 'old': 0.5})
+        self.assertEqual(self.top(hours=2), {'new': 0.5, 'old': 0.25})
+        self.assertEqual(list(self.top(hours=2)), ['new', 'old'])
+
+    def test_rebase_drops_faded_titles(self):
+        """Test moving the landmark keeps scores and drops faded titles"""
+        self.tag_post(self.user, 'Old')
+        trending.update_trending(self.now)
+        later = self.now + timedelta(hours=trending.REBASE_HALF_LIVES + 1)
+        self.tag_post(self.user, 'New', hours=trending.REBASE_HALF_LIVES + 1)
+
+        trending.update_trending(later)
+
+        self.assertEqual(TrendingState.objects.get().landmark, later)
+        self.assertEqual(
+            list(TrendingScore.objects.values_list('title', 'score')),
+            [('new', 1.0)],
+        )
+
+    def test_first_run_weighs_uses_by_age(self):
+        """Test uses made before the first run count as old ones"""
+        self.tag_post(self.user, 'Old', hours=-2)
+        self.tag_post(self.user, 'Ancient', hours=-100)
+        self.tag_post(self.user, 'New')
+
+        trending.update_trending(self.now)
+
+        self.assertEqual(self.top(), {'new': 1, 'old': 0.25})
+
+    def test_state_created_once(self):
+        """Test runs share the single state row, whoever created it"""
+        first = trending._locked_state(self.now)
+        second = trending._locked_state(self.now + timedelta(hours=1))
+
+        self.assertEqual(second.landmark, first.landmark)
+        self.assertEqual(TrendingState.objects.count(), 1)
+
+    def test_first_run_no_gaps(self):
+        """Test ids deleted before the first run are not looked up"""
+        self.tag_post(self.user, 'Gone').tags.through.objects.all().delete()
+        self.tag_post(self.user, 'Kept')
+
+        trending.update_trending(self.now)
+
+        self.assertEqual(TrendingState.objects.get().tag_gaps, {})
+
+    def test_late_commits_counted(self):
+        """Test a use committed below the cursor is counted on a later run"""
+        self.tag_post(self.user, 'First')
+        trending.update_trending(self.now)
+        late = self.tag_post(self.user, 'Late').tags.through.objects.get(
+            tag__title='Late'
+        )
+        late_id = late.id
+        self.tag_post(self.user, 'Early')
+        late.delete()
+        self.assertEqual(trending.update_trending(self.now), 1)
+
+        late.id = late_id
+        late.save()
+        counted = trending.update_trending(self.now + timedelta(minutes=1))
+
+        self.assertEqual(counted, 1)
+        self.assertEqual(set(self.top()), {'first', 'early', 'late'})
+        self.assertEqual(TrendingState.objects.get().tag_gaps, {})
+
+    @override_settings(TRENDING_LATE_COMMIT_SECONDS=60)
+    def test_gaps_given_up(self):
+        """Test an id that never commits is only looked up for a while"""
+        self.tag_post(self.user, 'First')
+        trending.update_trending(self.now)
+        gone = self.tag_post(self.user, 'Gone').tags.through.objects.get(
+            tag__title='Gone'
+        )
+        gone_id = gone.id
+        self.tag_post(self.user, 'Kept')
+        gone.delete()
+        trending.update_trending(self.now)
+        self.assertEqual(
+            list(TrendingState.objects.get().tag_gaps), [str(gone_id)]
+        )
+
+        trending.update_trending(self.now + timedelta(minutes=2))
+
+        self.assertEqual(TrendingState.objects.get().tag_gaps, {})
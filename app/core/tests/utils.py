@@ -0,0 +1,100 @@
+"""Query budget assertions shared by the API tests
+
+``QueryBudgetMixin`` adds two assertions to a ``TestCase``: that a call
+runs at most a declared number of queries, and that the number does not
+grow with the data it touches. ``route_names`` lists the routes of a URL
+module, so a test can check each of them declares a budget.
+"""
+from contextlib import contextmanager
+from importlib import import_module
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver
+
+
+def route_names(urlconf, namespace):
+    """Return the namespaced names of every route of a URL module"""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(f'{namespace}:{pattern.name}')
+    walk(import_module(urlconf).urlpatterns)
+    return names
+
+
+@contextmanager
+def orm_on_test_thread(module):
+    """Run the ORM calls of an async view module on the calling thread
+
+    The views hand their queries to the ORM thread pool, whose database
+    connections the test's query capture does not see.
+    """
+    def run_sync(func, *args, **kwargs):
+        return sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+    with patch(f'{module}.run_sync', run_sync):
+        yield
+
+
+def format_queries(queries):
+    return '\n'.join(
+        f'{n}. {query["sql"]}' for n, query in enumerate(queries, 1)
+    )
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries code runs"""
+    query_budget_sizes = (1, 50)
+
+    def capture_queries(self, func, using=DEFAULT_DB_ALIAS):
+        """Call func and return the queries it ran"""
+        with CaptureQueriesContext(connections[using]) as context:
+            func()
+        return context.captured_queries
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        """Fail when the block runs more than budget queries"""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        queries = context.captured_queries
+        if len(queries) > budget:
+            self.fail(
+                f'{len(queries)} queries over a budget of {budget}:\n'
+                f'{format_queries(queries)}'
+            )
+
+    def assertConstantQueries(self, func, grow, budget=None, sizes=None,
+                              using=DEFAULT_DB_ALIAS):
+        """Fail when func runs more queries once grow added more data
+
+        ``grow(count)`` adds count more of whatever func's cost might
+        depend on: rows it reads, related rows, items in its payload. func
+        runs once before each measurement, so lazily filled caches and
+        first time writes (e.g. links a write adds) do not count. Returns
+        the number of queries func runs.
+        """
+        small, large = sizes or self.query_budget_sizes
+        grow(small)
+        func()
+        before = self.capture_queries(func, using)
+        grow(large - small)
+        func()
+        after = self.capture_queries(func, using)
+        if len(after) != len(before):
+            self.fail(
+                f'{len(before)} queries with {small} rows but '
+                f'{len(after)} with {large}:\n{format_queries(after)}'
+            )
+        if budget is not None and len(after) > budget:
+            self.fail(
+                f'{len(after)} queries over a budget of {budget}:\n'
+                f'{format_queries(after)}'
+            )
+        return len(after)
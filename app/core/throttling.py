@@ -0,0 +1,197 @@
+"""Token bucket throttles with state shared through the database
+
+Each bucket holds up to N requests and refills at N per period, from a
+rate like ``'30/min'`` in ``THROTTLE_RATES`` under ``<scope>.<kind>``.
+A view opts in with ``throttle_scope`` and the throttle classes of the
+kinds it wants limited: per user, per client IP, per account a login is
+for, or one bucket per endpoint shared by every caller.
+
+A bucket is a ``ThrottleBucket`` row holding the single time at which it
+would be full again. Taking a request out of it is one upsert that
+checks and moves that time, so every worker process shares the bucket
+and concurrent requests are counted exactly. Buckets full again are
+deleted by ``purge_throttle_buckets``.
+
+DRF asks every throttle of a view even once one refused the request, so
+a throttle leaves its bucket alone after an earlier one refused: list
+the narrow kinds first and the endpoint last, and a caller that is
+refused its own bucket does not drain the one every caller shares. The
+throttled requests are counted per rate in ``ThrottledCount`` rows.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections, router
+from rest_framework.throttling import BaseThrottle
+
+from core.models import ThrottleBucket, ThrottledCount
+
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """Return (requests, seconds) of a rate like '30/min'"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def _upsert_sql(connection):
+    table = connection.ops.quote_name(ThrottleBucket._meta.db_table)
+    key, full_at, allowed = map(
+        connection.ops.quote_name, ('key', 'full_at', 'allowed')
+    )
+    old = f'{table}.{full_at}'
+    # The right hand sides all see the row before the update
+    return (
+        f'INSERT INTO {table} ({key}, {full_at}, {allowed}) '
+        f'VALUES (%s, %s, %s) '
+        f'ON CONFLICT ({key}) DO UPDATE SET '
+        f'{full_at} = CASE WHEN {old} <= %s THEN %s '
+        f'WHEN {old} <= %s THEN {old} + %s ELSE {old} END, '
+        f'{allowed} = {old} <= %s '
+        f'RETURNING {full_at}, {allowed}'
+    )
+
+
+def consume(key, rate, now=None):
+    """Take one request out of a bucket
+
+    Returns (allowed, wait): wait is the seconds until the bucket has a
+    request to spare again, 0 when the request was allowed.
+    """
+    count, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    interval = period / count
+    # The bucket is empty once it would take longer than period to refill,
+    # it has a request to spare while full at most this late
+    latest = now + period - interval
+    connection = connections[router.db_for_write(ThrottleBucket)]
+
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(connection), [
+            key, now + interval, True,
+            now, now + interval, latest, interval, latest,
+        ])
+        full_at, allowed = cursor.fetchone()
+    if allowed:
+        return True, 0
+    return False, full_at - latest
+
+
+def purge_buckets(now=None, batch_size=1000):
+    """Delete the buckets full again, which hold no state; returns them"""
+    now = time.time() if now is None else now
+    full = ThrottleBucket.objects.filter(full_at__lte=now)
+    purged = 0
+    while True:
+        keys = list(full.values_list('key', flat=True)[:batch_size])
+        if not keys:
+            return purged
+        # Skips a bucket taken from again since it was listed
+        purged += full.filter(key__in=keys).delete()[0]
+
+
+def _count_sql(connection):
+    table = connection.ops.quote_name(ThrottledCount._meta.db_table)
+    name, count = map(connection.ops.quote_name, ('name', 'count'))
+    return (
+        f'INSERT INTO {table} ({name}, {count}) VALUES (%s, 1) '
+        f'ON CONFLICT ({name}) DO UPDATE SET {count} = {table}.{count} + 1'
+    )
+
+
+def record_throttled(name):
+    """Count a throttled request against its rate name"""
+    connection = connections[router.db_for_write(ThrottledCount)]
+    with connection.cursor() as cursor:
+        cursor.execute(_count_sql(connection), [name])
+
+
+def throttled_counts():
+    """Return the throttled requests counted per configured rate name"""
+    found = dict(
+        ThrottledCount.objects.filter(name__in=settings.THROTTLE_RATES)
+        .values_list('name', 'count')
+    )
+    return {name: found.get(name, 0) for name in settings.THROTTLE_RATES}
+
+
+def reset_throttled_counts():
+    ThrottledCount.objects.filter(name__in=settings.THROTTLE_RATES).delete()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Limit the requests of a view sharing a key to its scope's rate"""
+    kind = None
+
+    def get_key(self, request, view):
+        """Return what to count requests against, None to not limit"""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if getattr(request, '_throttled', False):
+            # Refused already, taking a request would only drain the bucket
+            return True
+        scope = getattr(view, 'throttle_scope', None)
+        name = f'{scope}.{self.kind}'
+        rate = settings.THROTTLE_RATES.get(name)
+        if scope is None or rate is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+
+        digest = hashlib.sha256(str(key).encode()).hexdigest()[:32]
+        allowed, wait = consume(f'{name}:{digest}', rate)
+        if not allowed:
+            self.retry_after = wait
+            request._throttled = True
+            record_throttled(name)
+            logger.info('Throttled %s for %.1fs', name, wait)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserThrottle(TokenBucketThrottle):
+    """One bucket per authenticated user"""
+    kind = 'user'
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPThrottle(TokenBucketThrottle):
+    """One bucket per client address (see NUM_PROXIES)"""
+    kind = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class AccountThrottle(TokenBucketThrottle):
+    """One bucket per account a login names, wherever it comes from"""
+    kind = 'account'
+
+    def get_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            return None
+        return email.strip().lower()
+
+
+class EndpointThrottle(TokenBucketThrottle):
+    """One bucket for every caller of the scope"""
+    kind = 'endpoint'
+
+    def get_key(self, request, view):
+        return 'all'
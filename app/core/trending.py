@@ -0,0 +1,187 @@
+"""Time-decayed trending scores of tag and topic titles across all users
+
+Each use of a title, a post getting a tag or topic with it, is worth 1 at
+the time its post was created, the closest the tables come to when the
+use was made, and halves every ``TRENDING_HALF_LIFE_HOURS``, so the
+first run or one after a backlog does not count old uses as new ones.
+Scores are stored relative to a landmark time instead (forward decay): a
+use at time t adds
+``2 ** ((t - landmark) / half life)``, so runs only add to the rows of
+the titles just used and ``ORDER BY score`` is the current ranking. The
+landmark moves forward now and then to keep the numbers small, which is
+also when faded titles are dropped.
+
+New uses are read from the post/tag and post/topic through tables past
+the row id where the previous run stopped. Ids are handed out when a row
+is inserted, not when it commits, so a slow transaction can commit a row
+below that id after the run moved past it. The ids a run skipped are
+kept as gaps and looked up again on the following runs, until
+``TRENDING_LATE_COMMIT_SECONDS`` passed (rows deleted meanwhile or rolled
+back leave gaps that never fill).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+
+from core.models import Post, TrendingScore, TrendingState
+
+
+# Move the landmark once stored scores grow past 2 ** REBASE_HALF_LIVES
+REBASE_HALF_LIVES = 32
+
+# Most gaps kept per source, the oldest are given up first
+MAX_GAPS = 10000
+
+SOURCES = (
+    (TrendingScore.TAG, Post.tags.through, 'tag', 'last_tag_use',
+     'tag_gaps'),
+    (TrendingScore.TOPIC, Post.topics.through, 'topic', 'last_topic_use',
+     'topic_gaps'),
+)
+
+
+def half_lives(since, now):
+    """Return how many half lives passed between two times"""
+    hours = (now - since).total_seconds() / 3600
+    return hours / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def _locked_state(now):
+    # Concurrent first runs both insert the row, all but one do nothing
+    TrendingState.objects.bulk_create(
+        [TrendingState(pk=1, landmark=now)], ignore_conflicts=True
+    )
+    return TrendingState.objects.select_for_update().get(pk=1)
+
+
+def _add_scores(kind, scores):
+    """Add to the scores of titles, creating the missing rows"""
+    table = connection.ops.quote_name(TrendingScore._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (kind, title, score) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (kind, title) DO UPDATE '
+            f'SET score = {table}.score + EXCLUDED.score',
+            [(kind, title, score) for title, score in scores],
+        )
+
+
+def rebase(state, now):
+    """Move the landmark to now, dropping titles that faded away"""
+    factor = 2 ** -half_lives(state.landmark, now)
+    TrendingScore.objects.filter(
+        score__lt=settings.TRENDING_MIN_SCORE / factor
+    ).delete()
+    TrendingScore.objects.update(score=F('score') * factor)
+    state.landmark = now
+    state.save(update_fields=['landmark', 'updated_at'])
+
+
+def _uses(through, field):
+    """(id, title, time of use) rows of a through table"""
+    return through.objects.values_list(
+        'id', Lower(f'{field}__title'), 'post__created_at'
+    )
+
+
+def _count_uses(state, kind, rows, now):
+    """Add (id, title, used at) rows to the scores, returns their number"""
+    scores = Counter()
+    for _, title, used_at in rows:
+        scores[title] += 2 ** half_lives(state.landmark, min(used_at, now))
+    # Uses faded away before they were seen would only be dropped again
+    floor = settings.TRENDING_MIN_SCORE * 2 ** half_lives(
+        state.landmark, now
+    )
+    _add_scores(kind, [
+        (title, score) for title, score in scores.items() if score >= floor
+    ])
+    return len(rows)
+
+
+def _fill_gaps(state, kind, through, field, gaps_field, now):
+    """Count the skipped ids that committed since, forget expired ones"""
+    gaps = getattr(state, gaps_field)
+    if not gaps:
+        return 0
+    rows = list(
+        _uses(through, field).filter(id__in=[int(pk) for pk in gaps])
+    )
+    for pk, *_ in rows:
+        del gaps[str(pk)]
+    expiry = now.timestamp() - settings.TRENDING_LATE_COMMIT_SECONDS
+    setattr(state, gaps_field, {
+        pk: seen for pk, seen in gaps.items() if seen > expiry
+    })
+    return _count_uses(state, kind, rows, now)
+
+
+def update_trending(now, batch_size=10000):
+    """Fold the uses since the previous run into the scores
+
+    Works through each through table in batches of batch_size ids, one
+    transaction per batch, holding the state row lock so concurrent runs
+    queue up instead of counting a use twice. Returns the uses counted.
+    """
+    counted = 0
+    with transaction.atomic():
+        state = _locked_state(now)
+        if half_lives(state.landmark, now) > REBASE_HALF_LIVES:
+            rebase(state, now)
+
+    for kind, through, field, cursor_field, gaps_field in SOURCES:
+        with transaction.atomic():
+            state = _locked_state(now)
+            counted += _fill_gaps(state, kind, through, field, gaps_field,
+                                  now)
+            state.save(update_fields=[gaps_field, 'updated_at'])
+
+        while True:
+            with transaction.atomic():
+                state = _locked_state(now)
+                last = getattr(state, cursor_field)
+                rows = list(
+                    _uses(through, field).filter(id__gt=last)
+                    .order_by('id')[:batch_size]
+                )
+                if not rows:
+                    break
+                counted += _count_uses(state, kind, rows, now)
+
+                upper = rows[-1][0]
+                seen = {pk for pk, *_ in rows}
+                # The first run starts at the oldest row, the ids missing
+                # before it were deleted long ago
+                first = last + 1 if last else rows[0][0]
+                gaps = getattr(state, gaps_field)
+                gaps.update(
+                    (str(pk), now.timestamp())
+                    for pk in range(first, upper)
+                    if pk not in seen
+                )
+                if len(gaps) > MAX_GAPS:
+                    oldest = sorted(gaps, key=int)[:len(gaps) - MAX_GAPS]
+                    for pk in oldest:
+                        del gaps[pk]
+                setattr(state, cursor_field, upper)
+                state.save(
+                    update_fields=[cursor_field, gaps_field, 'updated_at']
+                )
+    return counted
+
+
+def top_trending(kind, limit, now):
+    """Return the current (title, score) pairs of the top titles"""
+    state = TrendingState.objects.filter(pk=1).first()
+    if state is None:
+        return []
+    decay = 2 ** -half_lives(state.landmark, now)
+    rows = (
+        TrendingScore.objects.filter(kind=kind)
+        .order_by('-score', 'title')
+        .values_list('title', 'score')[:limit]
+    )
+    return [(title, score * decay) for title, score in rows]
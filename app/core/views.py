@@ -0,0 +1,15 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.db.pool import pool_stats
+from user.authentication import ExpiringTokenAuthentication
+
+
+class DatabasePoolStatsView(APIView):
+    """Report connection pool utilization for this worker process"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(pool_stats())
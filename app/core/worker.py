@@ -0,0 +1,104 @@
+"""Worker process running queued jobs on a pool of threads
+
+Each thread claims and runs jobs on its own database connection. The
+main thread enqueues due recurring tasks, renews the locks of the jobs
+being run and requeues the jobs of workers that died, every poll
+interval.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+
+from core import tasks
+
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Runs jobs from the queue until stopped"""
+
+    def __init__(self, concurrency=1, batch_size=1, poll_interval=1.0,
+                 until_empty=False):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.until_empty = until_empty
+        self.stopping = threading.Event()
+        self.ids = [
+            f'{socket.gethostname()}:{os.getpid()}:{n}'
+            for n in range(concurrency)
+        ]
+        self.passed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def stop(self, *args):
+        """Finish the jobs at hand and exit"""
+        self.stopping.set()
+
+    def run(self):
+        tasks.discover_tasks()
+        threads = [
+            threading.Thread(target=self.work, args=(worker_id,),
+                             name=f'worker-{n}', daemon=True)
+            for n, worker_id in enumerate(self.ids)
+        ]
+        self.maintain()
+        for thread in threads:
+            thread.start()
+
+        renew_every = settings.TASK_LOCK_TIMEOUT / 3
+        renewed = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            if time.monotonic() - renewed >= renew_every:
+                renewed = time.monotonic()
+                self.maintain(heartbeat=True)
+            else:
+                self.maintain()
+            for thread in threads:
+                thread.join(self.poll_interval / len(threads))
+        close_old_connections()
+
+    def maintain(self, heartbeat=False):
+        try:
+            if heartbeat:
+                tasks.heartbeat(self.ids)
+            tasks.enqueue_due_schedules()
+            tasks.requeue_stale()
+        except DatabaseError:
+            # Try again next time round, e.g. while the database restarts
+            logger.exception('Queue maintenance failed')
+        close_old_connections()
+
+    def work(self, worker_id):
+        try:
+            while not self.stopping.is_set():
+                try:
+                    jobs = tasks.claim_jobs(worker_id, self.batch_size)
+                except DatabaseError:
+                    logger.exception('Claiming jobs failed')
+                    connections.close_all()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if not jobs:
+                    if self.until_empty:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                for job in jobs:
+                    passed = tasks.run_job(job)
+                    with self._lock:
+                        if passed:
+                            self.passed += 1
+                        else:
+                            self.failed += 1
+                # Hand the connection back to the pool between batches
+                close_old_connections()
+        finally:
+            connections.close_all()
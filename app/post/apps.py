@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ProductConfig(AppConfig):
     name = 'post'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,130 @@
+"""Async read endpoints for deployments served through app.asgi
+
+The ORM and DRF serializers are synchronous, so every database touching
+step runs on the bounded ORM thread pool while the view itself waits on
+the event loop without holding a thread.
+
+Only the view and ReplicaRoutingMiddleware are natively async. Django's
+session, CSRF, authentication and message middleware (like every
+MiddlewareMixin one) only have synchronous hooks, which under ASGI run
+through sync_to_async on the single thread sensitive executor. Every
+request still takes those thread hops and queues behind the middleware
+of other requests on that one thread.
+"""
+import functools
+
+from django.http import JsonResponse
+from rest_framework import exceptions
+
+from core.executor import run_sync
+from core.models import Tag, Topic, Post
+from user.authentication import ExpiringTokenAuthentication, \
+    SignedTokenAuthentication
+
+from . import queries, serializers
+
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+AUTHENTICATORS = (
+    ExpiringTokenAuthentication(),
+    SignedTokenAuthentication(),
+)
+
+
+def _error(exc):
+    """Render an API exception the way DRF does"""
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = ExpiringTokenAuthentication.keyword
+    return response
+
+
+def _authenticate(request):
+    for authenticator in AUTHENTICATORS:
+        credentials = authenticator.authenticate(request)
+        if credentials is not None:
+            return credentials
+    return None
+
+
+def token_required(view):
+    """Authenticate a read-only async view with the DRF token header"""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return _error(exceptions.MethodNotAllowed(request.method))
+        try:
+            credentials = await run_sync(_authenticate, request)
+        except exceptions.AuthenticationFailed as exc:
+            return _error(exc)
+        if credentials is None:
+            return _error(exceptions.NotAuthenticated())
+        request.user = credentials[0]
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _list_posts(user, params):
+    posts = queries.post_list(user, params)
+    return serializers.PostSerializer(posts, many=True).data
+
+
+def _retrieve_post(user, pk):
+    posts = Post.objects.filter(user=user, pk=pk).prefetch_related(
+        'tags', 'topics'
+    )
+    post = posts.first()
+    if post is None:
+        raise exceptions.NotFound()
+    return serializers.PostDetailSerializer(post).data
+
+
+def _list_attrs(model, serializer_class, user, params):
+    queryset = queries.attr_list(model, user, params)
+    return serializer_class(queryset, many=True).data
+
+
+@token_required
+async def post_list(request):
+    """List the posts of the authenticated user"""
+    try:
+        data = await run_sync(_list_posts, request.user, request.GET)
+    except exceptions.ValidationError as exc:
+        return _error(exc)
+    return JsonResponse(data, safe=False)
+
+
+@token_required
+async def post_detail(request, pk):
+    """Retrieve one post of the authenticated user"""
+    try:
+        data = await run_sync(_retrieve_post, request.user, pk)
+    except exceptions.NotFound as exc:
+        return _error(exc)
+    return JsonResponse(data)
+
+
+@token_required
+async def tag_list(request):
+    """List the tags of the authenticated user"""
+    data = await run_sync(
+        _list_attrs, Tag, serializers.TagSerializer, request.user,
+        request.GET,
+    )
+    return JsonResponse(data, safe=False)
+
+
+@token_required
+async def topic_list(request):
+    """List the topics of the authenticated user"""
+    data = await run_sync(
+        _list_attrs, Topic, serializers.TopicSerializer, request.user,
+        request.GET,
+    )
+    return JsonResponse(data, safe=False)
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.db.models import CharField, FloatField, Func, Lookup, Value
+from django.db.models.functions import Lower
+
+
+# Sorts after any character, so every title starting with a prefix sorts
+# before the prefix followed by it
+LAST_CHARACTER = chr(0x10FFFF)
+
+
+class CollateC(Func):
+    """Compare an expression byte by byte, whatever the database collation"""
+    template = '(%(expressions)s COLLATE "C")'
+    output_field = CharField()
+
+
+@Lower.register_lookup
+class TrigramWordSimilar(Lookup):
+    """Whether the value is similar to a run of words of the title
+
+    pg_trgm's ``title %> value``, which the trigram index serves.
+    """
+    lookup_name = 'trigram_word_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} %%> {rhs}', lhs_params + rhs_params
+
+
+class WordSimilarity(Func):
+    """pg_trgm's similarity of a term to the closest run of words"""
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+def autocomplete(queryset, prefix, limit, fuzzy=False):
+    """Return up to limit rows whose title matches what the user typed
+
+    Prefix matches filter and sort on ``lower(title) COLLATE "C"``, the
+    expression of the ``(user_id, lower(title) COLLATE "C")`` index, so
+    PostgreSQL can walk the index in order and stop after ``limit`` rows
+    whatever the database collation; titles sort byte-wise as a result.
+    Fuzzy matching uses pg_trgm word similarity, so a term matches a part
+    of a longer title, over the user's titles through a ``(user_id,
+    lower(title) gin_trgm_ops)`` btree_gin index where available and
+    falls back to a substring match elsewhere.
+    """
+    term = prefix.lower()
+    title_lower = Lower('title')
+    if connection.vendor == 'postgresql':
+        title_lower = CollateC(title_lower)
+    queryset = queryset.annotate(title_lower=title_lower)
+
+    if fuzzy and connection.vendor == 'postgresql':
+        queryset = queryset.annotate(trigram_title=Lower('title'))
+        return queryset.filter(
+            trigram_title__trigram_word_similar=term
+        ).annotate(
+            similarity=WordSimilarity(Value(term), 'trigram_title')
+        ).order_by('-similarity', 'title_lower')[:limit]
+    if fuzzy:
+        queryset = queryset.filter(title_lower__contains=term)
+    else:
+        # A range rather than LIKE, which Django casts to text and so away
+        # from the index expression
+        queryset = queryset.filter(
+            title_lower__gte=term, title_lower__lt=term + LAST_CHARACTER
+        )
+    return queryset.order_by('title_lower')[:limit]
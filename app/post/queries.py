@@ -0,0 +1,51 @@
+"""Querysets of the list routes, shared by the sync and async views
+
+Both flavours of a route must answer the same query with the same rows in
+the same order, so they build their querysets here from the user and the
+query string. Invalid parameters raise DRF's ``ValidationError``.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from core.models import Post
+
+from . import serializers
+
+
+def filter_created(queryset, params):
+    """Narrow to ?created_from= and ?created_to= (inclusive days)
+
+    Ranges on created_at only scan the matching post partitions.
+    """
+    dates = serializers.CreatedRangeSerializer(data=params)
+    dates.is_valid(raise_exception=True)
+    tz = timezone.get_current_timezone()
+    first = dates.validated_data.get('created_from')
+    if first is not None:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(
+            datetime.combine(first, time.min), tz
+        ))
+    last = dates.validated_data.get('created_to')
+    if last is not None:
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(
+            datetime.combine(last + timedelta(days=1), time.min), tz
+        ))
+    return queryset
+
+
+def post_list(user, params):
+    """The user's posts in id order, with their tags and topics"""
+    queryset = Post.objects.filter(user=user).order_by('id')
+    return filter_created(queryset, params).prefetch_related(
+        'tags', 'topics'
+    )
+
+
+def attr_list(model, user, params):
+    """The user's tags or topics, by title or with ?ordering=popular"""
+    queryset = model.objects.filter(user=user)
+    if params.get('ordering') == 'popular':
+        # Served by the (user, -post_count) index
+        return queryset.order_by('-post_count', '-title')
+    return queryset.order_by('-title')
@@ -0,0 +1,242 @@
+"""Precomputed index of post similarity by shared tags and topics
+
+Every post is a sparse binary vector over its tag and topic ids. The index
+keeps those vectors in CSR form plus the transposed (inverted) form, so a
+query only touches the posts sharing at least one feature with it and
+scores them with a handful of vectorized NumPy operations. Tags and topics
+belong to a single user, so every candidate belongs to the query's owner.
+
+The index is written to ``RELATED_INDEX_PATH`` by ``build_related_index``,
+run on the ``build-related-index`` task schedule, and loaded lazily by
+every worker, which reloads it when the file changes.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import JobSchedule, Post, Tombstone
+
+
+METRICS = ('jaccard', 'cosine')
+
+# Entry of TASK_SCHEDULES that builds the index
+INDEX_SCHEDULE = 'build-related-index'
+
+_cache = {'path': None, 'mtime': None, 'index': None}
+_cache_lock = threading.Lock()
+
+
+class IndexNotBuilt(Exception):
+    """Raised when no related posts index was built yet"""
+
+
+def tag_feature(tag_id):
+    return tag_id * 2
+
+
+def topic_feature(topic_id):
+    return topic_id * 2 + 1
+
+
+class RelatedIndex:
+    """Sparse post/feature matrix with its inverted index"""
+
+    def __init__(self, post_ids, row_ptr, row_features, feature_keys,
+                 feature_ptr, feature_rows, built_at):
+        self.post_ids = post_ids
+        self.row_ptr = row_ptr
+        self.row_features = row_features
+        self.feature_keys = feature_keys
+        self.feature_ptr = feature_ptr
+        self.feature_rows = feature_rows
+        self.built_at = float(built_at)
+
+    @classmethod
+    def from_features(cls, features, built_at):
+        """Build the index from a mapping of post id to feature ids"""
+        post_ids = np.array(sorted(features), dtype=np.int64)
+        rows = [np.unique(np.asarray(features[pk], dtype=np.int64))
+                for pk in post_ids]
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        row_ptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        row_features = (
+            np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        )
+
+        owners = np.repeat(np.arange(len(post_ids), dtype=np.int64), lengths)
+        order = np.argsort(row_features, kind='stable')
+        sorted_features = row_features[order]
+        feature_keys, starts = np.unique(sorted_features, return_index=True)
+        feature_ptr = np.concatenate(
+            (starts, [len(sorted_features)])
+        ).astype(np.int64)
+        return cls(
+            post_ids, row_ptr, row_features, feature_keys, feature_ptr,
+            owners[order], built_at,
+        )
+
+    def to_features(self):
+        """Return the mapping of post id to feature ids"""
+        return {
+            int(pk): self.row_features[self.row_ptr[i]:self.row_ptr[i + 1]]
+            for i, pk in enumerate(self.post_ids)
+        }
+
+    def similar(self, features, exclude=None, limit=10, metric='jaccard'):
+        """Return (post id, score) pairs most similar to the features"""
+        query = np.unique(np.asarray(features, dtype=np.int64))
+        if not query.size or not self.feature_keys.size:
+            return []
+        slots = np.searchsorted(self.feature_keys, query)
+        slots = slots[slots < len(self.feature_keys)]
+        slots = slots[np.isin(self.feature_keys[slots], query)]
+        if not slots.size:
+            return []
+
+        postings = np.concatenate([
+            self.feature_rows[self.feature_ptr[s]:self.feature_ptr[s + 1]]
+            for s in slots
+        ])
+        candidates, overlap = np.unique(postings, return_counts=True)
+        lengths = self.row_ptr[candidates + 1] - self.row_ptr[candidates]
+        if metric == 'cosine':
+            scores = overlap / np.sqrt(len(query) * lengths)
+        else:
+            scores = overlap / (len(query) + lengths - overlap)
+
+        post_ids = self.post_ids[candidates]
+        if exclude is not None:
+            keep = post_ids != exclude
+            post_ids, scores = post_ids[keep], scores[keep]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            post_ids, scores = post_ids[top], scores[top]
+        order = np.lexsort((post_ids, -scores))
+        return [
+            (int(post_ids[i]), float(scores[i])) for i in order
+        ]
+
+    def save(self, path):
+        """Write the index atomically so readers never see a partial file"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(
+            tmp_path,
+            post_ids=self.post_ids,
+            row_ptr=self.row_ptr,
+            row_features=self.row_features,
+            feature_keys=self.feature_keys,
+            feature_ptr=self.feature_ptr,
+            feature_rows=self.feature_rows,
+            built_at=np.array(self.built_at),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+
+def collect_features(posts=None):
+    """Read the features of posts (all of them by default) from the DB"""
+    through_tags = Post.tags.through.objects.all()
+    through_topics = Post.topics.through.objects.all()
+    if posts is None:
+        posts = Post.objects.all()
+    else:
+        through_tags = through_tags.filter(post__in=posts)
+        through_topics = through_topics.filter(post__in=posts)
+
+    features = defaultdict(list)
+    for pk in posts.values_list('id', flat=True).iterator():
+        features[pk]
+    pairs = through_tags.values_list('post_id', 'tag_id').iterator()
+    for post_id, tag_id in pairs:
+        features[post_id].append(tag_feature(tag_id))
+    pairs = through_topics.values_list('post_id', 'topic_id').iterator()
+    for post_id, topic_id in pairs:
+        features[post_id].append(topic_feature(topic_id))
+    return features
+
+
+def build_index():
+    """Build the index over every post"""
+    started = time.time()
+    return RelatedIndex.from_features(collect_features(), started)
+
+
+def refresh_index(index):
+    """Fold the posts changed or deleted since the index was built into it
+
+    Relies on ``Post.updated_at`` being bumped by tag and topic changes and
+    on post tombstones, the same as delta sync. Returns the new index and
+    the number of changed posts read again.
+    """
+    started = time.time()
+    since = datetime.fromtimestamp(index.built_at, tz=dt_timezone.utc)
+    since -= timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+    features = index.to_features()
+    deleted = Tombstone.objects.filter(
+        model='post', deleted_at__gt=since
+    ).values_list('object_id', flat=True)
+    for pk in deleted:
+        features.pop(pk, None)
+    changed = collect_features(Post.objects.filter(updated_at__gt=since))
+    features.update(changed)
+    return RelatedIndex.from_features(features, started), len(changed)
+
+
+def get_index():
+    """Return the index on disk, reloading it when the file changed"""
+    path = settings.RELATED_INDEX_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cache['path'] != path or _cache['mtime'] != mtime:
+            _cache.update(
+                path=path, mtime=mtime, index=RelatedIndex.load(path)
+            )
+        return _cache['index']
+
+
+def request_build():
+    """Make the index build due now rather than at its next scheduled run"""
+    JobSchedule.objects.filter(name=INDEX_SCHEDULE).update(
+        next_run_at=timezone.now()
+    )
+
+
+def post_features(post):
+    """Read the current features of one post"""
+    tags = post.tags.values_list('id', flat=True)
+    topics = post.topics.values_list('id', flat=True)
+    return (
+        [tag_feature(pk) for pk in tags] +
+        [topic_feature(pk) for pk in topics]
+    )
+
+
+def related_posts(post, limit=10, metric='jaccard'):
+    """Return (post id, score) pairs of the posts most like this one
+
+    The query post's features are read live so fresh edits count at once.
+    Without a built index the build is brought forward and IndexNotBuilt
+    raised, rather than scanning the owner's posts inside the request.
+    """
+    index = get_index()
+    if index is None:
+        request_build()
+        raise IndexNotBuilt
+    return index.similar(
+        post_features(post), exclude=post.pk, limit=limit, metric=metric
+    )
@@ -1,41 +1,236 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connections, router, transaction
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
-from core.models import Tag, Topic, Post
+from core.models import Tag, Topic, Post, TrendingScore
 
+from .related import METRICS
+from .signals import emit
 
-class TagSerializer(serializers.ModelSerializer):
+
+def insert_titles(model, user, titles):
+    """Insert tags or topics, skipping titles the user already has
+
+    Returns the rows this call inserted by title, leaving out the ones a
+    concurrent request inserted first.
+    """
+    objs = [model(user=user, title=title) for title in titles]
+    fields = [
+        field for field in model._meta.local_concrete_fields
+        if not field.primary_key
+    ]
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    row = ', '.join(['%s'] * len(fields))
+    params = [
+        field.get_db_prep_save(field.pre_save(obj, True), connection)
+        for obj in objs for field in fields
+    ]
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES {", ".join(f"({row})" for _ in objs)} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {quote(model._meta.pk.column)}, '
+        f'{quote(model._meta.get_field("title").column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        inserted = dict((title, pk) for pk, title in cursor.fetchall())
+    created = {}
+    for obj in objs:
+        if obj.title in inserted:
+            obj.pk = inserted[obj.title]
+            obj._state.adding = False
+            obj._state.db = connection.alias
+            created[obj.title] = obj
+    return created
+
+
+def resolve_titles(model, user, titles):
+    """Return the user's tags or topics with these titles, creating any
+    that are missing
+
+    Takes one query when all exist, two otherwise. Rows inserted by a
+    concurrent request in between are skipped by ``ON CONFLICT DO
+    NOTHING``, picked up by a third query and not announced as created.
+    """
+    titles = list(dict.fromkeys(title.strip() for title in titles))
+    titles = [title for title in titles if title]
+    found = {
+        obj.title: obj
+        for obj in model.objects.filter(user=user, title__in=titles)
+    }
+    missing = [title for title in titles if title not in found]
+    if missing:
+        created = insert_titles(model, user, missing)
+        for obj in created.values():
+            emit(obj, 'created')
+        found.update(created)
+        raced = [title for title in missing if title not in created]
+        if raced:
+            found.update(
+                (obj.title, obj)
+                for obj in model.objects.filter(user=user, title__in=raced)
+            )
+    return [found[title] for title in titles]
+
+
+class UniqueTitleMixin:
+    """Reject a title the requesting user already has
+
+    The check runs before the write, so a concurrent request can still
+    take the title in between; the unique constraint then fails the write,
+    which is reported the same way.
+    """
+
+    def validate_title(self, value):
+        request = self.context.get('request')
+        if request is None:
+            return value
+        existing = self.Meta.model.objects.filter(
+            user=request.user, title=value
+        )
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if existing.exists():
+            raise serializers.ValidationError(self.duplicate_title_message())
+        return value
+
+    def duplicate_title_message(self):
+        return (
+            f'You already have a {self.Meta.model._meta.verbose_name} '
+            f'with this title.'
+        )
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'title': [self.duplicate_title_message()]}
+            )
+
+
+class ManyPrimaryKeysField(serializers.ManyRelatedField):
+    """List of primary keys looked up in one query rather than one each"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        found = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in found:
+                child.fail('does_not_exist', pk_value=pk)
+        return [found[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field whose many=True form is a ManyPrimaryKeysField"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ManyPrimaryKeysField(**list_kwargs)
+
+
+class TagSerializer(UniqueTitleMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
         model = Tag
-        fields = ('id', 'title')
-        read_only_fields = ('id',)
+        fields = ('id', 'title', 'post_count')
+        read_only_fields = ('id', 'post_count')
 
 
-class TopicSerializer(serializers.ModelSerializer):
+class TopicSerializer(UniqueTitleMixin, serializers.ModelSerializer):
     """Serializer for topic objects"""
 
     class Meta:
         model = Topic
-        fields = ('id', 'title')
-        read_only_fields = ('id',)
+        fields = ('id', 'title', 'post_count')
+        read_only_fields = ('id', 'post_count')
 
 
 class PostSerializer(serializers.ModelSerializer):
-    """Serialize a post"""
-    topics = serializers.PrimaryKeyRelatedField(
+    """Serialize a post
+
+    ``tag_titles`` and ``topic_titles`` name tags and topics to attach in
+    addition to ``tags`` and ``topics``, creating the ones the user does
+    not have yet.
+    """
+    topics = BulkPrimaryKeyRelatedField(
         many=True,
-        queryset=Topic.objects.all()
+        queryset=Topic.objects.all(),
+        required=False
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        required=False
+    )
+    tag_titles = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
+    )
+    topic_titles = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
     )
 
     class Meta:
         model = Post
-        fields = ('id', 'title', 'content', 'date', 'topics', 'tags')
-        read_only_fields = ('id',)
+        fields = (
+            'id', 'title', 'content', 'date', 'topics', 'tags',
+            'tag_titles', 'topic_titles', 'version',
+        )
+        read_only_fields = ('id', 'version')
+
+    def create(self, validated_data):
+        titles = self._pop_titles(validated_data)
+        post = super().create(validated_data)
+        self._attach_titles(post, titles)
+        return post
+
+    def update(self, instance, validated_data):
+        titles = self._pop_titles(validated_data)
+        post = super().update(instance, validated_data)
+        self._attach_titles(post, titles)
+        return post
+
+    def _pop_titles(self, validated_data):
+        return {
+            'tags': (Tag, validated_data.pop('tag_titles', None)),
+            'topics': (Topic, validated_data.pop('topic_titles', None)),
+        }
+
+    def _attach_titles(self, post, titles):
+        for field, (model, names) in titles.items():
+            if names:
+                objs = resolve_titles(model, post.user, names)
+                getattr(post, field).add(*objs)
 
 
 class PostDetailSerializer(PostSerializer):
@@ -44,6 +239,12 @@ class PostDetailSerializer(PostSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class CreatedRangeSerializer(serializers.Serializer):
+    """Serializer for the creation day filters of the post list"""
+    created_from = serializers.DateField(required=False)
+    created_to = serializers.DateField(required=False)
+
+
 class PostImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to post"""
 
@@ -51,3 +252,74 @@ class PostImageSerializer(serializers.ModelSerializer):
         model = Post
         fields = ('id', 'image')
         read_only_fields = ('id',)
+
+
+class PostBatchSerializer(serializers.Serializer):
+    """Serializer for the ids of posts fetched in one request"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.POST_BATCH_MAX_IDS
+    )
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer for tag and topic autocomplete parameters"""
+    prefix = serializers.CharField(max_length=255, trim_whitespace=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.AUTOCOMPLETE_MAX_LIMIT,
+        default=settings.AUTOCOMPLETE_DEFAULT_LIMIT
+    )
+    fuzzy = serializers.BooleanField(default=False)
+
+
+class RelatedPostsSerializer(serializers.Serializer):
+    """Serializer for related posts parameters"""
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RELATED_MAX_LIMIT,
+        default=settings.RELATED_DEFAULT_LIMIT
+    )
+    metric = serializers.ChoiceField(choices=METRICS, default='jaccard')
+
+
+class TrendingSerializer(serializers.Serializer):
+    """Serializer for trending titles parameters"""
+    kind = serializers.ChoiceField(
+        choices=[kind for kind, _ in TrendingScore.KIND_CHOICES],
+        default=TrendingScore.TAG
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.TRENDING_MAX_LIMIT,
+        default=settings.TRENDING_DEFAULT_LIMIT
+    )
+
+
+class AnalyticsSerializer(serializers.Serializer):
+    """Serializer for analytics range query parameters"""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    by = serializers.ChoiceField(
+        choices=('day', 'tag', 'topic'), default='day'
+    )
+    tag = serializers.IntegerField(min_value=1, required=False)
+    topic = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError(
+                {'end': 'Must not be before start.'}
+            )
+        span = (attrs['end'] - attrs['start']).days + 1
+        if span > settings.ANALYTICS_MAX_DAYS:
+            raise serializers.ValidationError({
+                'end': f'Ranges span at most '
+                       f'{settings.ANALYTICS_MAX_DAYS} days.'
+            })
+        if 'tag' in attrs and 'topic' in attrs:
+            raise serializers.ValidationError(
+                'Filter by a tag or a topic, not both.'
+            )
+        return attrs
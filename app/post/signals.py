@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, \
+    m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import events, rollups
+from core.counters import adjust_post_count
+from core.models import Tag, Topic, Post, Tombstone
+
+
+STREAMED_MODELS = (Post, Tag, Topic)
+
+
+def emit(instance, action):
+    """Publish a change event once the surrounding transaction commits"""
+    model = instance._meta.model_name
+    user_id, pk = instance.user_id, instance.pk
+    transaction.on_commit(
+        lambda: events.publish(user_id, model, action, pk)
+    )
+
+
+@receiver(post_save)
+def stream_saved(sender, instance, created, raw=False, **kwargs):
+    if sender in STREAMED_MODELS and not raw:
+        emit(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete)
+def stream_deleted(sender, instance, **kwargs):
+    if sender in STREAMED_MODELS:
+        emit(instance, 'deleted')
+        Tombstone.objects.create(
+            user_id=instance.user_id,
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Topic)
+def touch_posts_of_deleted_attr(sender, instance, **kwargs):
+    """Mark posts losing a tag or topic as changed for delta sync"""
+    field = 'tags' if sender is Tag else 'topics'
+    Post.objects.filter(**{field: instance}).update(
+        updated_at=timezone.now(), version=F('version') + 1
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.count_post(instance, 1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.topics.through)
+def stream_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Post.objects.filter(pk=instance.pk).update(
+            updated_at=timezone.now(), version=F('version') + 1
+        )
+        # Keeps the ETag of a response built from the instance current
+        instance.version += 1
+        emit(instance, 'updated')
+    elif pk_set:
+        # Changed from the tag or topic side, every post touched changed
+        posts = Post.objects.filter(pk__in=pk_set)
+        posts.update(updated_at=timezone.now(), version=F('version') + 1)
+        for post in posts.only('id', 'user'):
+            emit(post, 'updated')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.topics.through)
+def count_relations_changed(sender, instance, action, reverse, model,
+                            pk_set, **kwargs):
+    """Keep post counts and rollups in step with the through table"""
+    if reverse:
+        # instance is the tag or topic, pk_set holds post ids
+        owner, column = type(instance), 'post_id'
+        filters = {f'{owner._meta.model_name}_id': instance.pk}
+    else:
+        owner, column = model, f'{model._meta.model_name}_id'
+        filters = {'post_id': instance.pk}
+
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every pk it was given, count only real links
+        links = sender.objects.filter(**filters)
+        if pk_set is not None:
+            links = links.filter(**{f'{column}__in': pk_set})
+        pending = getattr(instance, '_counted_links', {})
+        pending[sender] = list(links.values_list(column, flat=True))
+        instance._counted_links = pending
+        return
+
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed = getattr(instance, '_counted_links', {}).pop(sender, [])
+        delta = -1
+    else:
+        return
+
+    if reverse:
+        adjust_post_count(owner, [instance.pk], delta * len(changed))
+        links = [(post_id, instance.pk) for post_id in changed]
+    else:
+        adjust_post_count(owner, changed, delta)
+        links = [(instance.pk, pk) for pk in changed]
+    rollups.count_relations(owner, links, delta)
+
+
+@receiver(pre_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """Decrement the counters and rollups of a deleted post"""
+    rollups.count_post(instance, -1)
+    for model, related in ((Tag, instance.tags), (Topic, instance.topics)):
+        pks = list(related.values_list('pk', flat=True))
+        adjust_post_count(model, pks, -1)
+        rollups.count_relations(
+            model, [(instance.pk, pk) for pk in pks], -1
+        )
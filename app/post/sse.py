@@ -0,0 +1,187 @@
+"""Server-Sent Events stream of the user's post, tag and topic changes
+
+Django 3.1 can only stream responses from synchronous iterators, so the
+stream is a small ASGI application mounted in front of Django by
+``app.asgi``. Clients authenticate with the usual ``Authorization: Token``
+header or a signed ``Bearer`` access token. Browsers' EventSource cannot
+send headers, so ``?token=`` takes a stream token from
+``/api/user/token/stream/`` instead: URLs end up in access logs, and a
+stream token only opens the stream, for a minute. Clients resume with
+``Last-Event-ID`` (or ``?last_event_id=``).
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework import exceptions
+
+from core.events import RecentIds, broker
+from core.executor import run_sync
+from user import tokens
+from user.authentication import ExpiringTokenAuthentication, \
+    stateless_user
+
+
+EVENTS_PATH = '/api/posts/events/'
+
+
+def format_event(event):
+    """Encode a change event in the text/event-stream format"""
+    data = json.dumps({
+        'model': event['model'],
+        'action': event['action'],
+        'id': event['pk'],
+    })
+    name = f"{event['model']}.{event['action']}"
+    return f"id: {event['id']}\nevent: {name}\ndata: {data}\n\n".encode()
+
+
+RESET = b'event: reset\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+
+
+def _authenticate_stream(key):
+    try:
+        claims = tokens.verify(key, tokens.STREAM)
+    except tokens.InvalidToken as exc:
+        raise exceptions.AuthenticationFailed(str(exc))
+    return stateless_user(claims.user_id)
+
+
+def _authenticate(key):
+    if '.' in key:
+        # Signed access tokens have dots, DRF token keys are plain hex
+        try:
+            claims = tokens.verify(key, tokens.ACCESS)
+        except tokens.InvalidToken as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+        if tokens.revocations.is_revoked(claims.jti):
+            raise exceptions.AuthenticationFailed('Token has been revoked.')
+        return stateless_user(claims.user_id)
+    user, _ = ExpiringTokenAuthentication().authenticate_credentials(key)
+    return user
+
+
+class EventStreamApp:
+    """Serve the event stream and pass every other request to Django"""
+
+    def __init__(self, app, path=EVENTS_PATH):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.app(scope, receive, send)
+        return await self.stream(scope, receive, send)
+
+    async def respond(self, send, status, detail, headers=()):
+        body = json.dumps({'detail': detail}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, scope, receive, send):
+        headers = {
+            key.decode('latin1').lower(): value.decode('latin1')
+            for key, value in scope['headers']
+        }
+        query = parse_qs(scope.get('query_string', b'').decode())
+
+        if scope['method'] != 'GET':
+            return await self.respond(
+                send, 405, f"Method \"{scope['method']}\" not allowed."
+            )
+
+        key = query.get('token', [None])[0]
+        authenticate = _authenticate_stream
+        authorization = headers.get('authorization', '').split()
+        if len(authorization) == 2 and authorization[0] in ('Token', 'Bearer'):
+            key = authorization[1]
+            authenticate = _authenticate
+        if not key:
+            return await self.respond(
+                send, 401, str(exceptions.NotAuthenticated.default_detail),
+                [(b'www-authenticate', b'Token')],
+            )
+        try:
+            user = await run_sync(authenticate, key)
+        except exceptions.AuthenticationFailed as exc:
+            return await self.respond(
+                send, 401, str(exc.detail), [(b'www-authenticate', b'Token')]
+            )
+
+        last_id = headers.get('last-event-id') or query.get(
+            'last_event_id', [None])[0]
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            last_id = None
+
+        subscription = broker.subscribe(user.id)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.consume(subscription, last_id, receive, send)
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def consume(self, subscription, last_id, receive, send):
+        async def write(chunk, more=True):
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': more,
+            })
+
+        await write(b'retry: 3000\n\n')
+        # Events may arrive out of id order, so skip only those already sent
+        sent = RecentIds(broker.queue_size)
+        if last_id is not None:
+            backlog = broker.replay(subscription.user_id, last_id)
+            if backlog is None:
+                return await write(RESET, more=False)
+            sent.add(last_id)
+            for event in backlog:
+                sent.add(event['id'])
+                await write(format_event(event))
+
+        heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            while True:
+                if subscription.overflowed:
+                    return await write(RESET, more=False)
+                event = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {event, disconnected},
+                    timeout=heartbeat,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    event.cancel()
+                    return
+                if event not in done:
+                    event.cancel()
+                    await write(KEEPALIVE)
+                elif sent.add(event.result()['id']):
+                    await write(format_event(event.result()))
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
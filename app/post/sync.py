@@ -0,0 +1,75 @@
+"""Delta sync of a user's posts, tags and topics
+
+A sync token is the server time a sync was answered at, in microseconds.
+Rows are selected with an overlap window before the token because a
+transaction may commit after a later sync has already read, carrying an
+``updated_at`` from before it. Clients upsert by id, so repeats are
+harmless.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Tag, Topic, Post, Tombstone
+
+
+class InvalidToken(ValueError):
+    """Raised for a sync token that was not issued by this server"""
+
+
+def encode_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_token(token):
+    try:
+        micros = int(token)
+    except (TypeError, ValueError):
+        raise InvalidToken(token)
+    if micros < 0:
+        raise InvalidToken(token)
+    try:
+        return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        # Past the last date datetime (or the platform) can represent
+        raise InvalidToken(token)
+
+
+def changes_since(user, since=None):
+    """Return querysets of rows changed and ids deleted since a moment
+
+    ``since=None`` asks for a full snapshot. The ``reset`` flag tells the
+    client its token is older than the tombstones we keep, so it must
+    drop its copy and take the snapshot instead.
+    """
+    now = timezone.now()
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    reset = since is not None and since < now - retention
+    if reset:
+        since = None
+
+    posts = Post.objects.filter(user=user).prefetch_related('tags', 'topics')
+    tags = Tag.objects.filter(user=user)
+    topics = Topic.objects.filter(user=user)
+    deleted = {'post': [], 'tag': [], 'topic': []}
+
+    if since is not None:
+        start = since - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        posts = posts.filter(updated_at__gt=start)
+        tags = tags.filter(updated_at__gt=start)
+        topics = topics.filter(updated_at__gt=start)
+        tombstones = Tombstone.objects.filter(
+            user=user, deleted_at__gt=start
+        ).values_list('model', 'object_id')
+        for model, object_id in tombstones:
+            deleted.setdefault(model, []).append(object_id)
+
+    return {
+        'posts': posts.order_by('id'),
+        'tags': tags.order_by('id'),
+        'topics': topics.order_by('id'),
+        'deleted': deleted,
+        'reset': reset,
+        'next': encode_token(now),
+    }
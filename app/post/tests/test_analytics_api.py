@@ -0,0 +1,98 @@
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Post, Tag, Topic
+
+
+ANALYTICS_URL = reverse('post:analytics')
+
+
+class AnalyticsApiTests(TestCase):
+    """Test the post activity analytics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+        self.tech = Tag.objects.create(user=self.user, title='Tech')
+        self.food = Tag.objects.create(user=self.user, title='Food')
+
+    def create_post(self, day, tags=(), user=None):
+        post = Post.objects.create(
+            user=user or self.user, title='t', content='c',
+            created_at=datetime(2024, 3, day, 9, tzinfo=dt_timezone.utc),
+        )
+        post.tags.set(tags)
+        return post
+
+    def get(self, **params):
+        params.setdefault('start', '2024-03-01')
+        params.setdefault('end', '2024-03-03')
+        res = self.client.get(ANALYTICS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['results']
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = APIClient().get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_posts_per_day(self):
+        """Test the daily series covers every day of the range"""
+        self.create_post(1)
+        self.create_post(1)
+        self.create_post(3, [self.tech])
+        other = get_user_model().objects.create_user('o@example.com', 'x')
+        self.create_post(2, user=other)
+
+        self.assertEqual(self.get(), [
+            {'day': date(2024, 3, 1), 'posts': 2},
+            {'day': date(2024, 3, 2), 'posts': 0},
+            {'day': date(2024, 3, 3), 'posts': 1},
+        ])
+        self.assertEqual(
+            [row['posts'] for row in self.get(tag=self.tech.id)], [0, 0, 1]
+        )
+
+    def test_totals_by_tag_and_topic(self):
+        """Test totals per tag and topic over the range"""
+        self.create_post(1, [self.tech, self.food])
+        self.create_post(2, [self.tech])
+        self.create_post(9, [self.food])
+        topic = Topic.objects.create(user=self.user, title='News')
+        self.create_post(2).topics.add(topic)
+
+        self.assertEqual(self.get(by='tag'), [
+            {'id': self.tech.id, 'title': 'Tech', 'posts': 2},
+            {'id': self.food.id, 'title': 'Food', 'posts': 1},
+        ])
+        self.assertEqual(self.get(by='topic'), [
+            {'id': topic.id, 'title': 'News', 'posts': 1},
+        ])
+
+    def test_answered_from_rollups(self):
+        """Test range queries do not touch the posts table"""
+        self.create_post(1, [self.tech])
+
+        with self.assertNumQueries(1):
+            self.client.get(ANALYTICS_URL, {
+                'start': '2024-03-01', 'end': '2024-03-31', 'by': 'tag',
+            })
+
+    def test_invalid_range(self):
+        """Test reversed or too long ranges are rejected"""
+        for start, end in (('2024-03-02', '2024-03-01'),
+                           ('2000-01-01', '2024-01-01')):
+            res = self.client.get(ANALYTICS_URL, {'start': start, 'end': end})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
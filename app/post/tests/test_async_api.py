@@ -0,0 +1,171 @@
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.executor import run_sync
+from core.models import Post, Tag, Topic
+
+from post.serializers import PostSerializer, PostDetailSerializer
+
+
+ASYNC_POSTS_URL = reverse('post:async-post-list')
+ASYNC_TAGS_URL = reverse('post:async-tag-list')
+ASYNC_TOPICS_URL = reverse('post:async-topic-list')
+
+# Sync and async flavours of each list route
+LIST_ROUTES = (
+    (reverse('post:post-list'), ASYNC_POSTS_URL),
+    (reverse('post:tag-list'), ASYNC_TAGS_URL),
+    (reverse('post:topic-list'), ASYNC_TOPICS_URL),
+)
+
+
+def async_detail_url(post_id):
+    """Return async post detail URL"""
+    return reverse('post:async-post-detail', args=[post_id])
+
+
+class PublicAsyncApiTests(TransactionTestCase):
+    """Test unauthenticated access to the async read API"""
+
+    async def test_auth_required(self):
+        """Test that authentication is required"""
+        res = await self.async_client.get(ASYNC_POSTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_invalid_token_rejected(self):
+        """Test that an unknown token is rejected"""
+        res = await self.async_client.get(
+            ASYNC_TAGS_URL, AUTHORIZATION='Token nope'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateAsyncApiTests(TransactionTestCase):
+    """Test the async read API for an authenticated user"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        token = Token.objects.create(user=self.user)
+        self.auth = {'AUTHORIZATION': f'Token {token.key}'}
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'pass5555'
+        )
+        self.other_post = Post.objects.create(
+            user=other, title='Other', content='Hidden'
+        )
+        Tag.objects.create(user=other, title='Hidden')
+
+    async def test_list_posts(self):
+        """Test listing posts matches the sync endpoint output"""
+        post = await self.create_post()
+
+        res = await self.async_client.get(ASYNC_POSTS_URL, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = PostSerializer([post], many=True).data
+        self.assertEqual(res.json(), [dict(item) for item in expected])
+
+    async def test_retrieve_post(self):
+        """Test retrieving a post with nested tags and topics"""
+        post = await self.create_post()
+
+        res = await self.async_client.get(
+            async_detail_url(post.id), **self.auth
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['tags'], [
+            dict(tag) for tag in PostDetailSerializer(post).data['tags']
+        ])
+
+    async def test_retrieve_other_users_post(self):
+        """Test posts of other users are not found"""
+        res = await self.async_client.get(
+            async_detail_url(self.other_post.id), **self.auth
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_list_tags_limited_to_user(self):
+        """Test only the user's tags are listed"""
+        await self.create_post()
+
+        res = await self.async_client.get(ASYNC_TAGS_URL, **self.auth)
+
+        self.assertEqual([t['title'] for t in res.json()], ['Tech'])
+
+    async def test_list_topics(self):
+        """Test listing the user's topics"""
+        await self.create_post()
+
+        res = await self.async_client.get(ASYNC_TOPICS_URL, **self.auth)
+
+        self.assertEqual([t['title'] for t in res.json()], ['Django'])
+
+    def test_lists_match_sync_routes(self):
+        """Test both flavours answer every query the same"""
+        for day in (3, 1, 2):
+            post = Post.objects.create(
+                user=self.user, title=f'Day {day}', content='c',
+                created_at=datetime(2024, 3, day, 12, tzinfo=timezone.utc),
+            )
+            for n in range(day):
+                post.tags.add(Tag.objects.get_or_create(
+                    user=self.user, title=f'Tag {n}')[0])
+                post.topics.add(Topic.objects.get_or_create(
+                    user=self.user, title=f'Topic {n}')[0])
+        queries = (
+            {},
+            {'ordering': 'popular'},
+            {'created_from': '2024-03-02'},
+            {'created_to': '2024-03-02'},
+            {'created_to': 'yesterday'},
+        )
+
+        for sync_url, async_url in LIST_ROUTES:
+            for query in queries:
+                with self.subTest(url=sync_url, query=query):
+                    expected = self.client.get(
+                        sync_url, query, HTTP_AUTHORIZATION=self.auth[
+                            'AUTHORIZATION']
+                    )
+                    # The async client of Django 3.1 drops data= queries
+                    res = async_to_sync(self.async_client.get)(
+                        f'{async_url}?{urlencode(query)}', **self.auth
+                    )
+
+                    self.assertEqual(res.status_code, expected.status_code)
+                    self.assertEqual(res.json(), expected.json())
+
+    async def test_writes_not_allowed(self):
+        """Test the async endpoints are read only"""
+        res = await self.async_client.post(ASYNC_POSTS_URL, {}, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def create_post(self):
+        return await run_sync(self._create_post)
+
+    def _create_post(self):
+        post = Post.objects.create(
+            user=self.user, title='Async views', content='Run on ASGI'
+        )
+        post.tags.add(Tag.objects.create(user=self.user, title='Tech'))
+        post.topics.add(Topic.objects.create(user=self.user, title='Django'))
+        return Post.objects.prefetch_related('tags', 'topics').get(
+            id=post.id
+        )
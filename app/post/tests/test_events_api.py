@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from rest_framework.authtoken.models import Token
+
+from core.events import broker
+from core.executor import run_sync
+from core.models import Post, Tag
+
+from post.sse import EventStreamApp, EVENTS_PATH
+from user import tokens
+
+
+async def not_found(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 404})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class EventStreamTests(TransactionTestCase):
+    """Test the Server-Sent Events stream of changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.token = Token.objects.create(user=self.user).key
+        self.app = EventStreamApp(not_found)
+
+    def open_stream(self, actions, headers=(), query=b'', method='GET'):
+        """Run the stream while actions run, return status and body"""
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        async def scenario():
+            scope = {
+                'type': 'http',
+                'method': method,
+                'path': EVENTS_PATH,
+                'query_string': query,
+                'headers': [
+                    *([(b'authorization', f'Token {self.token}'.encode())]
+                      if self.token else []),
+                    *headers,
+                ],
+            }
+            stream = asyncio.ensure_future(self.app(scope, receive, send))
+            await asyncio.sleep(0.05)
+            await run_sync(actions)
+            await asyncio.sleep(0.05)
+            disconnect.set()
+            await asyncio.wait_for(stream, 2)
+
+        asyncio.run(scenario())
+        status = sent[0]['status']
+        body = b''.join(m.get('body', b'') for m in sent[1:]).decode()
+        return status, body
+
+    def events(self, body):
+        return [
+            json.loads(line[len('data: '):])
+            for line in body.splitlines() if line.startswith('data: {"')
+        ]
+
+    def test_authentication_required(self):
+        """Test the stream rejects unknown tokens"""
+        self.token = 'invalid'
+        status, _ = self.open_stream(lambda: None)
+
+        self.assertEqual(status, 401)
+
+    def test_stream_token_in_query(self):
+        """Test the query string takes a stream token only"""
+        stream_token = tokens.issue_stream(self.user.pk)['token']
+        access, _ = tokens.issue(tokens.ACCESS, self.user.pk, 60)
+        auth_token, self.token = self.token, None
+
+        for key, expected in ((stream_token, 200), (auth_token, 401),
+                              (access, 401)):
+            with self.subTest(key=key):
+                status, _ = self.open_stream(
+                    lambda: None, query=f'token={key}'.encode()
+                )
+
+                self.assertEqual(status, expected)
+
+    def test_writes_not_allowed(self):
+        """Test only GET opens a stream"""
+        status, _ = self.open_stream(lambda: None, method='POST')
+
+        self.assertEqual(status, 405)
+
+    def test_changes_streamed(self):
+        """Test creating, updating and deleting rows pushes events"""
+        def actions():
+            post = Post.objects.create(user=self.user, title='a', content='b')
+            post.title = 'c'
+            post.save()
+            post.tags.add(Tag.objects.create(user=self.user, title='t'))
+            post.delete()
+
+        status, body = self.open_stream(actions)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            [(e['model'], e['action']) for e in self.events(body)],
+            [
+                ('post', 'created'), ('post', 'updated'),
+                ('tag', 'created'), ('post', 'updated'),
+                ('post', 'deleted'),
+            ]
+        )
+
+    def test_other_users_changes_hidden(self):
+        """Test only the authenticated user's changes are streamed"""
+        other = get_user_model().objects.create_user('o@example.com', 'x')
+
+        def actions():
+            Tag.objects.create(user=other, title='Hidden')
+
+        _, body = self.open_stream(actions)
+
+        self.assertEqual(self.events(body), [])
+
+    def test_resume_from_last_event_id(self):
+        """Test a reconnecting client receives the events it missed"""
+        Tag.objects.create(user=self.user, title='Seen')
+        last_id = broker.next_id()
+        missed = Tag.objects.create(user=self.user, title='Missed')
+
+        _, body = self.open_stream(
+            lambda: None,
+            headers=[(b'last-event-id', str(last_id).encode())],
+        )
+
+        self.assertEqual(
+            [e['id'] for e in self.events(body)], [missed.id]
+        )
+
+    def test_out_of_order_ids_streamed(self):
+        """Test an event with an older id delivered late still streams"""
+        early, late = broker.next_id(), broker.next_id()
+
+        def actions():
+            for event_id, pk in ((late, 2), (early, 1), (late, 2)):
+                broker.dispatch({
+                    'id': event_id, 'user_id': self.user.id,
+                    'model': 'tag', 'action': 'created', 'pk': pk,
+                })
+
+        _, body = self.open_stream(actions)
+
+        self.assertEqual([e['id'] for e in self.events(body)], [2, 1])
@@ -0,0 +1,212 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Post
+
+
+POSTS_URL = reverse('post:post-list')
+
+
+def image_upload_url(post_id):
+    return reverse('post:post-upload-image', args=[post_id])
+
+
+def sample_image():
+    """Return an open JPEG file ready to upload"""
+    ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+    ntf.seek(0)
+    return ntf
+
+
+class IdempotencyApiTests(TestCase):
+    """Test retried writes with an Idempotency-Key run once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+        self.payload = {'title': 'Post', 'content': 'Content'}
+
+    def create(self, key='key-1', payload=None):
+        return self.client.post(
+            POSTS_URL, payload or self.payload, HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self):
+        """Test a retried create returns the first post without a copy"""
+        first = self.create()
+        retry = self.create()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        """Test another user's key of the same name does not replay"""
+        self.create()
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'pass5555'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.create()
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Test a key sent with a different body is refused"""
+        self.create()
+
+        res = self.create(payload={'title': 'Other', 'content': 'Content'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_without_key_not_deduplicated(self):
+        """Test requests without the header run every time"""
+        self.client.post(POSTS_URL, self.payload)
+        self.client.post(POSTS_URL, self.payload)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_failed_request_frees_key(self):
+        """Test a request that raised can be retried with its key"""
+        with patch('post.views.PostViewSet.perform_create',
+                   side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create()
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        """Test a duplicate polls the running request for its response"""
+        self.create()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+
+        def finish(delay):
+            IdempotencyKey.objects.update(
+                status_code=201, response={'id': 42}
+            )
+
+        with patch('core.idempotency.time.sleep', side_effect=finish) as sleep:
+            res = self.create()
+
+        self.assertTrue(sleep.called)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'id': 42})
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_key_freed_while_claiming(self):
+        """Test a duplicate claims a key the first request freed meanwhile"""
+        self.create()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        get = IdempotencyKey.objects.get
+        reads = []
+
+        def freed_before_read(**lookup):
+            if not reads:
+                # The first request failed after the duplicate's insert
+                reads.append(lookup)
+                IdempotencyKey.objects.all().delete()
+            return get(**lookup)
+
+        with patch.object(IdempotencyKey.objects, 'get',
+                          side_effect=freed_before_read):
+            res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Post.objects.count(), 2)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_gives_up_waiting(self):
+        """Test a duplicate of a request still running gets a conflict"""
+        self.create()
+        IdempotencyKey.objects.update(status_code=None)
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    @override_settings(IDEMPOTENCY_LOCK_SECONDS=60)
+    def test_abandoned_claim_taken_over(self):
+        """Test a claim left by a request that died is run again"""
+        self.create()
+        IdempotencyKey.objects.update(
+            status_code=None,
+            locked_at=timezone.now() - timedelta(seconds=61),
+        )
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_expired_key_runs_again(self):
+        """Test a key past its TTL no longer replays"""
+        self.create()
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        self.create()
+
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_upload_image_retry_replayed(self):
+        """Test a retried upload with a new multipart boundary replays"""
+        post = Post.objects.create(user=self.user, **self.payload)
+        url = image_upload_url(post.id)
+        responses = []
+        for _ in range(2):
+            with sample_image() as image:
+                responses.append(self.client.post(
+                    url, {'image': image}, format='multipart',
+                    HTTP_IDEMPOTENCY_KEY='upload-1',
+                ))
+        post.refresh_from_db()
+        post.image.delete()
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(responses[1].data, responses[0].data)
+
+    def test_purge_expired_keys(self):
+        """Test the purge command deletes only expired keys"""
+        self.create('old')
+        self.create('new')
+        IdempotencyKey.objects.filter(key='old').update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list('key', flat=True)),
+            ['new'],
+        )
@@ -1,5 +1,7 @@
 import tempfile
 import os
+from datetime import datetime, timezone
+from unittest.mock import patch
 
 from PIL import Image
 
@@ -12,6 +14,7 @@ from rest_framework.test import APIClient
 
 from core.models import Post, Tag, Topic
 
+from post import serializers
 from post.serializers import PostSerializer, PostDetailSerializer
 
 
@@ -23,6 +26,9 @@ def image_upload_url(post_id):
     return reverse('post:post-upload-image', args=[post_id])
 
 
+BATCH_URL = reverse('post:post-batch')
+
+
 def detail_url(post_id):
     """Return post detail URL"""
     return reverse('post:post-detail', args=[post_id])
@@ -102,6 +108,22 @@ class PrivatePostApiTest(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data, serializer.data)
 
+    def test_filter_posts_by_creation_day(self):
+        """Test filtering posts by an inclusive range of creation days"""
+        days = [datetime(2024, 3, day, 23, tzinfo=timezone.utc)
+                for day in (1, 2, 3)]
+        posts = [sample_post(user=self.user, created_at=day) for day in days]
+
+        res = self.client.get(POSTS_URL, {
+            'created_from': '2024-03-02', 'created_to': '2024-03-03',
+        })
+
+        self.assertEqual(
+            [post['id'] for post in res.data], [p.id for p in posts[1:]]
+        )
+        res = self.client.get(POSTS_URL, {'created_to': 'yesterday'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_viewing_post_detail(self):
         """Test viewing post detail"""
         post = sample_post(user=self.user)
@@ -147,6 +169,21 @@ class PrivatePostApiTest(TestCase):
         self.assertIn(tag1, tags)
         self.assertIn(tag2, tags)
 
+    def test_create_post_with_unknown_tags(self):
+        """Test unknown or malformed tag ids are rejected"""
+        tag = sample_tag(user=self.user)
+        for tags, error in (([tag.id, 999999], 'does_not_exist'),
+                            ([tag.id, 'x'], 'incorrect_type')):
+            res = self.client.post(
+                POSTS_URL,
+                {'title': 'T', 'content': 'C', 'tags': tags},
+                format='json',
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res.data['tags'][0].code, error)
+        self.assertFalse(Post.objects.exists())
+
     def tesst_create_post_with_topic(self):
         """Test creating post with topics"""
         topics1 = sample_topic(user=self.user, title='Twitter')
@@ -166,6 +203,92 @@ class PrivatePostApiTest(TestCase):
         self.assertIn(topics1, topics)
         self.assertIn(topics2, topics)
 
+    def test_create_post_with_titles(self):
+        """Test tags and topics are resolved or created from titles"""
+        existing = sample_tag(user=self.user, title='Tech')
+        payload = {
+            'title': 'One round trip',
+            'content': 'Tags by title',
+            'tag_titles': ['Tech', 'Science', ' Science '],
+            'topic_titles': ['News'],
+        }
+
+        res = self.client.post(POSTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(tag.title for tag in post.tags.all()), ['Science', 'Tech']
+        )
+        self.assertIn(existing, post.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(post.topics.get().title, 'News')
+
+    def test_titles_created_concurrently(self):
+        """Test a title another request inserts first is reused quietly"""
+        insert_titles = serializers.insert_titles
+
+        def racing_insert(model, user, titles):
+            model.objects.create(user=user, title='Raced')
+            return insert_titles(model, user, titles)
+
+        payload = {'title': 't', 'content': 'c',
+                   'tag_titles': ['Raced', 'Mine']}
+        with patch('post.serializers.insert_titles', racing_insert), \
+                patch('post.serializers.emit') as emit:
+            res = self.client.post(POSTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(t.title for t in Post.objects.get().tags.all()),
+            ['Mine', 'Raced'],
+        )
+        created = [
+            call.args[0].title for call in emit.call_args_list
+            if call.args[1] == 'created'
+        ]
+        self.assertEqual(created, ['Mine'])
+
+    def test_create_rolled_back_when_titles_fail(self):
+        """Test a post is not kept without the tags it was created with"""
+        payload = {'title': 't', 'content': 'c', 'tag_titles': ['Tech']}
+
+        with patch('post.serializers.resolve_titles',
+                   side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(POSTS_URL, payload, format='json')
+
+        self.assertFalse(Post.objects.exists())
+
+    def test_titles_added_to_tag_ids(self):
+        """Test titles are attached on top of the tags given by id"""
+        tag = sample_tag(user=self.user, title='Tech')
+        post = sample_post(user=self.user)
+        post.tags.add(tag)
+
+        self.client.patch(
+            detail_url(post.id), {'tag_titles': ['History']}, format='json'
+        )
+
+        self.assertEqual(
+            sorted(t.title for t in post.tags.all()), ['History', 'Tech']
+        )
+
+    def test_titles_of_other_users_not_reused(self):
+        """Test a title owned by another user creates the user's own tag"""
+        user2 = get_user_model().objects.create_user(
+            'other@example.com',
+            'pass4555'
+        )
+        theirs = sample_tag(user=user2, title='Tech')
+        payload = {'title': 't', 'content': 'c', 'tag_titles': ['Tech']}
+
+        res = self.client.post(POSTS_URL, payload, format='json')
+
+        tag = Post.objects.get(id=res.data['id']).tags.get()
+        self.assertNotEqual(tag.id, theirs.id)
+        self.assertEqual(tag.user, self.user)
+
     def test_partial_update_post(self):
         """Test updating a post with patch"""
         post = sample_post(user=self.user)
@@ -238,3 +361,77 @@ class PostImageUploadTest(TestCase):
             url, {'image': 'invalidimg'}, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostBatchApiTest(TestCase):
+    """Test fetching many posts by id at once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_batch_in_requested_order(self):
+        """Test posts come back in the order of the requested ids"""
+        posts = [sample_post(user=self.user) for _ in range(3)]
+        ids = [posts[2].id, posts[0].id, posts[1].id]
+
+        res = self.client.get(BATCH_URL, {'ids': ','.join(map(str, ids))})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in res.data['results']], ids)
+        self.assertEqual(res.data['missing'], [])
+
+    def test_batch_with_post_body(self):
+        """Test the ids can be sent in a POST body"""
+        post = sample_post(user=self.user)
+        post.tags.add(sample_tag(user=self.user))
+
+        res = self.client.post(BATCH_URL, {'ids': [post.id]}, format='json')
+
+        serializer = PostDetailSerializer(post)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [serializer.data])
+
+    def test_batch_reports_missing(self):
+        """Test unknown ids and other users' posts are reported missing"""
+        user2 = get_user_model().objects.create_user(
+            'other@example.com',
+            'pass4555'
+        )
+        other = sample_post(user=user2)
+        mine = sample_post(user=self.user)
+
+        res = self.client.get(
+            BATCH_URL, {'ids': f'{mine.id},{other.id},999999'}
+        )
+
+        self.assertEqual([p['id'] for p in res.data['results']], [mine.id])
+        self.assertEqual(res.data['missing'], [other.id, 999999])
+
+    def test_batch_constant_queries(self):
+        """Test relations are loaded with a fixed number of queries"""
+        ids = []
+        for i in range(20):
+            post = sample_post(user=self.user)
+            post.tags.add(sample_tag(user=self.user, title=f'Tag {i}'))
+            post.topics.add(sample_topic(user=self.user, title=f'Topic {i}'))
+            ids.append(post.id)
+
+        with self.assertNumQueries(3):
+            res = self.client.post(BATCH_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(len(res.data['results']), 20)
+
+    def test_batch_invalid_ids(self):
+        """Test malformed, empty and oversized batches are rejected"""
+        too_many = list(range(1, 502))
+        for data in ({'ids': 'a,b'}, {'ids': ''}):
+            res = self.client.get(BATCH_URL, data)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(BATCH_URL, {'ids': too_many}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,198 @@
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Post, Tag
+from post.views import PostViewSet
+
+
+def detail_url(post_id):
+    return reverse('post:post-detail', args=[post_id])
+
+
+def sample_image():
+    """Return an open JPEG file ready to upload"""
+    ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+    ntf.seek(0)
+    return ntf
+
+
+def write_after_read(post):
+    """Patch the post view to let another write in after reading the post"""
+    get_object = PostViewSet.get_object
+
+    def read_then_write(view):
+        instance = get_object(view)
+        Post.objects.filter(pk=post.pk).update(version=F('version') + 1)
+        return instance
+    return patch.object(PostViewSet, 'get_object', read_then_write)
+
+
+class PostVersionTests(TestCase):
+    """Test optimistic concurrency of post updates"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(
+            user=self.user, title='Title', content='Content'
+        )
+        self.url = detail_url(self.post.id)
+
+    def test_retrieve_returns_etag(self):
+        """Test the detail response names the version in its ETag"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertEqual(res.data['version'], 1)
+
+    def test_update_with_current_etag(self):
+        """Test a write over the version read succeeds and moves it on"""
+        res = self.client.patch(
+            self.url, {'title': 'New'}, HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('New', 2))
+
+    def test_update_with_stale_etag(self):
+        """Test a write over an older version is refused"""
+        self.client.patch(self.url, {'title': 'First'}, HTTP_IF_MATCH='"1"')
+
+        res = self.client.patch(
+            self.url, {'title': 'Second'}, HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'First')
+
+    def test_if_match_any(self):
+        """Test If-Match: * and lists of ETags"""
+        any_version = self.client.patch(
+            self.url, {'title': 'A'}, HTTP_IF_MATCH='*'
+        )
+        listed = self.client.put(
+            self.url, {'title': 'B', 'content': 'C'},
+            HTTP_IF_MATCH='"1", "2"',
+        )
+
+        self.assertEqual(any_version.status_code, status.HTTP_200_OK)
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
+
+    def test_write_between_read_and_save(self):
+        """Test the conditional UPDATE catches a write racing the request"""
+        with write_after_read(self.post):
+            res = self.client.patch(
+                self.url, {'title': 'Lost'}, HTTP_IF_MATCH='"1"'
+            )
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('Title', 2))
+
+    def test_race_without_if_match_saves(self):
+        """Test a racing write without If-Match wins over a newer version"""
+        with write_after_read(self.post):
+            res = self.client.patch(self.url, {'title': 'Last'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"3"')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('Last', 3))
+
+    def test_update_without_if_match(self):
+        """Test writes without If-Match still work and bump the version"""
+        res = self.client.patch(self.url, {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 2)
+
+    def test_save_moves_version(self):
+        """Test a plain save of the post moves the version on"""
+        self.post.title = 'New'
+        self.post.save(update_fields=['title'])
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('New', 2))
+
+    def test_stale_instances_save_own_versions(self):
+        """Test saves of instances read at one version get one each"""
+        first = Post.objects.get(pk=self.post.pk)
+        second = Post.objects.get(pk=self.post.pk)
+
+        first.title = 'First'
+        first.save()
+        second.title = 'Second'
+        second.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual((self.post.title, self.post.version), ('Second', 3))
+
+    def test_upload_image_checks_if_match(self):
+        """Test an image upload honours If-Match and returns the ETag"""
+        url = reverse('post:post-upload-image', args=[self.post.id])
+        self.addCleanup(lambda: self.post.image.delete())
+
+        with write_after_read(self.post), sample_image() as image:
+            stale = self.client.post(
+                url, {'image': image}, format='multipart',
+                HTTP_IF_MATCH='"1"',
+            )
+        with sample_image() as image:
+            res = self.client.post(
+                url, {'image': image}, format='multipart',
+                HTTP_IF_MATCH='"2"',
+            )
+
+        self.assertEqual(stale.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"3"')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 3)
+
+    def test_tag_update_etag_current(self):
+        """Test the ETag of an update changing tags is the stored one"""
+        tag = Tag.objects.create(user=self.user, title='Tech')
+
+        res = self.client.patch(
+            self.url, {'tags': [tag.id]}, HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(res['ETag'], f'"{self.post.version}"')
+        self.assertEqual(res.data['version'], self.post.version)
+
+    def test_tag_changes_move_version(self):
+        """Test adding, removing and deleting a tag change the version"""
+        tag = Tag.objects.create(user=self.user, title='Tech')
+        self.post.tags.add(tag)
+        self.assertEqual(self.post.version, 2)
+        self.post.tags.remove(tag)
+        self.post.tags.add(tag)
+
+        tag.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 5)
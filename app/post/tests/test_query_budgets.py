@@ -0,0 +1,340 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from itertools import count
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Post, Tag, Topic, TrendingScore, TrendingState
+from core.tests.utils import QueryBudgetMixin, orm_on_test_thread, \
+    route_names
+
+
+# Most queries one request to each route may run, by route and method.
+# The count must also stay the same at 1 and at 50 rows of the data the
+# route reads or writes. Token authentication takes one query, and
+# throttled writes one per bucket.
+BUDGETS = {
+    ('post:api-root', 'GET'): 0,
+    ('post:tag-list', 'GET'): 2,
+    ('post:tag-list', 'POST'): 5,
+    ('post:tag-autocomplete', 'GET'): 2,
+    ('post:topic-list', 'GET'): 2,
+    ('post:topic-list', 'POST'): 5,
+    ('post:topic-autocomplete', 'GET'): 2,
+    ('post:post-list', 'GET'): 4,
+    ('post:post-list', 'POST'): 25,
+    ('post:post-detail', 'GET'): 4,
+    ('post:post-detail', 'PATCH'): 14,
+    ('post:post-detail', 'DELETE'): 20,
+    ('post:post-batch', 'GET'): 5,
+    ('post:post-batch', 'POST'): 5,
+    ('post:post-related', 'GET'): 7,
+    ('post:post-upload-image', 'POST'): 9,
+    ('post:sync', 'GET'): 6,
+    ('post:trending', 'GET'): 3,
+    ('post:analytics', 'GET'): 2,
+    ('post:async-post-list', 'GET'): 4,
+    ('post:async-post-detail', 'GET'): 4,
+    ('post:async-tag-list', 'GET'): 2,
+    ('post:async-topic-list', 'GET'): 2,
+}
+
+
+def sample_image():
+    """Return an open JPEG file ready to upload"""
+    ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+    ntf.seek(0)
+    return ntf
+
+
+class PostQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the number of queries of every post route"""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        settings = override_settings(
+            MEDIA_ROOT=tmp, RELATED_INDEX_PATH=f'{tmp}/index.npz'
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.names = (f'Title {n}' for n in count())
+
+    def check(self, name, method, func, grow):
+        self.assertConstantQueries(
+            func, grow, budget=BUDGETS[(name, method)]
+        )
+
+    def request(self, method, url, data=None, expected=status.HTTP_200_OK,
+                **kwargs):
+        res = getattr(self.client, method.lower())(url, data, **kwargs)
+        self.assertEqual(res.status_code, expected, res.content)
+        return res
+
+    def add_attrs(self, model, number):
+        return [
+            model.objects.create(user=self.user, title=next(self.names))
+            for _ in range(number)
+        ]
+
+    def add_posts(self, number):
+        """Create posts with a tag and a topic of their own each"""
+        posts = []
+        for _ in range(number):
+            post = Post.objects.create(
+                user=self.user, title=next(self.names), content='-'
+            )
+            post.tags.add(*self.add_attrs(Tag, 1))
+            post.topics.add(*self.add_attrs(Topic, 1))
+            posts.append(post)
+        return posts
+
+    def add_links(self, posts, number):
+        """Attach number more tags and topics to each of the posts"""
+        tags = self.add_attrs(Tag, number)
+        topics = self.add_attrs(Topic, number)
+        for post in posts:
+            post.tags.add(*tags)
+            post.topics.add(*topics)
+
+    def test_every_route_has_a_budget(self):
+        """Test each route of post.urls declares its query budget"""
+        self.assertEqual(
+            route_names('post.urls', 'post'),
+            {name for name, _ in BUDGETS},
+        )
+
+    def test_api_root(self):
+        self.check(
+            'post:api-root', 'GET',
+            lambda: self.request('GET', reverse('post:api-root')),
+            self.add_posts,
+        )
+
+    def test_tags_and_topics(self):
+        """Test listing, creating and completing tags and topics"""
+        for model, kind in ((Tag, 'tag'), (Topic, 'topic')):
+            with self.subTest(kind):
+                grow = lambda number: self.add_attrs(model, number)  # noqa
+                url = reverse(f'post:{kind}-list')
+                self.check(
+                    f'post:{kind}-list', 'GET',
+                    lambda: self.request('GET', url), grow,
+                )
+                self.check(
+                    f'post:{kind}-list', 'POST',
+                    lambda: self.request(
+                        'POST', url, {'title': next(self.names)},
+                        expected=status.HTTP_201_CREATED,
+                    ),
+                    grow,
+                )
+                self.check(
+                    f'post:{kind}-autocomplete', 'GET',
+                    lambda: self.request(
+                        'GET', reverse(f'post:{kind}-autocomplete'),
+                        {'prefix': 'Title', 'limit': 50},
+                    ),
+                    grow,
+                )
+
+    def test_list_posts(self):
+        self.check(
+            'post:post-list', 'GET',
+            lambda: self.request('GET', reverse('post:post-list')),
+            self.add_posts,
+        )
+
+    def test_create_post(self):
+        """Test creating a post with more and more tags and topics"""
+        tags, titles = [], []
+
+        def grow(number):
+            tags.extend(tag.id for tag in self.add_attrs(Tag, number))
+            titles.extend(
+                topic.title for topic in self.add_attrs(Topic, number)
+            )
+
+        self.check(
+            'post:post-list', 'POST',
+            lambda: self.request(
+                'POST', reverse('post:post-list'),
+                {'title': 'T', 'content': 'C', 'tags': tags,
+                 'topic_titles': titles},
+                expected=status.HTTP_201_CREATED, format='json',
+            ),
+            grow,
+        )
+
+    def test_retrieve_and_update_post(self):
+        """Test reading and editing a post with more and more links"""
+        post = self.add_posts(1)[0]
+        url = reverse('post:post-detail', args=[post.id])
+        grow = lambda number: self.add_links([post], number)  # noqa
+
+        self.check(
+            'post:post-detail', 'GET', lambda: self.request('GET', url), grow
+        )
+        self.check(
+            'post:post-detail', 'PATCH',
+            lambda: self.request(
+                'PATCH', url,
+                {'title': next(self.names),
+                 'tags': list(post.tags.values_list('id', flat=True))},
+                format='json',
+            ),
+            grow,
+        )
+
+    def test_delete_post(self):
+        """Test deleting posts with more and more links"""
+        posts = self.add_posts(4)
+
+        def delete():
+            self.request(
+                'DELETE', reverse('post:post-detail', args=[posts.pop().id]),
+                expected=status.HTTP_204_NO_CONTENT,
+            )
+
+        self.check(
+            'post:post-detail', 'DELETE', delete,
+            lambda number: self.add_links(posts, number),
+        )
+
+    def test_batch(self):
+        url = reverse('post:post-batch')
+
+        def ids():
+            return list(Post.objects.values_list('id', flat=True))
+
+        self.check(
+            'post:post-batch', 'GET',
+            lambda: self.request(
+                'GET', url, {'ids': ','.join(map(str, ids()))}
+            ),
+            self.add_posts,
+        )
+        self.check(
+            'post:post-batch', 'POST',
+            lambda: self.request('POST', url, {'ids': ids()}, format='json'),
+            self.add_posts,
+        )
+
+    def test_related(self):
+        """Test related posts with more and more posts sharing a tag"""
+        tag = self.add_attrs(Tag, 1)[0]
+        post = self.add_posts(1)[0]
+        post.tags.add(tag)
+
+        def grow(number):
+            for other in self.add_posts(number):
+                other.tags.add(tag)
+            call_command('build_related_index', stdout=StringIO())
+
+        self.check(
+            'post:post-related', 'GET',
+            lambda: self.request(
+                'GET', reverse('post:post-related', args=[post.id]),
+                {'limit': 50},
+            ),
+            grow,
+        )
+
+    def test_upload_image(self):
+        post = self.add_posts(1)[0]
+
+        def upload():
+            with sample_image() as image:
+                self.request(
+                    'POST',
+                    reverse('post:post-upload-image', args=[post.id]),
+                    {'image': image}, format='multipart',
+                )
+
+        self.check(
+            'post:post-upload-image', 'POST', upload,
+            lambda number: self.add_links([post], number),
+        )
+
+    def test_sync(self):
+        self.check(
+            'post:sync', 'GET',
+            lambda: self.request('GET', reverse('post:sync')),
+            self.add_posts,
+        )
+
+    def test_trending(self):
+        """Test trending titles with more and more scored titles"""
+        TrendingState.objects.create(pk=1, landmark=timezone.now())
+
+        def grow(number):
+            TrendingScore.objects.bulk_create([
+                TrendingScore(kind=TrendingScore.TAG, title=next(self.names),
+                              score=1)
+                for _ in range(number)
+            ])
+
+        self.check(
+            'post:trending', 'GET',
+            lambda: self.request(
+                'GET', reverse('post:trending'), {'limit': 50}
+            ),
+            grow,
+        )
+
+    def test_analytics(self):
+        """Test every kind of analytics over more and more posts"""
+        today = timezone.now().date()
+        start = today - timedelta(days=30)
+        for by in ('day', 'tag', 'topic'):
+            with self.subTest(by):
+                self.check(
+                    'post:analytics', 'GET',
+                    lambda: self.request(
+                        'GET', reverse('post:analytics'),
+                        {'start': start, 'end': today, 'by': by},
+                    ),
+                    self.add_posts,
+                )
+
+    def test_async_reads(self):
+        """Test the async read routes"""
+        post = self.add_posts(1)[0]
+        routes = (
+            ('post:async-post-list', reverse('post:async-post-list'),
+             self.add_posts),
+            ('post:async-post-detail',
+             reverse('post:async-post-detail', args=[post.id]),
+             lambda number: self.add_links([post], number)),
+            ('post:async-tag-list', reverse('post:async-tag-list'),
+             lambda number: self.add_attrs(Tag, number)),
+            ('post:async-topic-list', reverse('post:async-topic-list'),
+             lambda number: self.add_attrs(Topic, number)),
+        )
+        with orm_on_test_thread('post.async_views'):
+            for name, url, grow in routes:
+                with self.subTest(name):
+                    self.check(
+                        name, 'GET', lambda: self.request('GET', url), grow
+                    )
@@ -0,0 +1,191 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import JobSchedule, Post, Tag, Topic
+
+from post.related import INDEX_SCHEDULE, RelatedIndex, get_index
+
+
+def related_url(post_id):
+    """Return the related posts URL of a post"""
+    return reverse('post:post-related', args=[post_id])
+
+
+class RelatedIndexTests(TestCase):
+    """Test the similarity index on its own"""
+
+    def setUp(self):
+        self.index = RelatedIndex.from_features({
+            1: [2, 4, 6],
+            2: [2, 4],
+            3: [6, 8],
+            4: [10],
+            5: [],
+        }, 0)
+
+    def test_jaccard_ranking(self):
+        """Test posts are ranked by Jaccard similarity"""
+        matches = self.index.similar([2, 4, 6], exclude=1)
+
+        self.assertEqual(matches, [(2, 2 / 3), (3, 1 / 4)])
+
+    def test_cosine_ranking(self):
+        """Test posts are ranked by cosine similarity"""
+        matches = self.index.similar([2, 4, 6], exclude=1, metric='cosine')
+
+        self.assertEqual([pk for pk, _ in matches], [2, 3])
+        self.assertAlmostEqual(matches[0][1], 2 / 6 ** 0.5)
+
+    def test_limit_keeps_best(self):
+        """Test only the best matches are kept, ties by post id"""
+        index = RelatedIndex.from_features(
+            {pk: [2] for pk in range(1, 20)}, 0
+        )
+
+        matches = index.similar([2], exclude=1, limit=3)
+
+        self.assertEqual([pk for pk, _ in matches], [2, 3, 4])
+
+    def test_unknown_features(self):
+        """Test features absent from the index match nothing"""
+        self.assertEqual(self.index.similar([12, 14]), [])
+        self.assertEqual(self.index.similar([]), [])
+
+    def test_save_and_load(self):
+        """Test the index survives a round trip through its file"""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = f'{tmp}/index.npz'
+
+        self.index.save(path)
+        loaded = RelatedIndex.load(path)
+
+        self.assertEqual(
+            loaded.similar([2, 4, 6], exclude=1),
+            self.index.similar([2, 4, 6], exclude=1),
+        )
+
+
+class RelatedPostsApiTests(TestCase):
+    """Test the related posts endpoint"""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        settings = override_settings(RELATED_INDEX_PATH=f'{tmp}/index.npz')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+        self.python = Tag.objects.create(user=self.user, title='Python')
+        self.django = Tag.objects.create(user=self.user, title='Django')
+        self.web = Topic.objects.create(user=self.user, title='Web')
+
+    def create_post(self, title, tags=(), topics=(), user=None):
+        post = Post.objects.create(
+            user=user or self.user, title=title, content='-'
+        )
+        post.tags.set(tags)
+        post.topics.set(topics)
+        return post
+
+    def build(self, *args):
+        call_command('build_related_index', *args, stdout=StringIO())
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        post = self.create_post('a')
+
+        res = APIClient().get(related_url(post.id))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_related_from_index(self):
+        """Test related posts are ranked by shared tags and topics"""
+        post = self.create_post('a', [self.python, self.django], [self.web])
+        close = self.create_post('b', [self.python, self.django])
+        far = self.create_post('c', [], [self.web])
+        self.create_post('d')
+        self.build()
+
+        res = self.client.get(related_url(post.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in res.data], [close.id, far.id])
+        self.assertEqual(res.data[0]['score'], round(2 / 3, 4))
+        self.assertEqual(res.data[0]['tags'], [self.python.id, self.django.id])
+
+    def test_related_without_index(self):
+        """Test a missing index is built soon instead of in the request"""
+        post = self.create_post('a', [self.python])
+        later = timezone.now() + timedelta(hours=1)
+        JobSchedule.objects.create(name=INDEX_SCHEDULE, next_run_at=later)
+
+        res = self.client.get(related_url(post.id))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertIn('Retry-After', res)
+        schedule = JobSchedule.objects.get(name=INDEX_SCHEDULE)
+        self.assertLessEqual(schedule.next_run_at, timezone.now())
+
+    def test_incremental_refresh(self):
+        """Test a refresh picks up new, retagged and deleted posts"""
+        post = self.create_post('a', [self.python])
+        deleted = self.create_post('b', [self.python])
+        retagged = self.create_post('c', [self.django])
+        self.build()
+        old_index = get_index()
+
+        new = self.create_post('d', [self.python])
+        retagged.tags.add(self.python)
+        deleted.delete()
+        self.build()
+
+        self.assertIsNot(get_index(), old_index)
+        res = self.client.get(related_url(post.id))
+        self.assertEqual([p['id'] for p in res.data], [new.id, retagged.id])
+
+    def test_limit_and_metric(self):
+        """Test the limit and metric parameters are validated and applied"""
+        post = self.create_post('a', [self.python])
+        for title in 'bcd':
+            self.create_post(title, [self.python])
+        self.build()
+
+        res = self.client.get(related_url(post.id), {'limit': 2})
+        self.assertEqual(len(res.data), 2)
+
+        res = self.client.get(related_url(post.id), {'metric': 'cosine'})
+        self.assertEqual(res.data[0]['score'], 1.0)
+
+        res = self.client.get(related_url(post.id), {'limit': 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(related_url(post.id), {'metric': 'dice'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_post_not_found(self):
+        """Test the related posts of another user's post are not exposed"""
+        other = get_user_model().objects.create_user('o@example.com', 'x')
+        post = self.create_post('a', user=other)
+
+        res = self.client.get(related_url(post.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Post, Tag, Topic, Tombstone
+
+from post import sync
+
+
+SYNC_URL = reverse('post:sync')
+
+
+def age(queryset, days=1):
+    """Move the modification time of rows into the past"""
+    queryset.update(updated_at=timezone.now() - timedelta(days=days))
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncApiTests(TestCase):
+    """Test the delta sync endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        params = {'since': since} if since else {}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_snapshot_without_token(self):
+        """Test the first sync returns every row of the user"""
+        Post.objects.create(user=self.user, title='a', content='b')
+        Tag.objects.create(user=self.user, title='Tech')
+        other = get_user_model().objects.create_user('o@example.com', 'x')
+        Topic.objects.create(user=other, title='Hidden')
+
+        data = self.sync()
+
+        self.assertEqual(len(data['posts']), 1)
+        self.assertEqual(len(data['tags']), 1)
+        self.assertEqual(data['topics'], [])
+        self.assertTrue(data['next'])
+
+    def test_only_changes_since_token(self):
+        """Test a sync with a token returns only changed rows"""
+        old = Post.objects.create(user=self.user, title='old', content='-')
+        age(Post.objects.filter(id=old.id))
+        token = self.sync()['next']
+        new = Post.objects.create(user=self.user, title='new', content='-')
+
+        data = self.sync(token)
+
+        self.assertEqual([p['id'] for p in data['posts']], [new.id])
+
+    def test_deletes_reported(self):
+        """Test deleted rows come back as tombstones"""
+        post = Post.objects.create(user=self.user, title='a', content='-')
+        tag = Tag.objects.create(user=self.user, title='Tech')
+        token = self.sync()['next']
+        post_id, tag_id = post.id, tag.id
+        post.delete()
+        tag.delete()
+
+        data = self.sync(token)
+
+        self.assertEqual(data['deleted']['post'], [post_id])
+        self.assertEqual(data['deleted']['tag'], [tag_id])
+
+    def test_relation_change_marks_post(self):
+        """Test tagging an unchanged post reports the post as changed"""
+        post = Post.objects.create(user=self.user, title='a', content='-')
+        tag = Tag.objects.create(user=self.user, title='Tech')
+        age(Post.objects.all())
+        age(Tag.objects.all())
+        token = self.sync()['next']
+
+        post.tags.add(tag)
+        data = self.sync(token)
+
+        self.assertEqual(data['posts'][0]['tags'], [tag.id])
+
+    def test_deleting_tag_marks_posts(self):
+        """Test posts losing a deleted tag are reported as changed"""
+        post = Post.objects.create(user=self.user, title='a', content='-')
+        tag = Tag.objects.create(user=self.user, title='Tech')
+        post.tags.add(tag)
+        age(Post.objects.all())
+        token = self.sync()['next']
+
+        tag.delete()
+        data = self.sync(token)
+
+        self.assertEqual([p['id'] for p in data['posts']], [post.id])
+        self.assertEqual(data['posts'][0]['tags'], [])
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_token(self):
+        """Test a token past the representable dates is rejected"""
+        for since in ('253402300800000000', '9' * 30):
+            with self.subTest(since):
+                res = self.client.get(SYNC_URL, {'since': since})
+
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=1)
+    def test_expired_token_resets(self):
+        """Test a token older than the tombstones gets a snapshot"""
+        Post.objects.create(user=self.user, title='a', content='-')
+        token = sync.encode_token(timezone.now() - timedelta(days=2))
+
+        data = self.sync(token)
+
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['posts']), 1)
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=1)
+    def test_purge_tombstones(self):
+        """Test tombstones past the retention window are purged"""
+        Tombstone.objects.create(user=self.user, model='post', object_id=1)
+        Tombstone.objects.create(user=self.user, model='post', object_id=2)
+        Tombstone.objects.filter(object_id=1).update(
+            deleted_at=timezone.now() - timedelta(days=2)
+        )
+
+        call_command('purge_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)), [2]
+        )
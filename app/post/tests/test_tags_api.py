@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -5,12 +7,13 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Post
 
 from post.serializers import TagSerializer
 
 
 TAGS_URL = reverse('post:tag-list')
+TAGS_AUTOCOMPLETE_URL = reverse('post:tag-autocomplete')
 
 
 class PublicTagsApiTests(TestCase):
@@ -75,8 +78,103 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertTrue(exists)
 
+    def test_create_duplicate_tag(self):
+        """Test a user cannot have two tags with the same title"""
+        Tag.objects.create(user=self.user, title='Food')
+
+        res = self.client.post(TAGS_URL, {'title': 'Food'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_duplicate_tag_race(self):
+        """Test a title taken after validation is a 400, not a 500"""
+        def taken_meanwhile(serializer, value):
+            Tag.objects.create(user=self.user, title=value)
+            return value
+
+        with patch.object(TagSerializer, 'validate_title', taken_meanwhile):
+            res = self.client.post(TAGS_URL, {'title': 'Food'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', res.data)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
     def test_create_tag_invalid(self):
         """Test creating a new tag with invalid payload"""
         payload = {'title': ''}
         res = self.client.post(TAGS_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_by_popularity(self):
+        """Test tags can be ordered by how many posts use them"""
+        rare = Tag.objects.create(user=self.user, title='Rare')
+        common = Tag.objects.create(user=self.user, title='Common')
+        for _ in range(2):
+            post = Post.objects.create(user=self.user, title='t', content='c')
+            post.tags.add(common)
+        post.tags.add(rare)
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(
+            [(t['title'], t['post_count']) for t in res.data],
+            [('Common', 2), ('Rare', 1)]
+        )
+
+    def test_autocomplete_prefix(self):
+        """Test autocomplete returns the user's tags starting with prefix"""
+        for title in ('Technology', 'tea', 'Food', 'Te_st', 'Tennis'):
+            Tag.objects.create(user=self.user, title=title)
+        user2 = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass12'
+        )
+        Tag.objects.create(user=user2, title='Tech')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'TE'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [t['title'] for t in res.data],
+            ['Te_st', 'tea', 'Technology', 'Tennis']
+        )
+
+    def test_autocomplete_escapes_wildcards(self):
+        """Test LIKE wildcards in the prefix are matched literally"""
+        Tag.objects.create(user=self.user, title='Te_st')
+        Tag.objects.create(user=self.user, title='Test')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'te_'})
+
+        self.assertEqual([t['title'] for t in res.data], ['Te_st'])
+
+    def test_autocomplete_limit(self):
+        """Test autocomplete returns at most limit results"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, title=f'Tag {i}')
+
+        res = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'prefix': 'tag', 'limit': 2}
+        )
+
+        self.assertEqual([t['title'] for t in res.data], ['Tag 0', 'Tag 1'])
+
+    def test_autocomplete_fuzzy(self):
+        """Test fuzzy autocomplete matches inside titles"""
+        Tag.objects.create(user=self.user, title='Machine learning')
+        Tag.objects.create(user=self.user, title='Cooking')
+
+        res = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'prefix': 'learn', 'fuzzy': 'true'}
+        )
+
+        self.assertEqual(
+            [t['title'] for t in res.data], ['Machine learning']
+        )
+
+    def test_autocomplete_requires_prefix(self):
+        """Test autocomplete without a prefix is rejected"""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
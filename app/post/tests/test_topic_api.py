@@ -11,6 +11,7 @@ from post.serializers import TopicSerializer
 
 
 TOPICS_URL = reverse('post:topic-list')
+TOPICS_AUTOCOMPLETE_URL = reverse('post:topic-autocomplete')
 
 
 class PublicTopicsApiTests(TestCase):
@@ -81,3 +82,16 @@ class PrivateTopicApiTests(TestCase):
         res = self.client.post(TOPICS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_topics(self):
+        """Test autocomplete of the user's topics by prefix"""
+        Topic.objects.create(user=self.user, title='Politics')
+        Topic.objects.create(user=self.user, title='Poetry')
+        Topic.objects.create(user=self.user, title='Sports')
+
+        res = self.client.get(TOPICS_AUTOCOMPLETE_URL, {'prefix': 'po'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [t['title'] for t in res.data], ['Poetry', 'Politics']
+        )
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Post, Tag
+from core.trending import update_trending
+
+
+TRENDING_URL = reverse('post:trending')
+
+
+class TrendingApiTests(TestCase):
+    """Test the trending titles endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = APIClient().get(TRENDING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty_before_first_run(self):
+        """Test nothing trends before the job ran"""
+        res = self.client.get(TRENDING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'kind': 'tag', 'results': []})
+
+    def test_top_titles(self):
+        """Test the most used titles come first, up to the limit"""
+        now = timezone.now()
+        for titles in (['Python', 'Django'], ['Python'], ['Go']):
+            post = Post.objects.create(
+                user=self.user, title='t', content='c', created_at=now
+            )
+            for title in titles:
+                tag, _ = Tag.objects.get_or_create(user=self.user, title=title)
+                post.tags.add(tag)
+        update_trending(now)
+
+        res = self.client.get(TRENDING_URL, {'limit': 2})
+
+        self.assertEqual(
+            [item['title'] for item in res.data['results']],
+            ['python', 'django'],
+        )
+        self.assertAlmostEqual(res.data['results'][0]['score'], 2, 3)
+
+    def test_invalid_parameters(self):
+        """Test an unknown kind or a limit out of range is rejected"""
+        res = self.client.get(TRENDING_URL, {'kind': 'post'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(TRENDING_URL, {'limit': 1000})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import views, async_views
 
 
 router = DefaultRouter()
@@ -12,5 +12,16 @@ router.register('posts', views.PostViewSet)
 app_name = 'post'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('trending/', views.TrendingView.as_view(), name='trending'),
+    path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('async/posts/', async_views.post_list, name='async-post-list'),
+    path(
+        'async/posts/<int:pk>/',
+        async_views.post_detail,
+        name='async-post-detail'
+    ),
+    path('async/tags/', async_views.tag_list, name='async-tag-list'),
+    path('async/topic/', async_views.topic_list, name='async-topic-list'),
 ]
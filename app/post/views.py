@@ -1,28 +1,87 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from core.idempotency import idempotent
+from core.models import Tag, Topic, Post, DailyPostCount, \
+    DailyTagCount, DailyTopicCount
+from core.singleflight import coalesce
+from core.throttling import EndpointThrottle, IPThrottle, UserThrottle
+from core.trending import top_trending
+from user.authentication import ExpiringTokenAuthentication, \
+    SignedTokenAuthentication
+
+from . import queries, serializers, sync
+from .autocomplete import autocomplete
+from .related import IndexNotBuilt, related_posts
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The post changed since the version in If-Match.'
+    default_code = 'precondition_failed'
+
+
+class RelatedIndexUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Related posts are being indexed, try again shortly.'
+    default_code = 'related_index_unavailable'
+    # Sent as Retry-After by DRF's exception handler
+    wait = 60
 
-from core.models import Tag, Topic, Post
 
-from . import serializers
+def post_etag(version):
+    return f'"{version}"'
 
 
 class BaseTopicAttrViewSet(viewsets.GenericViewSet,
                            mixins.ListModelMixin,
                            mixins.CreateModelMixin):
     """Base viewset for user owned topic attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        return self.queryset.filter(user=self.request.user).order_by('-title')
+        return queries.attr_list(
+            self.queryset.model, self.request.user, self.request.query_params
+        )
+
+    @coalesce
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return the user's titles starting with (or like) ?prefix="""
+        params = serializers.AutocompleteSerializer(
+            data=request.query_params
+        )
+        params.is_valid(raise_exception=True)
+        matches = autocomplete(
+            self.queryset.filter(user=request.user),
+            params.validated_data['prefix'],
+            params.validated_data['limit'],
+            fuzzy=params.validated_data['fuzzy'],
+        )
+        serializer = self.get_serializer(matches, many=True)
+        return Response(serializer.data)
+
 
 class TagViewSet(BaseTopicAttrViewSet):
     """Manage tags in database"""
@@ -40,27 +99,143 @@ class PostViewSet(viewsets.ModelViewSet):
     """Manage posts in the database"""
     serializer_class = serializers.PostSerializer
     queryset = Post.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (UserThrottle, IPThrottle, EndpointThrottle)
+    write_actions = (
+        'create', 'update', 'partial_update', 'destroy', 'upload_image',
+    )
+
+    @property
+    def throttle_scope(self):
+        """Throttle writes only, reads are cheap"""
+        if self.action in self.write_actions:
+            return 'post_write'
+        return None
 
     def get_queryset(self):
         """Retrieve the posts for the authenticated user"""
+        if self.action == 'list':
+            return queries.post_list(
+                self.request.user, self.request.query_params
+            )
         return self.queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
 
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'batch'):
             return serializers.PostDetailSerializer
         elif self.action == 'upload_image':
             return serializers.PostImageSerializer
         return self.serializer_class
 
+    @coalesce
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        """Create a new post"""
-        serializer.save(user=self.request.user)
+        """Create a new post, with all of its tags and topics or none"""
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = post_etag(response.data['version'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = post_etag(response.data['version'])
+        return response
+
+    def check_if_match(self, post):
+        """Claim the post for a write over the version named by If-Match
+
+        The post is claimed by an UPDATE conditional on the version read,
+        which matches no row when another write got in since, and stays
+        locked until the surrounding transaction commits. Without If-Match
+        the last write wins, its save still moves the version on.
+        """
+        if_match = self.request.headers.get('If-Match')
+        if if_match is None:
+            return
+        etags = parse_etags(if_match)
+        if '*' not in etags and post_etag(post.version) not in etags:
+            raise PreconditionFailed()
+        claimed = Post.objects.filter(
+            pk=post.pk, version=post.version
+        ).update(updated_at=timezone.now())
+        if not claimed:
+            raise PreconditionFailed()
+
+    def perform_update(self, serializer):
+        """Save over the version named by If-Match, if any, or fail"""
+        with transaction.atomic():
+            self.check_if_match(serializer.instance)
+            serializer.save()
+
+    @action(methods=['GET', 'POST'], detail=False, url_path='batch')
+    def batch(self, request):
+        """Retrieve many posts by id in the order they were requested"""
+        if request.method == 'GET':
+            raw = request.query_params.get('ids', '')
+            data = {'ids': [part for part in raw.split(',') if part]}
+        else:
+            data = request.data
+        batch = serializers.PostBatchSerializer(data=data)
+        batch.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(batch.validated_data['ids']))
+
+        posts = self.get_queryset().filter(id__in=ids).prefetch_related(
+            'tags', 'topics'
+        )
+        found = {post.id: post for post in posts}
+        serializer = self.get_serializer(
+            [found[pk] for pk in ids if pk in found],
+            many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+    @action(methods=['GET'], detail=True, url_path='related')
+    def related(self, request, pk=None):
+        """Return the posts sharing the most tags and topics with a post"""
+        post = self.get_object()
+        params = serializers.RelatedPostsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        try:
+            matches = related_posts(
+                post,
+                params.validated_data['limit'],
+                params.validated_data['metric'],
+            )
+        except IndexNotBuilt:
+            raise RelatedIndexUnavailable()
+
+        posts = self.get_queryset().filter(
+            id__in=[pk for pk, _ in matches]
+        ).prefetch_related('tags', 'topics')
+        found = {post.id: post for post in posts}
+        results = []
+        for pk, score in matches:
+            if pk in found:
+                data = self.get_serializer(found[pk]).data
+                data['score'] = round(score, 4)
+                results.append(data)
+        return Response(results)
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
         """Upload an image to a post"""
         post = self.get_object()
@@ -70,12 +245,127 @@ class PostViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                self.check_if_match(post)
+                serializer.save()
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_200_OK,
+                headers={'ETag': post_etag(post.version)},
             )
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class SyncView(APIView):
+    """Return what changed for the user since the given sync token"""
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        token = request.query_params.get('since')
+        try:
+            since = sync.decode_token(token) if token else None
+        except sync.InvalidToken:
+            raise ValidationError({'since': 'Invalid sync token.'})
+
+        changes = sync.changes_since(request.user, since)
+        return Response({
+            'posts': serializers.PostSerializer(
+                changes['posts'], many=True).data,
+            'tags': serializers.TagSerializer(
+                changes['tags'], many=True).data,
+            'topics': serializers.TopicSerializer(
+                changes['topics'], many=True).data,
+            'deleted': changes['deleted'],
+            'reset': changes['reset'],
+            'next': changes['next'],
+        })
+
+
+class TrendingView(APIView):
+    """Return the trending tag or topic titles of all users"""
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        params = serializers.TrendingSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        kind = params.validated_data['kind']
+        titles = top_trending(
+            kind, params.validated_data['limit'], timezone.now()
+        )
+        return Response({
+            'kind': kind,
+            'results': [
+                {'title': title, 'score': round(score, 4)}
+                for title, score in titles
+            ],
+        })
+
+
+class AnalyticsView(APIView):
+    """Return the user's post activity over a range of days
+
+    Answered from the daily rollups alone: ``by=day`` is a series of posts
+    per day (of one ``tag`` or ``topic`` when given, zero filled) and
+    ``by=tag`` or ``by=topic`` the totals of each over the range.
+    """
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        params = serializers.AnalyticsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end, by = (
+            params.validated_data[key] for key in ('start', 'end', 'by')
+        )
+
+        if by == 'day':
+            results = self.series(request.user, params.validated_data)
+        else:
+            rollup = DailyTagCount if by == 'tag' else DailyTopicCount
+            totals = (
+                rollup.objects.filter(
+                    user=request.user, day__range=(start, end)
+                )
+                .values(by)
+                .annotate(posts=Sum('posts'))
+                .filter(posts__gt=0)
+                .order_by('-posts', by)
+                .values_list(by, f'{by}__title', 'posts')
+            )
+            results = [
+                {'id': pk, 'title': title, 'posts': posts}
+                for pk, title, posts in totals
+            ]
+        return Response({
+            'start': start, 'end': end, 'by': by, 'results': results,
+        })
+
+    def series(self, user, params):
+        start, end = params['start'], params['end']
+        rows = DailyPostCount.objects.filter(user=user)
+        if 'tag' in params:
+            rows = DailyTagCount.objects.filter(user=user, tag=params['tag'])
+        elif 'topic' in params:
+            rows = DailyTopicCount.objects.filter(
+                user=user, topic=params['topic']
+            )
+        counts = dict(
+            rows.filter(day__range=(start, end)).values_list('day', 'posts')
+        )
+        days = ((start + timedelta(days=n))
+                for n in range((end - start).days + 1))
+        return [{'day': day, 'posts': counts.get(day, 0)} for day in days]
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+from . import tokens
+
+
+def token_expiry_cutoff(now=None):
+    """Return the time before which a token last renewed has expired"""
+    now = now or timezone.now()
+    return now - timedelta(seconds=settings.AUTH_TOKEN_LIFETIME)
+
+
+class ExpiringTokenAuthentication(authentication.TokenAuthentication):
+    """DRF token authentication with a sliding expiry
+
+    ``Token.created`` is the time the token was last renewed: a token
+    unused for ``AUTH_TOKEN_LIFETIME`` seconds expires, and using it moves
+    ``created`` forward, at most once per ``AUTH_TOKEN_RENEW_INTERVAL`` so
+    most requests stay read only.
+    """
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        now = timezone.now()
+        if token.created < token_expiry_cutoff(now):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        renew_after = timedelta(seconds=settings.AUTH_TOKEN_RENEW_INTERVAL)
+        if now - token.created >= renew_after:
+            Token.objects.filter(pk=token.pk).update(created=now)
+            token.created = now
+        return user, token
+
+
+def stateless_user(user_id):
+    """Return a user known only by id, enough to filter querysets by
+
+    The other fields are not loaded; views needing them fetch the row.
+    """
+    user = get_user_model()(pk=user_id)
+    user.stateless = True
+    return user
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate ``Authorization: Bearer <access token>`` without the DB
+
+    A deactivated user keeps access until the token expires, a few
+    minutes at most, unless its tokens are revoked.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid bearer header.')
+            )
+        try:
+            token = auth[1].decode()
+            claims = tokens.verify(token, tokens.ACCESS)
+        except (UnicodeError, tokens.InvalidToken) as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+        if tokens.revocations.is_revoked(claims.jti):
+            raise exceptions.AuthenticationFailed(
+                _('Token has been revoked.')
+            )
+        return stateless_user(claims.user_id), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
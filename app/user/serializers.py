@@ -48,3 +48,8 @@ class AuthTokenSerializer(serializers.Serializer):
             raise serializers.ValidationError(message, code='authentication')
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for a signed refresh token"""
+    refresh = serializers.CharField(max_length=200)
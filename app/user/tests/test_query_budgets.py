@@ -0,0 +1,141 @@
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Post
+from core.tests.utils import QueryBudgetMixin, route_names
+from user import tokens
+
+
+# Most queries one request to each route may run, by route and method.
+# The count must also stay the same at 1 and at 50 rows of the data the
+# route reads or writes. Throttled routes take one query per bucket.
+BUDGETS = {
+    ('user:create', 'POST'): 4,
+    ('user:token', 'POST'): 10,
+    ('user:token-signed', 'POST'): 4,
+    ('user:token-refresh', 'POST'): 4,
+    ('user:token-revoke', 'POST'): 6,
+    ('user:token-stream', 'POST'): 1,
+    ('user:me', 'GET'): 1,
+    ('user:me', 'PATCH'): 2,
+}
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the number of queries of every user route"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.client = APIClient()
+        self.emails = (f'user{n}@example.com' for n in count())
+
+    def tearDown(self):
+        tokens.revocations.clear()
+
+    def check(self, name, method, func, grow):
+        self.assertConstantQueries(
+            func, grow, budget=BUDGETS[(name, method)]
+        )
+
+    def request(self, url, data=None, method='POST',
+                expected=status.HTTP_200_OK):
+        res = getattr(self.client, method.lower())(url, data)
+        self.assertEqual(res.status_code, expected, res.content)
+        return res
+
+    def add_users(self, number):
+        get_user_model().objects.bulk_create([
+            get_user_model()(email=next(self.emails))
+            for _ in range(number)
+        ])
+
+    def add_posts(self, number):
+        Post.objects.bulk_create([
+            Post(user=self.user, title='T', content='C')
+            for _ in range(number)
+        ])
+
+    def test_every_route_has_a_budget(self):
+        """Test each route of user.urls declares its query budget"""
+        self.assertEqual(
+            route_names('user.urls', 'user'),
+            {name for name, _ in BUDGETS},
+        )
+
+    def test_create_user(self):
+        self.check(
+            'user:create', 'POST',
+            lambda: self.request(
+                reverse('user:create'),
+                {'email': next(self.emails), 'password': 'pass5555',
+                 'name': 'Name'},
+                expected=status.HTTP_201_CREATED,
+            ),
+            self.add_users,
+        )
+
+    def test_login(self):
+        """Test both logins with more and more users"""
+        credentials = {'email': 'test@example.com', 'password': 'pass5555'}
+        for name in ('user:token', 'user:token-signed'):
+            with self.subTest(name):
+                self.check(
+                    name, 'POST',
+                    lambda: self.request(reverse(name), credentials),
+                    self.add_users,
+                )
+
+    def test_refresh_and_revoke(self):
+        """Test exchanging and revoking signed tokens"""
+        def refresh():
+            pair = tokens.issue_pair(self.user.pk)
+            self.request(reverse('user:token-refresh'),
+                         {'refresh': pair['refresh']})
+
+        def revoke():
+            pair = tokens.issue_pair(self.user.pk)
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'Bearer {pair["access"]}'
+            )
+            self.request(reverse('user:token-revoke'),
+                         {'refresh': pair['refresh']},
+                         expected=status.HTTP_204_NO_CONTENT)
+
+        self.check('user:token-refresh', 'POST', refresh, self.add_users)
+        self.check('user:token-revoke', 'POST', revoke, self.add_users)
+
+    def test_stream_token(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.check(
+            'user:token-stream', 'POST',
+            lambda: self.request(reverse('user:token-stream')),
+            self.add_users,
+        )
+
+    def test_me(self):
+        """Test reading and editing the profile with more and more posts"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('user:me')
+
+        self.check(
+            'user:me', 'GET',
+            lambda: self.request(url, method='GET'), self.add_posts,
+        )
+        self.check(
+            'user:me', 'PATCH',
+            lambda: self.request(url, {'name': 'New'}, method='PATCH'),
+            self.add_posts,
+        )
@@ -0,0 +1,181 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RevokedToken
+from user import tokens
+
+
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+STREAM_URL = reverse('user:token-stream')
+ME_URL = reverse('user:me')
+POSTS_URL = reverse('post:post-list')
+
+
+class SignedTokenTests(TestCase):
+    """Test signing and verifying tokens"""
+
+    def test_round_trip(self):
+        """Test a token verifies to the claims it was issued with"""
+        token, claims = tokens.issue(tokens.ACCESS, 7, 60)
+
+        self.assertEqual(tokens.verify(token, tokens.ACCESS), claims)
+        self.assertEqual(claims.user_id, 7)
+
+    def test_tampered_token_rejected(self):
+        """Test changing any part of a token breaks its signature"""
+        token, _ = tokens.issue(tokens.ACCESS, 7, 60)
+        forged = token.replace('a.7.', 'a.8.', 1)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(forged, tokens.ACCESS)
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify('ä' + token, tokens.ACCESS)
+
+    def test_expired_token_rejected(self):
+        """Test a token stops verifying at its expiry"""
+        token, claims = tokens.issue(tokens.ACCESS, 7, 60)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(token, tokens.ACCESS, now=claims.expires)
+
+    def test_wrong_kind_rejected(self):
+        """Test a refresh token is not accepted as an access token"""
+        token, _ = tokens.issue(tokens.REFRESH, 7, 60)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(token, tokens.ACCESS)
+
+    def test_other_secret_rejected(self):
+        """Test tokens signed with another secret are rejected"""
+        token, _ = tokens.issue(tokens.ACCESS, 7, 60)
+
+        with override_settings(SIGNED_TOKEN_SECRET='other'):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(token, tokens.ACCESS)
+
+
+class SignedTokenApiTests(TestCase):
+    """Test the signed token endpoints and authentication"""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555',
+            name='Test'
+        )
+
+    def obtain(self):
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'pass5555',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def bearer(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_invalid_credentials(self):
+        """Test no tokens are issued for a wrong password"""
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('access', res.data)
+
+    def test_access_without_database(self):
+        """Test a bearer token authenticates with no query of its own"""
+        self.bearer(self.obtain()['access'])
+        tokens.revocations.reload()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(POSTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_me_loads_user(self):
+        """Test the profile endpoint returns the full user"""
+        self.bearer(self.obtain()['access'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], 'test@example.com')
+        self.assertEqual(res.data['name'], 'Test')
+
+    def test_invalid_bearer_rejected(self):
+        """Test forged or refresh tokens are not accepted as bearer"""
+        for token in ('nonsense', self.obtain()['refresh']):
+            self.bearer(token)
+
+            res = self.client.get(POSTS_URL)
+
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_token(self):
+        """Test a stream token is issued but authenticates nothing else"""
+        self.bearer(self.obtain()['access'])
+
+        res = self.client.post(STREAM_URL)
+        claims = tokens.verify(res.data['token'], tokens.STREAM)
+        self.bearer(res.data['token'])
+        other = self.client.get(POSTS_URL)
+
+        self.assertEqual(claims.user_id, self.user.pk)
+        self.assertEqual(res.data['expires_in'], 60)
+        self.assertEqual(other.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates(self):
+        """Test a refresh token gives a new pair and works only once"""
+        refresh = self.obtain()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_inactive_user(self):
+        """Test deactivated users cannot refresh"""
+        refresh = self.obtain()['refresh']
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke(self):
+        """Test revoked access and refresh tokens stop working"""
+        pair = self.obtain()
+        self.bearer(pair['access'])
+
+        res = self.client.post(REVOKE_URL, {'refresh': pair['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+        res = self.client.get(POSTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(REFRESH_URL, {'refresh': pair['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocations_reach_other_processes(self):
+        """Test a reload picks up revocations made elsewhere"""
+        token, claims = tokens.issue(tokens.ACCESS, self.user.pk, 60)
+        tokens.revocations.reload()
+        RevokedToken.objects.create(
+            jti=claims.jti, expires_at=tokens.expiry_time(claims)
+        )
+        self.assertFalse(tokens.revocations.is_revoked(claims.jti))
+
+        tokens.revocations.reload()
+
+        self.assertTrue(tokens.revocations.is_revoked(claims.jti))
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+
+
+TOKEN_URL = reverse('user:token')
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+POSTS_URL = reverse('post:post-list')
+
+
+@override_settings(THROTTLE_RATES={
+    'login.account': '2/min',
+    'login.ip': '3/min',
+    'post_write.user': '1/min',
+})
+class ThrottlingApiTests(TestCase):
+    """Test logins and writes are throttled with a Retry-After"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+
+    def login(self, email='test@example.com', password='wrong', **extra):
+        return self.client.post(
+            TOKEN_URL, {'email': email, 'password': password}, **extra
+        )
+
+    def test_login_throttled_per_account(self):
+        """Test guessing one account's password is throttled"""
+        self.login()
+        self.login(email=' TEST@example.com', REMOTE_ADDR='10.0.0.2')
+
+        res = self.login(password='pass5555', REMOTE_ADDR='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+        self.assertNotIn('token', res.data)
+
+    def test_login_throttled_per_ip(self):
+        """Test one address trying many accounts is throttled"""
+        for n in range(3):
+            self.login(email=f'user{n}@example.com')
+
+        res = self.login(email='other@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(throttling.throttled_counts()['login.ip'], 1)
+
+    def test_signed_login_shares_bucket(self):
+        """Test both login endpoints count against the same buckets"""
+        self.login()
+        self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'wrong',
+        })
+
+        res = self.login(password='pass5555')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_RATES={
+        'login.ip': '2/min',
+        'login.endpoint': '5/min',
+    })
+    def test_refused_caller_leaves_endpoint_bucket(self):
+        """Test a throttled address does not lock other callers out"""
+        codes = [
+            self.login(REMOTE_ADDR='10.0.0.9').status_code for _ in range(6)
+        ]
+
+        res = self.login(password='pass5555', REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(codes.count(status.HTTP_429_TOO_MANY_REQUESTS), 4)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertEqual(throttling.throttled_counts()['login.endpoint'], 0)
+
+    def test_post_writes_throttled_per_user(self):
+        """Test writes are throttled per user but reads are not"""
+        self.client.force_authenticate(self.user)
+        payload = {'title': 'Post', 'content': 'Content'}
+
+        first = self.client.post(POSTS_URL, payload)
+        second = self.client.post(POSTS_URL, payload)
+        listed = self.client.get(POSTS_URL)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(second['Retry-After'], '60')
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import RevokedToken
+
+
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+def age(token, seconds):
+    """Move the last renewal of a token into the past"""
+    Token.objects.filter(pk=token.pk).update(
+        created=timezone.now() - timedelta(seconds=seconds)
+    )
+
+
+@override_settings(AUTH_TOKEN_LIFETIME=3600, AUTH_TOKEN_RENEW_INTERVAL=60)
+class TokenExpiryTests(TestCase):
+    """Test auth token expiry, renewal, rotation and cleanup"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass5555'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_expired_token_rejected(self):
+        """Test a token unused for its lifetime no longer authenticates"""
+        age(self.token, 3601)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_use_renews_token(self):
+        """Test using a token past the renew interval extends its life"""
+        age(self.token, 3000)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.token.refresh_from_db()
+        self.assertLess(
+            timezone.now() - self.token.created, timedelta(seconds=5)
+        )
+
+    def test_recent_token_not_written(self):
+        """Test a token renewed within the interval is only read"""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    def test_login_rotates_token(self):
+        """Test each login replaces the previous token"""
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'pass5555',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertEqual(
+            list(Token.objects.values_list('key', flat=True)),
+            [res.data['token']],
+        )
+
+    def test_purge_expired(self):
+        """Test the cleanup command deletes only expired rows in batches"""
+        for n in range(5):
+            user = get_user_model().objects.create_user(f'{n}@e.com', 'x')
+            age(Token.objects.create(user=user), 7200)
+        now = timezone.now()
+        RevokedToken.objects.create(jti='old', expires_at=now)
+        RevokedToken.objects.create(
+            jti='live', expires_at=now + timedelta(hours=1)
+        )
+        out = StringIO()
+
+        call_command('purge_tokens', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(
+            list(Token.objects.values_list('key', flat=True)),
+            [self.token.key],
+        )
+        self.assertEqual(
+            list(RevokedToken.objects.values_list('jti', flat=True)),
+            ['live'],
+        )
+        self.assertIn('Purged 5 expired tokens', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+@override_settings(THROTTLE_RATES={})
+class ConcurrentLoginTests(TransactionTestCase):
+    """Test logins to one account at the same time"""
+
+    def test_concurrent_logins_leave_one_token(self):
+        """Test every login succeeds and the last token is kept"""
+        get_user_model().objects.create_user('test@example.com', 'pass5555')
+
+        def login(_):
+            try:
+                return APIClient().post(TOKEN_URL, {
+                    'email': 'test@example.com', 'password': 'pass5555',
+                })
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(pool.map(login, range(8)))
+
+        self.assertEqual(
+            [res.status_code for res in responses], [status.HTTP_200_OK] * 8
+        )
+        self.assertEqual(Token.objects.count(), 1)
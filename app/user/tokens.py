@@ -0,0 +1,187 @@
+"""Stateless HMAC signed access and refresh tokens
+
+A token is ``<kind>.<user id>.<expiry>.<id>.<signature>``: kind ``a`` for
+short lived access tokens, ``r`` for refresh tokens and ``s`` for the
+tokens that only open the event stream, expiry in Unix
+seconds, a random token id and an HMAC-SHA256 of the rest. Checking an
+access token needs no database access, only the signature, the expiry and
+an in-memory copy of the revocation list, which every process reloads
+from ``RevokedToken`` at most every ``SIGNED_TOKEN_REVOCATION_REFRESH``
+seconds. A refresh token is used once: refreshing revokes it and issues a
+new pair.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import RevokedToken
+
+
+ACCESS = 'a'
+REFRESH = 'r'
+STREAM = 's'
+
+Claims = namedtuple('Claims', 'kind user_id expires jti')
+
+
+class InvalidToken(Exception):
+    """The token is malformed, forged, expired or revoked"""
+
+
+@functools.lru_cache(maxsize=4)
+def _key(secret):
+    return hashlib.sha256(b'user.tokens' + secret.encode()).digest()
+
+
+def _sign(payload):
+    digest = hmac.new(
+        _key(settings.SIGNED_TOKEN_SECRET), payload.encode(), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def issue(kind, user_id, lifetime, now=None):
+    """Return a new signed token and its claims"""
+    now = time.time() if now is None else now
+    claims = Claims(kind, user_id, int(now + lifetime),
+                    secrets.token_hex(8))
+    payload = '.'.join(str(part) for part in claims)
+    return f'{payload}.{_sign(payload)}', claims
+
+
+def issue_pair(user_id, now=None):
+    """Return a fresh access and refresh token for a user"""
+    access, _ = issue(
+        ACCESS, user_id, settings.SIGNED_TOKEN_ACCESS_LIFETIME, now
+    )
+    refresh, _ = issue(
+        REFRESH, user_id, settings.SIGNED_TOKEN_REFRESH_LIFETIME, now
+    )
+    return {
+        'access': access,
+        'refresh': refresh,
+        'expires_in': settings.SIGNED_TOKEN_ACCESS_LIFETIME,
+    }
+
+
+def issue_stream(user_id, now=None):
+    """Return a token opening the user's event stream for a minute"""
+    token, _ = issue(
+        STREAM, user_id, settings.SIGNED_TOKEN_STREAM_LIFETIME, now
+    )
+    return {
+        'token': token,
+        'expires_in': settings.SIGNED_TOKEN_STREAM_LIFETIME,
+    }
+
+
+def verify(token, kind, now=None):
+    """Return the claims of a valid token of the given kind
+
+    Only checks the signature and the expiry, see ``revocations``.
+    """
+    if not token.isascii():
+        raise InvalidToken('Malformed token.')
+    payload, _, signature = token.rpartition('.')
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidToken('Invalid token signature.')
+    try:
+        token_kind, user_id, expires, jti = payload.split('.')
+        claims = Claims(token_kind, int(user_id), int(expires), jti)
+    except ValueError:
+        raise InvalidToken('Malformed token.')
+    if claims.kind != kind:
+        raise InvalidToken('Wrong kind of token.')
+    if claims.expires <= (time.time() if now is None else now):
+        raise InvalidToken('Token has expired.')
+    return claims
+
+
+def expiry_time(claims):
+    return datetime.fromtimestamp(claims.expires, tz=dt_timezone.utc)
+
+
+class RevocationList:
+    """Process local copy of the ids of revoked, unexpired tokens"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._loaded_at = None
+        self._checked = float('-inf')
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        interval = settings.SIGNED_TOKEN_REVOCATION_REFRESH
+        if now - self._checked >= interval:
+            self.reload(now)
+        return jti in self._revoked
+
+    def reload(self, now=None):
+        """Read the revocations made since the previous load"""
+        with self._lock:
+            started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+            if self._loaded_at is not None:
+                # Overlap to catch revocations committed out of order
+                rows = rows.filter(
+                    revoked_at__gte=self._loaded_at - timedelta(seconds=30)
+                )
+            revoked = {
+                jti: expires_at for jti, expires_at in self._revoked.items()
+                if expires_at > started
+            }
+            revoked.update(rows.values_list('jti', 'expires_at'))
+            self._revoked = revoked
+            self._loaded_at = started
+            self._checked = time.monotonic() if now is None else now
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked = {}
+            self._loaded_at = None
+            self._checked = float('-inf')
+
+
+revocations = RevocationList()
+
+
+def revoke(claims):
+    """Revoke a token until it expires, returns False if it already was"""
+    expires_at = expiry_time(claims)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=claims.jti, expires_at=expires_at
+            )
+    except IntegrityError:
+        return False
+    finally:
+        revocations.add(claims.jti, expires_at)
+    return True
+
+
+def refresh(token):
+    """Exchange a refresh token for a new pair, revoking it
+
+    The revocation is checked against the database so a refresh token can
+    never be used twice, even on processes with a stale list.
+    """
+    claims = verify(token, REFRESH)
+    if not revoke(claims):
+        raise InvalidToken('Token has been revoked.')
+    return claims.user_id, issue_pair(claims.user_id)
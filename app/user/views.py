@@ -1,27 +1,143 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import generics, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from .serializers import UserSerializer, AuthTokenSerializer
+from core.throttling import AccountThrottle, EndpointThrottle, IPThrottle
+
+from . import tokens
+from .authentication import ExpiringTokenAuthentication, \
+    SignedTokenAuthentication
+from .serializers import UserSerializer, AuthTokenSerializer, \
+    RefreshTokenSerializer
+
+
+LOGIN_THROTTLES = (AccountThrottle, IPThrottle, EndpointThrottle)
 
 
 class CreateUserView(generics.CreateAPIView):
     """Create new user in the system"""
     serializer_class = UserSerializer
+    throttle_classes = (IPThrottle, EndpointThrottle)
+    throttle_scope = 'signup'
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create new auth token for use"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = LOGIN_THROTTLES
+    throttle_scope = 'login'
+
+    def post(self, request, *args, **kwargs):
+        """Issue a fresh token on every login, replacing the old one"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        with transaction.atomic():
+            # Concurrent logins to one account take turns, or each would
+            # insert a token after neither saw the other's
+            get_user_model().objects.select_for_update().get(pk=user.pk)
+            Token.objects.filter(user=user).delete()
+            token = Token.objects.create(user=user)
+        return Response({'token': token.key})
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authentcated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authenticated user"""
-        return self.request.user
+        user = self.request.user
+        if getattr(user, 'stateless', False):
+            user = get_user_model().objects.get(pk=user.pk)
+        return user
+
+
+class CreateSignedTokenView(APIView):
+    """Create a signed access and refresh token pair"""
+    serializer_class = AuthTokenSerializer
+    authentication_classes = ()
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = LOGIN_THROTTLES
+    throttle_scope = 'login'
+
+    def post(self, request):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RefreshSignedTokenView(APIView):
+    """Exchange a refresh token for a new signed token pair"""
+    serializer_class = RefreshTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # The access token sent along has usually expired, ignore it
+    authentication_classes = ()
+
+    def get_authenticate_header(self, request):
+        return SignedTokenAuthentication.keyword
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            user_id, pair = tokens.refresh(
+                serializer.validated_data['refresh']
+            )
+        except tokens.InvalidToken as exc:
+            raise AuthenticationFailed(str(exc))
+        active = get_user_model().objects.filter(
+            pk=user_id, is_active=True
+        ).exists()
+        if not active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return Response(pair)
+
+
+class CreateStreamTokenView(APIView):
+    """Create a short lived token to open the event stream with"""
+    authentication_classes = (
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        return Response(tokens.issue_stream(request.user.pk))
+
+
+class RevokeSignedTokenView(APIView):
+    """Revoke the current access token and, if given, its refresh token"""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data.get('refresh')
+        if refresh:
+            try:
+                claims = tokens.verify(refresh, tokens.REFRESH)
+            except tokens.InvalidToken as exc:
+                raise AuthenticationFailed(str(exc))
+            if claims.user_id != request.user.pk:
+                raise AuthenticationFailed('Token belongs to another user.')
+            tokens.revoke(claims)
+        tokens.revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)